@@ -0,0 +1,121 @@
+"""Build ``DATABASES`` entries from environment variables.
+
+Every variable is read with a prefix (``CRM_DB_`` for the default alias), so the same settings
+can describe another alias:
+
+* ``ENGINE``: ``sqlite`` (default) or ``postgresql``; a full backend path is accepted too.
+* ``NAME``, ``USER``, ``PASSWORD``, ``HOST``, ``PORT``: connection parameters. SQLite's ``NAME``
+  defaults to ``db.sqlite3`` in the project directory.
+* ``CONN_MAX_AGE`` (seconds, default 60) and ``CONN_HEALTH_CHECKS`` (default on): persistent
+  connections, checked before reuse so a restarted server does not fail the next request.
+* ``POOL`` (PostgreSQL, psycopg 3 with ``psycopg[pool]``): use Django's native connection pool
+  instead, sized by ``POOL_MIN_SIZE``, ``POOL_MAX_SIZE`` and ``POOL_TIMEOUT``. Pooled
+  connections are not persistent, so ``CONN_MAX_AGE`` defaults to 0 there.
+* ``SQLITE_JOURNAL_MODE`` (default ``WAL``), ``SQLITE_SYNCHRONOUS`` (default ``NORMAL``),
+  ``SQLITE_BUSY_TIMEOUT`` (milliseconds, default 5000) and ``SQLITE_TRANSACTION_MODE`` (default
+  ``IMMEDIATE``). WAL lets readers run while one connection writes. ``NORMAL`` syncs at
+  checkpoints rather than on every commit, which WAL keeps safe against corruption. Taking the
+  write lock at ``BEGIN`` makes a blocked writer wait for ``busy_timeout``; a deferred
+  transaction that reads first fails at once with "database is locked" instead.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+
+ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+}
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'off'}
+
+
+class _Env:
+    def __init__(self, environ: Mapping[str, str], prefix: str):
+        self.environ = environ
+        self.prefix = prefix
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.environ.get(self.prefix + name, '')
+        return value if value != '' else default
+
+    def get_int(self, name: str, default: int) -> int:
+        value = self.get(name)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ImproperlyConfigured(f'{self.prefix}{name} must be an integer, not {value!r}.') from None
+
+    def get_bool(self, name: str, default: bool) -> bool:
+        value = self.get(name)
+        if value is None:
+            return default
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+        raise ImproperlyConfigured(f'{self.prefix}{name} must be a boolean (1/0, true/false), not {value!r}.')
+
+    def get_choice(self, name: str, default: str, choices) -> str:
+        value = self.get(name, default).upper()
+        if value not in choices:
+            raise ImproperlyConfigured(f'{self.prefix}{name} must be one of {", ".join(sorted(choices))}, not {value!r}.')
+        return value
+
+
+def _sqlite_options(env: _Env) -> Dict[str, Any]:
+    pragmas = [
+        # First, so switching the journal mode waits for other connections instead of failing.
+        f"PRAGMA busy_timeout = {env.get_int('SQLITE_BUSY_TIMEOUT', 5000)}",
+        f"PRAGMA journal_mode = {env.get_choice('SQLITE_JOURNAL_MODE', 'WAL', JOURNAL_MODES)}",
+        f"PRAGMA synchronous = {env.get_choice('SQLITE_SYNCHRONOUS', 'NORMAL', SYNCHRONOUS_MODES)}",
+    ]
+    return {
+        'init_command': '; '.join(pragmas),
+        'transaction_mode': env.get_choice('SQLITE_TRANSACTION_MODE', 'IMMEDIATE', {'DEFERRED', 'IMMEDIATE', 'EXCLUSIVE'}),
+    }
+
+
+def _postgresql_options(env: _Env) -> Dict[str, Any]:
+    if not env.get_bool('POOL', False):
+        return {}
+    return {
+        'pool': {
+            'min_size': env.get_int('POOL_MIN_SIZE', 2),
+            'max_size': env.get_int('POOL_MAX_SIZE', 10),
+            'timeout': env.get_int('POOL_TIMEOUT', 10),
+        },
+    }
+
+
+def database_from_env(prefix: str = 'CRM_DB_', base_dir: Optional[Path] = None, environ: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """The ``DATABASES`` entry described by the ``prefix`` variables in ``environ`` (``os.environ``)."""
+    env = _Env(os.environ if environ is None else environ, prefix)
+    engine = env.get('ENGINE', 'sqlite')
+    engine = ENGINES.get(engine, engine)
+    if engine == ENGINES['sqlite']:
+        default_name = str(Path(base_dir or '.') / 'db.sqlite3')
+        options = _sqlite_options(env)
+    elif engine == ENGINES['postgresql']:
+        default_name = 'crm'
+        options = _postgresql_options(env)
+    else:
+        raise ImproperlyConfigured(f'{prefix}ENGINE must be one of {", ".join(ENGINES)}, not {engine!r}.')
+    return {
+        'ENGINE': engine,
+        'NAME': env.get('NAME', default_name),
+        'USER': env.get('USER', ''),
+        'PASSWORD': env.get('PASSWORD', ''),
+        'HOST': env.get('HOST', ''),
+        'PORT': env.get('PORT', ''),
+        'CONN_MAX_AGE': env.get_int('CONN_MAX_AGE', 0 if 'pool' in options else 60),
+        'CONN_HEALTH_CHECKS': env.get_bool('CONN_HEALTH_CHECKS', True),
+        'OPTIONS': options,
+    }
@@ -1,5 +1,6 @@
 import graphene
 
+from crm.async_schema import Mutation as CRMAsyncMutation, Query as CRMAsyncQuery
 from crm.schema import Mutation as CRMMutation, Query as CRMQuery
 
 
@@ -16,3 +17,20 @@ class Mutation(CRMMutation, graphene.ObjectType):
 
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
+
+
+class AsyncQuery(CRMAsyncQuery, graphene.ObjectType):
+    """Root query served by the async endpoint."""
+
+    class Meta:
+        name = "Query"
+
+
+class AsyncMutation(CRMAsyncMutation, graphene.ObjectType):
+    """Root mutation served by the async endpoint."""
+
+    class Meta:
+        name = "Mutation"
+
+
+async_schema = graphene.Schema(query=AsyncQuery, mutation=AsyncMutation)
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from alx_backend_graphql.database import database_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -76,13 +79,23 @@ WSGI_APPLICATION = 'graphql_crm.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Configured from CRM_DB_* environment variables (see alx_backend_graphql.database): SQLite in
+# WAL mode by default, or PostgreSQL with persistent or pooled connections.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_from_env('CRM_DB_', BASE_DIR),
 }
 
+# Optional read replica from CRM_DB_REPLICA_* variables. GraphQL query operations read from it,
+# except for CRM_DB_STICKY_SECONDS after the client's last mutation (see crm.replicas).
+if os.environ.get('CRM_DB_REPLICA_NAME'):
+    DATABASES['replica'] = database_from_env('CRM_DB_REPLICA_', BASE_DIR)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['crm.replicas.ReplicaRouter']
+CRM_DB_PRIMARY_ALIAS = 'default'
+CRM_DB_READ_ALIAS = 'replica'
+CRM_DB_STICKY_SECONDS = float(os.environ.get('CRM_DB_STICKY_SECONDS', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -123,6 +136,8 @@ STATIC_URL = 'static/'
 
 GRAPHENE = {
     'SCHEMA': 'alx_backend_graphql.schema.schema',
+    # Largest page any connection serves; also the page size when neither first nor last is given.
+    'RELAY_CONNECTION_MAX_LIMIT': 100,
 }
 
 
@@ -132,3 +147,46 @@ CRONJOBS = [
     ('*/5 * * * *', 'crm.cron.log_crm_heartbeat'),
     ('0 */12 * * *', 'crm.cron.update_low_stock'),
 ]
+
+# Include per-request DataLoader batch/hit counts in GraphQL response extensions.
+CRM_LOADER_STATS = DEBUG
+
+# Scheduled jobs run GraphQL in-process; set to 'http' to go through CRM_GRAPHQL_URL instead.
+CRM_GRAPHQL_EXECUTOR = 'inprocess'
+CRM_GRAPHQL_URL = 'http://localhost:8000/graphql'
+
+# Parsed/validated GraphQL documents kept in memory, and the cache alias holding persisted query
+# text; workers share registrations only if that alias is a shared backend.
+CRM_DOCUMENT_CACHE_SIZE = 256
+CRM_DOCUMENT_CACHE_STATS = DEBUG
+CRM_PERSISTED_QUERY_CACHE = 'graphql'
+
+# Static query cost limits enforced before execution (see crm.complexity).
+CRM_QUERY_MAX_DEPTH = 10
+CRM_QUERY_MAX_COST = 50000
+CRM_QUERY_DEFAULT_LIST_SIZE = 100
+
+# Substring search for the name/email filters (see crm.search): None picks the best index the
+# database supports; 'trigram', 'fts5' or 'scan' forces one.
+CRM_SEARCH_BACKEND = None
+
+# Per-resolver tracing (see crm.tracing): the summary is returned in response extensions when
+# CRM_TRACING_EXTENSIONS is on; in production sample a fraction of requests into the logs.
+CRM_TRACING_EXTENSIONS = DEBUG
+CRM_TRACING_SAMPLE_RATE = float(os.environ.get('CRM_TRACING_SAMPLE_RATE', '0'))
+CRM_TRACING_N_PLUS_ONE_THRESHOLD = 10
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'graphql': {
+        'BACKEND': os.environ.get('CRM_GRAPHQL_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CRM_GRAPHQL_CACHE_LOCATION', 'crm-graphql'),
+    },
+}
+
+# Opt-in cache of read-query results, invalidated through per-model versions (crm.response_cache).
+CRM_RESPONSE_CACHE_ENABLED = os.environ.get('CRM_RESPONSE_CACHE_ENABLED', '') == '1'
+CRM_RESPONSE_CACHE_ALIAS = 'graphql'
+CRM_RESPONSE_CACHE_TIMEOUT = 60
@@ -17,11 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
 
-from alx_backend_graphql.schema import schema
+from alx_backend_graphql.schema import async_schema, schema
+from crm.views import AsyncCRMGraphQLView, CRMGraphQLView, export_customers, export_orders
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('graphql', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
+    path('graphql', csrf_exempt(CRMGraphQLView.as_view(graphiql=True, schema=schema))),
+    path('graphql-async', csrf_exempt(AsyncCRMGraphQLView.as_view(graphiql=True, schema=async_schema))),
+    path('export/orders', export_orders, name='export-orders'),
+    path('export/customers', export_customers, name='export-customers'),
 ]
@@ -1,12 +1,13 @@
 from django.contrib import admin
 
-from crm.models import Customer, Order, Product
+from crm.models import Customer, Order, OrderItem, Product
 
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
-	list_display = ('name', 'email', 'phone', 'created_at')
+	list_display = ('name', 'email', 'phone', 'order_count', 'lifetime_value', 'last_order_at', 'created_at')
 	search_fields = ('name', 'email')
+	readonly_fields = ('order_count', 'lifetime_value', 'last_order_at')
 
 
 @admin.register(Product)
@@ -15,9 +16,21 @@ class ProductAdmin(admin.ModelAdmin):
 	search_fields = ('name',)
 
 
+class OrderItemInline(admin.TabularInline):
+	model = OrderItem
+	raw_id_fields = ('product',)
+	extra = 1
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
 	list_display = ('id', 'customer', 'order_date', 'total_amount')
 	search_fields = ('customer__name', 'customer__email')
 	date_hierarchy = 'order_date'
-	filter_horizontal = ('products',)
+	inlines = (OrderItemInline,)
+	actions = ('recalculate_totals',)
+
+	@admin.action(description='Recalculate totals from current prices')
+	def recalculate_totals(self, request, queryset):
+		updated = queryset.recalculate_totals()
+		self.message_user(request, f'Recalculated {updated} order totals.')
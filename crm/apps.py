@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class CrmConfig(AppConfig):
     name = 'crm'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from crm import search, signals  # noqa: F401
+
+        post_migrate.connect(search.repair, sender=self)
+        connection_created.connect(search.remember_backend)
@@ -0,0 +1,84 @@
+"""Async root resolvers for the ASGI GraphQL endpoint.
+
+The object types are shared with ``crm.schema``; only the root fields differ. Reads use
+Django's async ORM, so root fields of one query (``allProducts`` and ``allOrders`` say) run
+concurrently on the event loop and relations batch through ``AsyncCRMLoaders``. Mutations
+keep their transactional sync bodies and run through ``sync_to_async``.
+"""
+
+import asyncio
+
+import graphene
+from asgiref.sync import sync_to_async
+
+from crm import schema as crm_schema
+from crm.models import Customer
+from crm.schema import (
+    ORDER_TOTALS,
+    BulkCreateCustomers,
+    BulkCreateOrders,
+    CreateCustomer,
+    CreateOrder,
+    CreateProduct,
+    CRMStatsType,
+    OrderFilterInput,
+    StatsPeriod,
+    UpdateLowStockProducts,
+    _cents,
+    _revenue_bucket,
+    _stats_orders,
+)
+
+
+class AsyncCRMStatsType(CRMStatsType):
+    class Meta:
+        name = "CRMStatsType"
+
+    def __init__(self, orders, **kwargs):
+        # Graphene gives every ObjectType subclass a generated __init__; restore the parent's.
+        CRMStatsType.__init__(self, orders, **kwargs)
+
+    def _order_totals(self):
+        # Share one aggregate between orderCount and totalRevenue when both are selected.
+        if self._totals is None:
+            self._totals = asyncio.ensure_future(self._orders.aaggregate(**ORDER_TOTALS))
+        return self._totals
+
+    async def resolve_customer_count(self, info):
+        return await Customer.objects.acount()
+
+    async def resolve_order_count(self, info):
+        return (await self._order_totals())["order_count"]
+
+    async def resolve_total_revenue(self, info):
+        return _cents((await self._order_totals())["total_revenue"])
+
+    async def resolve_revenue_by_period(self, info, period=StatsPeriod.DAY.value):
+        return [_revenue_bucket(row) async for row in self._revenue_rows(period)]
+
+
+class Query(crm_schema.Query):
+    crm_stats = graphene.Field(AsyncCRMStatsType, filter=OrderFilterInput())
+
+    def resolve_crm_stats(self, info, filter=None):
+        return AsyncCRMStatsType(orders=_stats_orders(filter))
+
+
+def async_mutation(mutation):
+    """Return a copy of ``mutation`` whose ``mutate`` runs the sync body in Django's sync thread."""
+    mutate = sync_to_async(mutation.mutate, thread_sensitive=True)
+
+    async def amutate(cls, root, info, **kwargs):
+        return await mutate(root, info, **kwargs)
+
+    meta = type("Meta", (), {"name": mutation._meta.name})
+    return type(mutation.__name__, (mutation,), {"mutate": classmethod(amutate), "Meta": meta})
+
+
+class Mutation(graphene.ObjectType):
+    create_customer = async_mutation(CreateCustomer).Field()
+    bulk_create_customers = async_mutation(BulkCreateCustomers).Field()
+    create_product = async_mutation(CreateProduct).Field()
+    create_order = async_mutation(CreateOrder).Field()
+    bulk_create_orders = async_mutation(BulkCreateOrders).Field()
+    update_low_stock_products = async_mutation(UpdateLowStockProducts).Field()
@@ -0,0 +1,157 @@
+"""Static cost and depth analysis for GraphQL operations.
+
+Runs on a validated document before execution. The cost approximates how many objects the
+response may hold: each object costs 1 plus its selection, leaf fields are free, a connection
+returns up to ``first``/``last`` objects (the relay max limit when neither is given) and a plain
+list field up to ``CRM_QUERY_DEFAULT_LIST_SIZE``. The ``edges``/``node`` plumbing of a
+connection counts towards neither cost nor depth.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    GraphQLSchema,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    get_named_type,
+    get_operation_ast,
+    is_leaf_type,
+)
+from graphql.execution.values import get_argument_values
+
+DEFAULT_MAX_DEPTH = 10
+DEFAULT_MAX_COST = 50000
+DEFAULT_LIST_SIZE = 100
+
+
+@dataclass
+class QueryCost:
+    cost: int
+    depth: int
+    max_cost: int
+    max_depth: int
+
+    def as_extension(self) -> Dict[str, int]:
+        return {"requestedQueryCost": self.cost, "depth": self.depth, "maximumQueryCost": self.max_cost, "maximumDepth": self.max_depth}
+
+
+def _is_list(type_) -> bool:
+    while isinstance(type_, GraphQLNonNull):
+        type_ = type_.of_type
+    return isinstance(type_, GraphQLList)
+
+
+def _is_connection(named_type) -> bool:
+    return isinstance(named_type, GraphQLObjectType) and named_type.name.endswith("Connection") and "edges" in named_type.fields
+
+
+class CostAnalyzer:
+    def __init__(self, schema: GraphQLSchema, document: DocumentNode, variables: Optional[Dict[str, Any]] = None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        self.default_connection_size = graphene_settings.RELAY_CONNECTION_MAX_LIMIT or DEFAULT_LIST_SIZE
+        self.default_list_size = getattr(settings, "CRM_QUERY_DEFAULT_LIST_SIZE", DEFAULT_LIST_SIZE)
+
+    def analyze(self, operation: OperationDefinitionNode):
+        root_type = self.schema.get_root_type(operation.operation)
+        return self._selection_set(root_type, operation.selection_set, set())
+
+    def _selection_set(self, parent_type, selection_set: Optional[SelectionSetNode], visited_fragments):
+        cost, depth = 0, 0
+        if selection_set is None:
+            return cost, depth
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field_cost, field_depth = self._field(parent_type, selection, visited_fragments)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value) or parent_type
+                field_cost, field_depth = self._selection_set(fragment_type, selection.selection_set, visited_fragments)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited_fragments:
+                    continue
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value) or parent_type
+                field_cost, field_depth = self._selection_set(fragment_type, fragment.selection_set, visited_fragments | {name})
+            else:
+                continue
+            cost += field_cost
+            depth = max(depth, field_depth)
+        return cost, depth
+
+    def _field(self, parent_type, node: FieldNode, visited_fragments):
+        name = node.name.value
+        if name.startswith("__"):
+            return 0, 0
+        fields = getattr(parent_type, "fields", None) or {}
+        field_def = fields.get(name)
+        if field_def is None:
+            return 0, 0
+        named_type = get_named_type(field_def.type)
+        if is_leaf_type(named_type):
+            return 0, 1
+        child_cost, child_depth = self._selection_set(named_type, node.selection_set, visited_fragments)
+        if (_is_connection(parent_type) and name == "edges") or (name == "node" and parent_type.name.endswith("Edge")):
+            # Connection plumbing: the multiplier was already applied on the connection field.
+            return child_cost, child_depth
+        return self._multiplier(field_def, node, named_type) * (1 + child_cost), 1 + child_depth
+
+    def _multiplier(self, field_def, node: FieldNode, named_type) -> int:
+        if _is_connection(named_type):
+            try:
+                args = get_argument_values(field_def, node, self.variables)
+            except GraphQLError:
+                args = {}
+            size = args.get("first") or args.get("last") or self.default_connection_size
+            return max(int(size), 1)
+        if _is_list(field_def.type):
+            return self.default_list_size
+        return 1
+
+
+def analyze_query(schema: GraphQLSchema, document: DocumentNode, operation_name=None, variables=None) -> Optional[QueryCost]:
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return None
+    cost, depth = CostAnalyzer(schema, document, variables).analyze(operation)
+    return QueryCost(
+        cost=cost,
+        depth=depth,
+        max_cost=getattr(settings, "CRM_QUERY_MAX_COST", DEFAULT_MAX_COST),
+        max_depth=getattr(settings, "CRM_QUERY_MAX_DEPTH", DEFAULT_MAX_DEPTH),
+    )
+
+
+def check_query_cost(query_cost: Optional[QueryCost]) -> None:
+    """Raise a GraphQLError when the analysed operation exceeds the configured limits."""
+    if query_cost is None:
+        return
+    if query_cost.depth > query_cost.max_depth:
+        raise GraphQLError(
+            f"Query depth {query_cost.depth} exceeds the maximum depth of {query_cost.max_depth}.",
+            extensions={"code": "QUERY_TOO_DEEP", "cost": query_cost.as_extension()},
+        )
+    if query_cost.cost > query_cost.max_cost:
+        raise GraphQLError(
+            f"Query cost {query_cost.cost} exceeds the maximum cost of {query_cost.max_cost}.",
+            extensions={"code": "QUERY_TOO_COMPLEX", "cost": query_cost.as_extension()},
+        )
@@ -1,6 +1,20 @@
 import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+
+from crm.graphql_client import execute_graphql
+
+HEARTBEAT_QUERY = "query { hello }"
+
+LOW_STOCK_MUTATION = """
+mutation UpdateLowStock {
+  updateLowStockProducts {
+    products {
+      name
+      stock
+    }
+    message
+  }
+}
+"""
 
 
 def log_crm_heartbeat():
@@ -9,10 +23,7 @@ def log_crm_heartbeat():
 
     # Optionally query the GraphQL hello field
     try:
-        transport = RequestsHTTPTransport(url='http://localhost:8000/graphql')
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-        query = gql("query { hello }")
-        result = client.execute(query)
+        result = execute_graphql(HEARTBEAT_QUERY)
         if result.get('hello'):
             message += " - GraphQL endpoint responsive"
     except Exception as e:
@@ -25,21 +36,8 @@ def log_crm_heartbeat():
 def update_low_stock():
     # Execute the UpdateLowStockProducts mutation
     try:
-        transport = RequestsHTTPTransport(url='http://localhost:8000/graphql')
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-        mutation = gql("""
-        mutation UpdateLowStock {
-          updateLowStockProducts {
-            products {
-              name
-              stock
-            }
-            message
-          }
-        }
-        """)
-        result = client.execute(mutation)
-        
+        result = execute_graphql(LOW_STOCK_MUTATION)
+
         # Log the updates
         timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         with open('/tmp/low_stock_updates_log.txt', 'a') as f:
@@ -49,4 +47,4 @@ def update_low_stock():
     except Exception as e:
         timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         with open('/tmp/low_stock_updates_log.txt', 'a') as f:
-            f.write(f"{timestamp}: Error updating low stock products: {str(e)}\n")
\ No newline at end of file
+            f.write(f"{timestamp}: Error updating low stock products: {str(e)}\n")
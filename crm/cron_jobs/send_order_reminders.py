@@ -1,38 +1,20 @@
 #!/usr/bin/env python3
 
-import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+import os
+import sys
 
-# GraphQL endpoint
-transport = RequestsHTTPTransport(url='http://localhost:8000/graphql')
-client = Client(transport=transport, fetch_schema_from_transport=True)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql.settings')
 
-# Query for orders in the last 7 days
-seven_days_ago = (datetime.datetime.now() - datetime.timedelta(days=7)).isoformat()
+import django  # noqa: E402
 
-query = gql(f"""
-query GetRecentOrders {{
-  allOrders(filter: {{orderDateGte: "{seven_days_ago}"}}) {{
-    edges {{
-      node {{
-        databaseId
-        customer {{
-          email
-        }}
-      }}
-    }}
-  }}
-}}
-""")
+django.setup()
 
-result = client.execute(query)
+from django.core.management import call_command  # noqa: E402
 
-# Log the results
-with open('/tmp/order_reminders_log.txt', 'a') as f:
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    for edge in result['allOrders']['edges']:
-        order = edge['node']
-        f.write(f"{timestamp}: Order ID {order['databaseId']}, Customer Email {order['customer']['email']}\n")
+# Remind customers about orders placed since the last run (see crm/management/commands/send_order_reminders.py);
+# reminders already sent are never sent again.
+call_command('send_order_reminders', days=7, log_file='/tmp/order_reminders_log.txt')
 
-print("Order reminders processed!")
\ No newline at end of file
+print("Order reminders processed!")
@@ -1,59 +1,20 @@
 #!/usr/bin/env python3
 
-import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+import os
+import sys
 
-# GraphQL endpoint
-transport = RequestsHTTPTransport(url='http://localhost:8000/graphql')
-client = Client(transport=transport, fetch_schema_from_transport=True)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql.settings')
 
-# Query for orders in the last 7 days
-query = gql("""
-query GetRecentOrders {
-  allOrders(filter: {orderDateGte: "LAST_7_DAYS"}) {
-    edges {
-      node {
-        id
-        customer {
-          email
-        }
-      }
-    }
-  }
-}
-""")
+import django  # noqa: E402
 
-# But the filter is order_date_gte, so I need to calculate the date.
+django.setup()
 
-# Actually, looking at the schema, OrderFilterInput has order_date_gte and order_date_lte
+from django.core.management import call_command  # noqa: E402
 
-# So, I need to set order_date_gte to 7 days ago.
+# Remind customers about orders placed since the last run (see crm/management/commands/send_order_reminders.py);
+# reminders already sent are never sent again.
+call_command('send_order_reminders', days=7, log_file='/tmp/order_reminders_log.txt')
 
-seven_days_ago = (datetime.datetime.now() - datetime.timedelta(days=7)).isoformat()
-
-query = gql(f"""
-query GetRecentOrders {{
-  allOrders(filter: {{orderDateGte: "{seven_days_ago}"}}) {{
-    edges {{
-      node {{
-        databaseId
-        customer {{
-          email
-        }}
-      }}
-    }}
-  }}
-}}
-""")
-
-result = client.execute(query)
-
-# Log the results
-with open('/tmp/order_reminders_log.txt', 'a') as f:
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    for edge in result['allOrders']['edges']:
-        order = edge['node']
-        f.write(f"{timestamp}: Order ID {order['databaseId']}, Customer Email {order['customer']['email']}\n")
-
-print("Order reminders processed!")
\ No newline at end of file
+print("Order reminders processed!")
@@ -0,0 +1,291 @@
+import inspect
+from functools import partial
+
+import graphene
+from django.db.models.query import QuerySet
+from graphene.relay import PageInfo
+from graphene.relay.connection import connection_adapter, page_info_adapter
+from graphene.types.argument import to_arguments
+from graphene_django.fields import DjangoConnectionField
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.settings import graphene_settings
+from graphene_django.utils import maybe_queryset
+from graphql import GraphQLError
+from graphql_relay import connection_from_array_slice, cursor_to_offset, get_offset_with_default, offset_to_cursor
+from promise import Promise
+
+from crm.loaders import RelationWindow, get_loaders, is_async_context
+from crm.pagination import akeyset_paginate, keyset_paginate
+
+
+class CountableConnection(graphene.relay.Connection):
+    """Connection exposing ``totalCount``, the number of rows matching the query across all pages."""
+
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int(required=True)
+
+    def resolve_total_count(self, info):
+        # Offset pagination already counted the rows to place the page.
+        if getattr(self, "length", None) is not None:
+            return self.length
+        if is_async_context(info.context):
+            return self.iterable.acount()
+        return self.iterable.count()
+
+
+def relation_window(args) -> RelationWindow:
+    """The part of a relation the connection arguments ``args`` select, for the relation loaders."""
+    first, last = args.get("first"), args.get("last")
+    if first is None and last is None:
+        # DjangoConnectionField pages by the relay max limit when neither is given.
+        first = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+    after = get_offset_with_default(args.get("after"), -1)
+    if args.get("offset"):
+        after += args["offset"]
+    before = args.get("before")
+    return RelationWindow(after, None if before is None else get_offset_with_default(before), first, last)
+
+
+def _prime_page(info, connection):
+    def prime(resolved):
+        get_loaders(info.context).prime(edge.node for edge in resolved.edges)
+        return resolved
+
+    if inspect.isawaitable(connection):
+
+        async def await_connection():
+            return prime(await connection)
+
+        return await_connection()
+    if Promise.is_thenable(connection):
+        return Promise.resolve(connection).then(prime)
+    return prime(connection)
+
+
+def _check_limits(args, info, max_limit, enforce_first_or_last):
+    """The argument checks DjangoConnectionField runs before resolving, shared by the async path."""
+    first, last = args.get("first"), args.get("last")
+    if enforce_first_or_last and not (first or last):
+        raise GraphQLError(f"You must provide a `first` or `last` value to properly paginate the `{info.field_name}` connection.")
+    if max_limit:
+        for name, value in (("first", first), ("last", last)):
+            if value and value > max_limit:
+                raise GraphQLError(
+                    f"Requesting {value} records on the `{info.field_name}` connection exceeds the "
+                    f"`{name}` limit of {max_limit} records."
+                )
+    if args.get("offset") is not None and args.get("before") is not None:
+        raise GraphQLError(
+            f"You can't provide a `before` value at the same time as an `offset` value to properly paginate the `{info.field_name}` connection."
+        )
+
+
+def _keyset_first(args, info, max_limit) -> int:
+    if args.get("last") or args.get("before") or args.get("offset"):
+        raise GraphQLError("Keyset pagination supports forward paging with first/after only.")
+    first = args.get("first") or max_limit
+    if not first or first < 0:
+        raise GraphQLError("Keyset pagination requires a positive first value.")
+    if max_limit and first > max_limit:
+        raise GraphQLError(
+            f"Requesting {first} records on the `{info.field_name}` connection exceeds the "
+            f"`first` limit of {max_limit} records."
+        )
+    return first
+
+
+def _keyset_connection(connection, page, args, queryset):
+    edges = [connection.Edge(node=node, cursor=cursor) for node, cursor in zip(page.items, page.cursors)]
+    resolved = connection(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=page.cursors[0] if page.cursors else None,
+            end_cursor=page.cursors[-1] if page.cursors else None,
+            has_previous_page=bool(args.get("after")),
+            has_next_page=page.has_next_page,
+        ),
+    )
+    # Keyset pages never count the full result; CountableConnection counts it only when asked.
+    resolved.iterable = queryset
+    resolved.length = None
+    return resolved
+
+
+async def _aresolve_connection(connection, args, iterable, max_limit=None):
+    """Async counterpart of ``DjangoConnectionField.resolve_connection``.
+
+    Only the requested window is fetched, with ``acount`` and an async slice, and handed to
+    ``connection_from_array_slice`` as a pre-sliced page.
+    """
+    offset = args.pop("offset", None)
+    after = args.get("after")
+    if offset:
+        if after:
+            offset += cursor_to_offset(after) + 1
+        args["after"] = offset_to_cursor(offset - 1)
+    if max_limit is not None and args.get("first") is None and args.get("last") is None:
+        args["first"] = max_limit
+
+    iterable = maybe_queryset(iterable)
+    if isinstance(iterable, QuerySet):
+        array_length = await iterable.acount()
+    else:
+        iterable = list(iterable)
+        array_length = len(iterable)
+
+    start = min(get_offset_with_default(args.get("after"), -1) + 1, array_length)
+    end = array_length
+    before_offset = get_offset_with_default(args.get("before"), end)
+    if 0 <= before_offset < array_length:
+        end = min(end, before_offset)
+    if isinstance(args.get("first"), int):
+        end = min(end, start + args["first"])
+    if isinstance(args.get("last"), int):
+        start = max(start, end - args["last"])
+    start, end = max(start, 0), max(end, start)
+
+    if isinstance(iterable, QuerySet):
+        items = [item async for item in iterable[start:end]]
+    else:
+        items = iterable[start:end]
+    resolved = connection_from_array_slice(
+        items,
+        args,
+        slice_start=start,
+        array_length=array_length,
+        array_slice_length=len(items),
+        connection_type=partial(connection_adapter, connection),
+        edge_type=connection.Edge,
+        page_info_type=page_info_adapter,
+    )
+    resolved.iterable = iterable
+    resolved.length = array_length
+    return resolved
+
+
+class CRMConnectionField(DjangoConnectionField):
+    """Relation connection whose resolver may hand back a loader result, sync or awaitable."""
+
+    @classmethod
+    def connection_resolver(
+        cls,
+        resolver,
+        connection,
+        default_manager,
+        queryset_resolver,
+        max_limit,
+        enforce_first_or_last,
+        root,
+        info,
+        **args,
+    ):
+        resolve = partial(
+            super().connection_resolver,
+            connection=connection,
+            default_manager=default_manager,
+            queryset_resolver=queryset_resolver,
+            max_limit=max_limit,
+            enforce_first_or_last=enforce_first_or_last,
+            root=root,
+            info=info,
+        )
+        iterable = resolver(root, info, **args)
+        if inspect.isawaitable(iterable):
+
+            async def await_iterable():
+                resolved = await iterable
+                return resolve(lambda *_, **__: resolved, **args)
+
+            return await_iterable()
+        return resolve(lambda *_, **__: iterable, **args)
+
+
+class CRMFilterConnectionField(DjangoFilterConnectionField):
+    """Filter connection that primes the request loaders with every row of the page.
+
+    Passing ``keyset: true`` switches from offset cursors to keyset cursors built from the
+    active ``orderBy`` plus the primary key (forward paging with ``first``/``after`` only).
+    Under the async view the page is fetched with the async ORM instead.
+    """
+
+    def __init__(self, type_, *args, order_by=None, **kwargs):
+        kwargs.setdefault("keyset", graphene.Boolean(default_value=False))
+        super().__init__(type_, *args, **kwargs)
+        # DjangoFilterConnectionField swallows ``order_by`` as a filterset option; expose it as
+        # an argument so resolvers receive the requested ordering.
+        if order_by is not None:
+            self._base_args = to_arguments(self._base_args or {}, {"order_by": order_by})
+
+    @classmethod
+    def connection_resolver(
+        cls,
+        resolver,
+        connection,
+        default_manager,
+        queryset_resolver,
+        max_limit,
+        enforce_first_or_last,
+        root,
+        info,
+        **args,
+    ):
+        if is_async_context(info.context):
+            return cls._aconnection_resolver(
+                resolver, connection, default_manager, queryset_resolver, max_limit, enforce_first_or_last, root, info, **args
+            )
+        if not args.get("keyset"):
+            return super().connection_resolver(
+                resolver,
+                connection,
+                default_manager,
+                queryset_resolver,
+                max_limit,
+                enforce_first_or_last,
+                root,
+                info,
+                **args,
+            )
+        first = _keyset_first(args, info, max_limit)
+        iterable = resolver(root, info, **args)
+        if iterable is None:
+            iterable = default_manager
+        queryset = queryset_resolver(connection, iterable, info, args)
+        return _keyset_connection(connection, keyset_paginate(queryset, first, args.get("after")), args, queryset)
+
+    @classmethod
+    async def _aconnection_resolver(
+        cls,
+        resolver,
+        connection,
+        default_manager,
+        queryset_resolver,
+        max_limit,
+        enforce_first_or_last,
+        root,
+        info,
+        **args,
+    ):
+        first = _keyset_first(args, info, max_limit) if args.get("keyset") else None
+        if first is None:
+            _check_limits(args, info, max_limit, enforce_first_or_last)
+        iterable = resolver(root, info, **args)
+        if inspect.isawaitable(iterable):
+            iterable = await iterable
+        if iterable is None:
+            iterable = default_manager
+        queryset = queryset_resolver(connection, iterable, info, args)
+        if first is not None:
+            return _keyset_connection(
+                connection, await akeyset_paginate(queryset, first, args.get("after")), args, queryset
+            )
+        return await _aresolve_connection(connection, args, queryset, max_limit=max_limit)
+
+    def wrap_resolve(self, parent_resolver):
+        resolve_connection = super().wrap_resolve(parent_resolver)
+
+        def resolve(root, info, **args):
+            return _prime_page(info, resolve_connection(root, info, **args))
+
+        return resolve
@@ -1,14 +1,61 @@
 import django_filters
+from django.db import connections
+from django.db.models import Exists, OuterRef
+from django_filters.constants import EMPTY_VALUES
 
+from crm import search
 from crm.models import Customer, Order, Product
 
 
+def _linked_to(queryset, relation, lookup, value):
+    """Keep rows with a row in many-to-many ``relation``'s through table matching ``lookup``.
+
+    A semi-join never repeats rows, so no DISTINCT is needed. It is written as ``EXISTS``, which
+    PostgreSQL, MySQL and Oracle plan from whichever side is cheaper. SQLite runs a correlated
+    ``EXISTS`` once per outer row, so there it is ``pk IN (SELECT ...)``, driven by the through
+    table's index.
+    """
+    field = queryset.model._meta.get_field(relation)
+    through = field.remote_field.through._default_manager.using(queryset.db)
+    links = through.filter(**{f'{field.m2m_reverse_field_name()}__{lookup}': value})
+    if connections[queryset.db].vendor == 'sqlite':
+        return queryset.filter(pk__in=links.values(field.m2m_field_name()))
+    return queryset.filter(Exists(links.filter(**{field.m2m_field_name(): OuterRef('pk')})))
+
+
+class SubstringFilter(django_filters.CharFilter):
+    """Case-insensitive substring filter answered by the search index (see ``crm.search``).
+
+    ``field_name`` may follow one relation (``customer__name``). A many-to-many relation is
+    matched with a semi-join, so it never duplicates the filtered rows.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        relation, _, field = self.field_name.rpartition('__')
+        if not relation:
+            return search.contains(qs, field, value)
+        relation_field = qs.model._meta.get_field(relation)
+        related = relation_field.related_model._default_manager.using(qs.db).all()
+        matches = search.contains(related, field, value).values('pk')
+        if relation_field.many_to_many:
+            return _linked_to(qs, relation, 'in', matches)
+        return qs.filter(**{f'{relation}__in': matches})
+
+
 class CustomerFilter(django_filters.FilterSet):
-    name_icontains = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
-    email_icontains = django_filters.CharFilter(field_name='email', lookup_expr='icontains')
+    name_icontains = SubstringFilter(field_name='name')
+    email_icontains = SubstringFilter(field_name='email')
     created_at_gte = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='gte')
     created_at_lte = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='lte')
     phone_pattern = django_filters.CharFilter(method='filter_phone_pattern')
+    last_order_at_gte = django_filters.DateTimeFilter(field_name='last_order_at', lookup_expr='gte')
+    last_order_at_lte = django_filters.DateTimeFilter(field_name='last_order_at', lookup_expr='lte')
+    order_count_gte = django_filters.NumberFilter(field_name='order_count', lookup_expr='gte')
+    order_count_lte = django_filters.NumberFilter(field_name='order_count', lookup_expr='lte')
+    lifetime_value_gte = django_filters.NumberFilter(field_name='lifetime_value', lookup_expr='gte')
+    lifetime_value_lte = django_filters.NumberFilter(field_name='lifetime_value', lookup_expr='lte')
 
     class Meta:
         model = Customer
@@ -18,16 +65,25 @@ class CustomerFilter(django_filters.FilterSet):
             'created_at_gte',
             'created_at_lte',
             'phone_pattern',
+            'last_order_at_gte',
+            'last_order_at_lte',
+            'order_count_gte',
+            'order_count_lte',
+            'lifetime_value_gte',
+            'lifetime_value_lte',
         )
 
     def filter_phone_pattern(self, queryset, name, value):
         if not value:
             return queryset
-        return queryset.filter(phone__startswith=value)
+        # A half-open range is the same prefix match as startswith but can use the phone index
+        # on every backend (LIKE 'x%' only can under specific collations).
+        upper_bound = value[:-1] + chr(ord(value[-1]) + 1)
+        return queryset.filter(phone__gte=value, phone__lt=upper_bound)
 
 
 class ProductFilter(django_filters.FilterSet):
-    name_icontains = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name_icontains = SubstringFilter(field_name='name')
     price_gte = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     price_lte = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
     stock_gte = django_filters.NumberFilter(field_name='stock', lookup_expr='gte')
@@ -49,9 +105,9 @@ class OrderFilter(django_filters.FilterSet):
     total_amount_lte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='lte')
     order_date_gte = django_filters.DateTimeFilter(field_name='order_date', lookup_expr='gte')
     order_date_lte = django_filters.DateTimeFilter(field_name='order_date', lookup_expr='lte')
-    customer_name = django_filters.CharFilter(field_name='customer__name', lookup_expr='icontains')
-    product_name = django_filters.CharFilter(field_name='products__name', lookup_expr='icontains')
-    product_id = django_filters.NumberFilter(field_name='products__id')
+    customer_name = SubstringFilter(field_name='customer__name')
+    product_name = SubstringFilter(field_name='products__name')
+    product_id = django_filters.NumberFilter(method='filter_product_id')
 
     class Meta:
         model = Order
@@ -64,3 +120,8 @@ class OrderFilter(django_filters.FilterSet):
             'product_name',
             'product_id',
         )
+
+    def filter_product_id(self, queryset, name, value):
+        if value is None:
+            return queryset
+        return _linked_to(queryset, 'products', 'exact', value)
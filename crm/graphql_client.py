@@ -0,0 +1,94 @@
+"""Run GraphQL documents for scheduled jobs.
+
+Cron jobs and Celery tasks execute their documents in-process against
+``alx_backend_graphql.schema.schema`` by default. Set ``CRM_GRAPHQL_EXECUTOR`` to
+``"http"`` (setting or environment variable) to go through the web endpoint instead.
+"""
+
+import os
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from graphql import DocumentNode, execute
+
+from crm.persisted_queries import document_cache
+from crm.replicas import ReplicaExecutionContext
+
+DEFAULT_GRAPHQL_URL = "http://localhost:8000/graphql"
+IN_PROCESS = "inprocess"
+HTTP = "http"
+
+
+class GraphQLExecutionError(Exception):
+    def __init__(self, errors: List[Any]):
+        self.errors = errors
+        super().__init__("; ".join(str(getattr(error, "message", error)) for error in errors))
+
+
+def _parse_and_validate(source: str) -> DocumentNode:
+    """Fetch ``source`` from the shared document cache; invalid documents raise."""
+    from alx_backend_graphql.schema import schema
+
+    document, errors = document_cache.get(schema.graphql_schema, source)
+    if errors:
+        raise GraphQLExecutionError(errors)
+    return document
+
+
+def _release_connections() -> None:
+    """Close expired or broken connections, as Django does around each web request."""
+    # Inside a caller's transaction closing would abort it; the caller owns the connection then.
+    if not any(connection.in_atomic_block for connection in connections.all(initialized_only=True)):
+        close_old_connections()
+
+
+class InProcessExecutor:
+    def execute(self, source: str, variables: Optional[Dict] = None, operation_name: Optional[str] = None) -> Dict:
+        from alx_backend_graphql.schema import schema
+
+        document = _parse_and_validate(source)
+        # Long-lived workers (Celery) reuse their persistent connection within CONN_MAX_AGE.
+        _release_connections()
+        try:
+            result = execute(
+                schema.graphql_schema,
+                document,
+                context_value=SimpleNamespace(),
+                variable_values=variables,
+                operation_name=operation_name,
+                execution_context_class=ReplicaExecutionContext,
+            )
+        finally:
+            _release_connections()
+        if result.errors:
+            raise GraphQLExecutionError(result.errors)
+        return result.data
+
+
+class HTTPExecutor:
+    def __init__(self, url: Optional[str] = None, fetch_schema: bool = False):
+        self.url = url or getattr(settings, "CRM_GRAPHQL_URL", DEFAULT_GRAPHQL_URL)
+        self.fetch_schema = fetch_schema
+
+    def execute(self, source: str, variables: Optional[Dict] = None, operation_name: Optional[str] = None) -> Dict:
+        from gql import Client, gql
+        from gql.transport.requests import RequestsHTTPTransport
+
+        transport = RequestsHTTPTransport(url=self.url)
+        client = Client(transport=transport, fetch_schema_from_transport=self.fetch_schema)
+        return client.execute(gql(source), variable_values=variables, operation_name=operation_name)
+
+
+def get_executor(mode: Optional[str] = None):
+    mode = mode or os.environ.get("CRM_GRAPHQL_EXECUTOR") or getattr(settings, "CRM_GRAPHQL_EXECUTOR", IN_PROCESS)
+    if mode == HTTP:
+        return HTTPExecutor()
+    if mode == IN_PROCESS:
+        return InProcessExecutor()
+    raise ValueError(f"Unknown GraphQL executor {mode!r}; expected {IN_PROCESS!r} or {HTTP!r}.")
+
+
+def execute_graphql(source: str, variables: Optional[Dict] = None, operation_name: Optional[str] = None) -> Dict:
+    return get_executor().execute(source, variables=variables, operation_name=operation_name)
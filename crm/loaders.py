@@ -0,0 +1,403 @@
+"""Per-request batching loaders for CRM relations.
+
+Graphene resolves relations one row at a time, so a page of 100 orders asking for
+``customer`` and ``products`` would otherwise issue 200 queries. Connection fields queue
+the keys of every row on the page (see ``CRMLoaders.prime``); the first resolver that
+reads a queued key fetches the whole queue in one query and every other row is served
+from the cache.
+
+Relation connections load ``(key, RelationWindow)`` pairs. The page of every key in the batch
+comes from one ``ROW_NUMBER()`` window query that also counts each key's rows, so neither
+``first: 5`` nor ``last: 5`` reads a customer's whole order history.
+
+The async view uses ``AsyncCRMLoaders`` instead: ``load`` returns a future and every key
+requested during one turn of the event loop is fetched in a single async ORM query.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.db.models import Count, F, Value, Window
+from django.db.models.functions import Least, RowNumber
+
+from crm.models import Customer, Order, OrderItem, Product
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_ATTRIBUTE = "crm_loaders"
+
+
+@dataclass
+class LoaderStats:
+    batches: int = 0
+    keys_loaded: int = 0
+    hits: int = 0
+    misses: int = 0
+
+
+class DataLoader:
+    """Caches values by key and fetches queued keys together in one batch."""
+
+    def __init__(self, name: str, batch_load_fn: Callable[[List[Hashable]], Dict[Hashable, Any]], default=None):
+        self.name = name
+        self.stats = LoaderStats()
+        self._batch_load_fn = batch_load_fn
+        self._default = default
+        self._cache: Dict[Hashable, Any] = {}
+        self._queue: Dict[Hashable, None] = {}
+
+    def queue(self, keys: Iterable[Hashable]) -> None:
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._queue[key] = None
+
+    def load(self, key: Hashable):
+        if key in self._cache:
+            self.stats.hits += 1
+            return self._cache[key]
+        self.stats.misses += 1
+        self._queue[key] = None
+        self.dispatch()
+        return self._cache[key]
+
+    def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        keys = list(keys)
+        self.queue(keys)
+        return [self.load(key) for key in keys]
+
+    def prime(self, key: Hashable, value: Any) -> None:
+        self._cache.setdefault(key, value)
+        self._queue.pop(key, None)
+
+    def dispatch(self) -> None:
+        keys = list(self._queue)
+        self._queue.clear()
+        if not keys:
+            return
+        results = self._batch_load_fn(keys)
+        self.stats.batches += 1
+        self.stats.keys_loaded += len(keys)
+        for key in keys:
+            value = results.get(key)
+            if value is None:
+                value = self._default() if callable(self._default) else self._default
+            self._cache[key] = value
+
+
+class RelationWindow(NamedTuple):
+    """The rows of a relation one connection page covers, in graphql-relay's offset terms."""
+
+    after: int = -1
+    before: Optional[int] = None
+    first: Optional[int] = None
+    last: Optional[int] = None
+
+
+class RelationPage:
+    """Rows of a relation page at their positions in the full relation of ``length`` rows.
+
+    Slices keep those positions, so ``connection_from_array_slice`` picks the page out of it
+    exactly as it would out of the whole relation.
+    """
+
+    def __init__(self, rows: List[Any], start: int, length: int):
+        self.rows = rows
+        self.start = start
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index: slice) -> "RelationPage":
+        start, stop, _ = index.indices(self.length)
+        stop = max(start, stop)
+        low = min(max(self.start, start), stop)
+        high = max(min(self.start + len(self.rows), stop), low)
+        return RelationPage(self.rows[low - self.start:high - self.start], low - start, stop - start)
+
+
+class WindowedDataLoader(DataLoader):
+    """DataLoader over ``(key, RelationWindow)`` pairs, each resolving to a ``RelationPage``.
+
+    ``queue`` takes bare keys; they join the next batch at whatever window it loads.
+    """
+
+    def __init__(self, name: str, batch_load_fn: Callable[[List[Hashable]], Dict[Hashable, Any]], default=None):
+        super().__init__(name, batch_load_fn, default)
+        self._pending: Dict[Hashable, None] = {}
+
+    def queue(self, keys: Iterable[Hashable]) -> None:
+        for key in keys:
+            if key is not None:
+                self._pending[key] = None
+
+    def load(self, key: Tuple[Hashable, RelationWindow]):
+        _, window = key
+        super().queue([(pending, window) for pending in self._pending])
+        self._pending.clear()
+        return super().load(key)
+
+    def load_many(self, keys: Iterable[Tuple[Hashable, RelationWindow]]) -> List[Any]:
+        keys = list(keys)
+        self.queue(key for key, _ in keys)
+        return [self.load(key) for key in keys]
+
+
+def _by_window(keys: Iterable[Tuple[Hashable, RelationWindow]]) -> Dict[RelationWindow, List[Hashable]]:
+    groups = defaultdict(list)
+    for key, window in keys:
+        groups[window].append(key)
+    return groups
+
+
+def _window_rows(queryset, partition: str, window: RelationWindow):
+    """The rows of ``queryset`` (in id order) that ``window`` covers for each ``partition`` value.
+
+    Each row carries its 1-based ``position`` and its partition's ``total``; the bounds mirror
+    ``connection_from_array_slice``.
+    """
+    start = window.after + 1
+    queryset = queryset.annotate(
+        position=Window(RowNumber(), partition_by=F(partition), order_by=F("id").asc()),
+        total=Window(Count("id"), partition_by=F(partition)),
+    ).filter(position__gt=start)
+    bounds = [F("total")]
+    if window.before is not None:
+        bounds.append(Value(window.before))
+    if window.first is not None:
+        bounds.append(Value(start + window.first))
+    end = Least(*bounds) if len(bounds) > 1 else bounds[0]
+    if len(bounds) > 1:
+        queryset = queryset.filter(position__lte=end)
+    if window.last is not None:
+        queryset = queryset.filter(position__gt=end - window.last)
+    return queryset.order_by(partition, "id")
+
+
+def _pages(grouped: Dict[Tuple[Hashable, RelationWindow], List[Tuple[Any, int, int]]]) -> Dict:
+    return {
+        key: RelationPage([row for row, _, _ in rows], rows[0][1] - 1, rows[0][2])
+        for key, rows in grouped.items()
+    }
+
+
+def _counts(queryset, partition: str, keys: Iterable[Hashable]):
+    return queryset.filter(**{f"{partition}__in": list(keys)}).order_by().values_list(partition).annotate(count=Count("id"))
+
+
+def _empty_pages(counts, keys: Iterable[Tuple[Hashable, RelationWindow]]) -> Dict:
+    counts = dict(counts)
+    return {(pk, window): RelationPage([], 0, counts.get(pk, 0)) for pk, window in keys}
+
+
+class CRMLoaders:
+    """The set of loaders shared by every resolver of a single GraphQL request."""
+
+    def __init__(self):
+        self.customers = DataLoader("customers", self._load_customers)
+        self.items_by_order = DataLoader("items_by_order", self._load_items_by_order, default=list)
+        self.products_by_order = DataLoader("products_by_order", self._load_products_by_order, default=list)
+        self.orders_by_customer = WindowedDataLoader("orders_by_customer", self._load_orders_by_customer, default=list)
+        self.orders_by_product = WindowedDataLoader("orders_by_product", self._load_orders_by_product, default=list)
+
+    @property
+    def loaders(self) -> List[DataLoader]:
+        return [
+            self.customers,
+            self.items_by_order,
+            self.products_by_order,
+            self.orders_by_customer,
+            self.orders_by_product,
+        ]
+
+    def prime(self, instances: Iterable[Any]) -> None:
+        """Queue the relation keys of freshly loaded rows so their siblings batch together."""
+        for instance in instances:
+            if isinstance(instance, Order):
+                self.customers.queue([instance.customer_id])
+                self.items_by_order.queue([instance.pk])
+                self.products_by_order.queue([instance.pk])
+            elif isinstance(instance, Customer):
+                self.customers.prime(instance.pk, instance)
+                self.orders_by_customer.queue([instance.pk])
+            elif isinstance(instance, Product):
+                self.orders_by_product.queue([instance.pk])
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {loader.name: asdict(loader.stats) for loader in self.loaders}
+
+    def _load_customers(self, keys):
+        customers = Customer.objects.in_bulk(keys)
+        self.prime(customers.values())
+        return customers
+
+    def _load_items_by_order(self, keys):
+        grouped = defaultdict(list)
+        for item in OrderItem.objects.filter(order_id__in=keys).select_related("product").order_by("id"):
+            grouped[item.order_id].append(item)
+        self.prime(item.product for items in grouped.values() for item in items)
+        return grouped
+
+    def _load_products_by_order(self, keys):
+        # Products are read through the order's items so both fields share one query.
+        return {key: [item.product for item in items] for key, items in zip(keys, self.items_by_order.load_many(keys))}
+
+    def _load_orders_by_customer(self, keys):
+        grouped = defaultdict(list)
+        for window, customer_ids in _by_window(keys).items():
+            for order in _window_rows(Order.objects.filter(customer_id__in=customer_ids), "customer_id", window):
+                grouped[(order.customer_id, window)].append((order, order.position, order.total))
+        self.prime(order for rows in grouped.values() for order, _, _ in rows)
+        return self._with_counts(_pages(grouped), keys, Order.objects, "customer_id")
+
+    def _load_orders_by_product(self, keys):
+        grouped = defaultdict(list)
+        for window, product_ids in _by_window(keys).items():
+            rows = _window_rows(OrderItem.objects.filter(product_id__in=product_ids), "product_id", window)
+            for row in rows.select_related("order"):
+                grouped[(row.product_id, window)].append((row.order, row.position, row.total))
+        self.prime(order for rows in grouped.values() for order, _, _ in rows)
+        return self._with_counts(_pages(grouped), keys, OrderItem.objects, "product_id")
+
+    def _with_counts(self, pages, keys, queryset, partition):
+        # A window past a key's last row returns nothing, not even its total; count those keys.
+        empty = [key for key in keys if key not in pages]
+        if empty:
+            pages.update(_empty_pages(_counts(queryset, partition, {pk for pk, _ in empty}), empty))
+        return pages
+
+
+class AsyncDataLoader:
+    """Caches futures by key and fetches the keys requested in one event-loop turn together."""
+
+    def __init__(self, name: str, batch_load_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]], default=None):
+        self.name = name
+        self.stats = LoaderStats()
+        self._batch_load_fn = batch_load_fn
+        self._default = default
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._queue: Dict[Hashable, asyncio.Future] = {}
+        self._primed: Dict[Hashable, Any] = {}
+        self._dispatch_scheduled = False
+
+    def load(self, key: Hashable) -> asyncio.Future:
+        future = self._cache.get(key)
+        if future is not None:
+            self.stats.hits += 1
+            return future
+        loop = asyncio.get_running_loop()
+        if key in self._primed:
+            self.stats.hits += 1
+            future = self._cache[key] = loop.create_future()
+            future.set_result(self._primed.pop(key))
+            return future
+        self.stats.misses += 1
+        future = self._cache[key] = self._queue[key] = loop.create_future()
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(lambda: asyncio.ensure_future(self.dispatch()))
+        return future
+
+    def prime(self, key: Hashable, value: Any) -> None:
+        # Mutations prime from Django's sync thread, where there is no running loop: keep the
+        # value and resolve it on the loop at the next ``load``.
+        if key not in self._cache:
+            self._primed.setdefault(key, value)
+
+    async def dispatch(self) -> None:
+        self._dispatch_scheduled = False
+        queue, self._queue = self._queue, {}
+        if not queue:
+            return
+        try:
+            results = await self._batch_load_fn(list(queue))
+        except Exception as exc:
+            for future in queue.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.stats.batches += 1
+        self.stats.keys_loaded += len(queue)
+        for key, future in queue.items():
+            value = results.get(key)
+            if value is None:
+                value = self._default() if callable(self._default) else self._default
+            if not future.done():
+                future.set_result(value)
+
+
+class AsyncCRMLoaders(CRMLoaders):
+    """Event-loop batching loaders backed by Django's async ORM."""
+
+    def __init__(self):
+        self.customers = AsyncDataLoader("customers", self._load_customers)
+        self.items_by_order = AsyncDataLoader("items_by_order", self._load_items_by_order, default=list)
+        self.products_by_order = AsyncDataLoader("products_by_order", self._load_products_by_order, default=list)
+        self.orders_by_customer = AsyncDataLoader("orders_by_customer", self._load_orders_by_customer, default=list)
+        self.orders_by_product = AsyncDataLoader("orders_by_product", self._load_orders_by_product, default=list)
+
+    def prime(self, instances: Iterable[Any]) -> None:
+        # Sibling loads already share a batch; only seed customers so they are not fetched again.
+        for instance in instances:
+            if isinstance(instance, Customer):
+                self.customers.prime(instance.pk, instance)
+
+    async def _load_customers(self, keys):
+        return await Customer.objects.ain_bulk(keys)
+
+    async def _load_items_by_order(self, keys):
+        grouped = defaultdict(list)
+        async for item in OrderItem.objects.filter(order_id__in=keys).select_related("product").order_by("id"):
+            grouped[item.order_id].append(item)
+        return grouped
+
+    async def _load_products_by_order(self, keys):
+        groups = await asyncio.gather(*(self.items_by_order.load(key) for key in keys))
+        return {key: [item.product for item in items] for key, items in zip(keys, groups)}
+
+    async def _load_orders_by_customer(self, keys):
+        grouped = defaultdict(list)
+        for window, customer_ids in _by_window(keys).items():
+            async for order in _window_rows(Order.objects.filter(customer_id__in=customer_ids), "customer_id", window):
+                grouped[(order.customer_id, window)].append((order, order.position, order.total))
+        return await self._awith_counts(_pages(grouped), keys, Order.objects, "customer_id")
+
+    async def _load_orders_by_product(self, keys):
+        grouped = defaultdict(list)
+        for window, product_ids in _by_window(keys).items():
+            rows = _window_rows(OrderItem.objects.filter(product_id__in=product_ids), "product_id", window)
+            async for row in rows.select_related("order"):
+                grouped[(row.product_id, window)].append((row.order, row.position, row.total))
+        return await self._awith_counts(_pages(grouped), keys, OrderItem.objects, "product_id")
+
+    async def _awith_counts(self, pages, keys, queryset, partition):
+        empty = [key for key in keys if key not in pages]
+        if empty:
+            counts = [row async for row in _counts(queryset, partition, {pk for pk, _ in empty})]
+            pages.update(_empty_pages(counts, empty))
+        return pages
+
+
+def is_async_context(context) -> bool:
+    """True when ``context`` belongs to a request served by the async GraphQL view."""
+    return isinstance(getattr(context, CONTEXT_ATTRIBUTE, None), AsyncCRMLoaders)
+
+
+def get_loaders(context) -> CRMLoaders:
+    """Return the loaders attached to ``context``, creating them on first use."""
+    loaders = getattr(context, CONTEXT_ATTRIBUTE, None)
+    if loaders is None:
+        loaders = CRMLoaders()
+        try:
+            setattr(context, CONTEXT_ATTRIBUTE, loaders)
+        except AttributeError:
+            logger.debug("GraphQL context %r cannot hold loaders; batching is disabled.", context)
+    return loaders
@@ -0,0 +1,164 @@
+"""Run mixed ``createOrder`` / ``allOrders`` traffic from concurrent threads against the configured database.
+
+Each thread executes GraphQL in-process on its own connection for ``--duration`` seconds,
+writing with probability ``--write-ratio`` and otherwise reading the newest orders page. The
+command reports the database configuration, then throughput, latency and failures per operation,
+with "database is locked" errors counted separately. It creates a throwaway customer and
+product and deletes them and their orders at the end (unless ``--keep``).
+
+Settings are read once at startup, so compare configurations by running it under different
+``CRM_DB_*`` environment variables, e.g. Django's SQLite defaults against the tuned ones::
+
+    CRM_DB_SQLITE_JOURNAL_MODE=DELETE CRM_DB_SQLITE_SYNCHRONOUS=FULL \\
+        CRM_DB_SQLITE_TRANSACTION_MODE=DEFERRED python manage.py benchmark_db_concurrency
+    python manage.py benchmark_db_concurrency
+"""
+
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from alx_backend_graphql.schema import schema
+from crm.models import Customer, Order, Product
+
+CREATE_ORDER = """
+mutation PlaceOrder($input: OrderInput!) {
+  createOrder(input: $input) { order { databaseId totalAmount } }
+}
+"""
+
+ALL_ORDERS = """
+query RecentOrders {
+  allOrders(first: 20, orderBy: "-order_date") {
+    edges { node { databaseId totalAmount orderDate customer { name } } }
+  }
+}
+"""
+
+LOCKED = "database is locked"
+
+
+def _worker(seed, deadline, write_ratio, variables, results, lock):
+    rng = random.Random(seed)
+    latencies = defaultdict(list)
+    outcomes = Counter()
+    try:
+        while time.perf_counter() < deadline:
+            operation = "createOrder" if rng.random() < write_ratio else "allOrders"
+            started = time.perf_counter()
+            if operation == "createOrder":
+                result = schema.execute(CREATE_ORDER, variables=variables, context_value=SimpleNamespace())
+            else:
+                result = schema.execute(ALL_ORDERS, context_value=SimpleNamespace())
+            elapsed = time.perf_counter() - started
+            if not result.errors:
+                outcomes[(operation, "ok")] += 1
+                latencies[operation].append(elapsed)
+            elif any(LOCKED in str(error) for error in result.errors):
+                outcomes[(operation, "locked")] += 1
+            else:
+                outcomes[(operation, "failed")] += 1
+                outcomes[("error", str(result.errors[0]))] += 1
+    finally:
+        connection.close()
+        with lock:
+            results["outcomes"].update(outcomes)
+            for operation, samples in latencies.items():
+                results["latencies"][operation].extend(samples)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def _p95(samples):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[94]
+
+
+class Command(BaseCommand):
+    help = "Measure throughput and lock errors of concurrent createOrder/allOrders traffic on the configured database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent workers.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run.")
+        parser.add_argument("--write-ratio", type=float, default=0.2, help="Share of operations that are createOrder.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark customer, product and orders.")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["duration"] <= 0 or not 0 <= options["write_ratio"] <= 1:
+            raise CommandError("--threads and --duration must be positive and --write-ratio between 0 and 1.")
+        self.stdout.write(self.describe_database())
+        tag = uuid.uuid4().hex[:12]
+        customer = Customer.objects.create(name=f"Concurrency benchmark {tag}", email=f"db-benchmark-{tag}@example.com")
+        product = Product.objects.create(name=f"Concurrency benchmark {tag}", price=Decimal("1.00"), stock=10**9)
+        connection.close()
+        try:
+            self.run(customer.pk, product.pk, options)
+        finally:
+            if not options["keep"]:
+                Order.objects.filter(customer=customer).delete()
+                customer.delete()
+                product.delete()
+
+    def describe_database(self) -> str:
+        settings_dict = connection.settings_dict
+        parts = [
+            connection.vendor,
+            f"CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}",
+            f"CONN_HEALTH_CHECKS={settings_dict['CONN_HEALTH_CHECKS']}",
+        ]
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                for pragma in ("journal_mode", "synchronous", "busy_timeout"):
+                    cursor.execute(f"PRAGMA {pragma}")
+                    parts.append(f"{pragma}={cursor.fetchone()[0]}")
+            parts.append(f"transaction_mode={connection.transaction_mode or 'DEFERRED'}")
+        elif settings_dict["OPTIONS"].get("pool"):
+            parts.append(f"pool={settings_dict['OPTIONS']['pool']}")
+        return "Database: " + ", ".join(parts)
+
+    def run(self, customer_id, product_id, options):
+        variables = {"input": {"customerId": str(customer_id), "items": [{"productId": str(product_id)}]}}
+        results = {"outcomes": Counter(), "latencies": defaultdict(list)}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["duration"]
+        workers = [
+            threading.Thread(
+                target=_worker,
+                args=(options["seed"] + number, deadline, options["write_ratio"], variables, results, lock),
+            )
+            for number in range(options["threads"])
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        outcomes = results["outcomes"]
+        self.stdout.write(f"{options['threads']} threads for {elapsed:.1f}s")
+        self.stdout.write(f"{'operation':<12} {'ok':>7} {'ok/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'locked':>7} {'failed':>7}")
+        for operation in ("createOrder", "allOrders"):
+            samples = results["latencies"][operation]
+            p50 = _ms(statistics.median(samples)) if samples else "-"
+            p95 = _ms(_p95(samples)) if samples else "-"
+            ok = outcomes[(operation, "ok")]
+            self.stdout.write(
+                f"{operation:<12} {ok:>7} {ok / elapsed:>8.1f} {p50:>8} {p95:>8} "
+                f"{outcomes[(operation, 'locked')]:>7} {outcomes[(operation, 'failed')]:>7}"
+            )
+        for (kind, message), count in sorted(outcomes.items()):
+            if kind == "error":
+                self.stdout.write(f"  {count} x {message}")
@@ -0,0 +1,326 @@
+"""Benchmark a fixed suite of GraphQL operations in-process and guard against regressions.
+
+Run it against a large dataset (see ``generate_crm_data``), e.g.
+``python manage.py benchmark_graphql --baseline benchmarks/baseline.json --save-baseline`` once,
+then ``python manage.py benchmark_graphql --baseline benchmarks/baseline.json`` after a change.
+Each operation is executed through ``alx_backend_graphql.schema.schema`` with a fresh context per
+iteration (so loaders start cold) and reports p50/p95/p99 latency, the number of SQL queries
+and the peak Python memory of one extra traced iteration. Mutations run inside a transaction
+that is rolled back, so the dataset is unchanged and iterations stay comparable.
+
+Against a baseline, an operation regresses when its p50 or p95 grows by more than
+``--threshold`` (and by at least ``--min-delta-ms``), when it issues more queries, or when its
+peak memory grows by more than ``--memory-threshold``. Regressions fail the command. Variables
+are derived from the data (latest order date, the 100th-highest lifetime value), so compare
+runs on the same generated dataset.
+"""
+
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from graphql_relay import offset_to_cursor
+
+from alx_backend_graphql.schema import schema
+from crm.models import Customer, Order, OrderItem, Product
+from crm.pagination import encode_cursor
+
+PAGE_SIZE = 50
+TOP_CUSTOMERS = 100
+BULK_CUSTOMERS = 100
+RECENT_DAYS = 90
+MIN_ORDER_TOTAL = 100
+
+ORDERS_PAGE = """
+query BenchmarkOrders($filter: OrderFilterInput, $first: Int, $after: String, $keyset: Boolean) {
+  allOrders(filter: $filter, first: $first, after: $after, orderBy: "-order_date", keyset: $keyset) {
+    pageInfo { hasNextPage endCursor }
+    edges { node { id totalAmount orderDate customer { name email } products { edges { node { name price } } } } }
+  }
+}
+"""
+TOP_CUSTOMERS_QUERY = """
+query BenchmarkCustomers($filter: CustomerFilterInput, $first: Int) {
+  allCustomers(filter: $filter, first: $first, orderBy: "-lifetime_value") {
+    totalCount
+    edges { node { id name email orderCount lifetimeValue lastOrderAt } }
+  }
+}
+"""
+CREATE_ORDER = """
+mutation BenchmarkCreateOrder($input: OrderInput!) {
+  createOrder(input: $input) { order { id totalAmount } }
+}
+"""
+BULK_CREATE_CUSTOMERS = """
+mutation BenchmarkBulkCreateCustomers($input: [CustomerInput!]!) {
+  bulkCreateCustomers(input: $input) { customers { id } errors }
+}
+"""
+UPDATE_LOW_STOCK = """
+mutation BenchmarkRestock {
+  updateLowStockProducts { message products { id stock } }
+}
+"""
+
+
+@dataclass
+class Operation:
+    name: str
+    query: str
+    variables: Callable[[], dict] = dict
+    mutation: bool = False
+
+
+@dataclass
+class OperationResult:
+    name: str
+    queries: int
+    peak_memory_kib: float
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    def percentile(self, percent: float) -> float:
+        if len(self.latencies) == 1:
+            return self.latencies[0]
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[int(percent) - 1]
+
+    def summary(self) -> dict:
+        return {
+            "iterations": len(self.latencies),
+            "p50_ms": _ms(self.percentile(50)),
+            "p95_ms": _ms(self.percentile(95)),
+            "p99_ms": _ms(self.percentile(99)),
+            "mean_ms": _ms(statistics.fmean(self.latencies)),
+            "queries": self.queries,
+            "peak_memory_kib": self.peak_memory_kib,
+        }
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def build_suite(deep_offset: int) -> List[Operation]:
+    """Build the operations, deriving their variables from the data currently in the database."""
+    latest = Order.objects.order_by("-order_date", "-pk").first()
+    customer = Customer.objects.order_by("-order_count", "pk").first()
+    product = Product.objects.filter(stock__gt=0).order_by("-stock", "pk").first()
+    if latest is None or customer is None or product is None:
+        raise CommandError("The database needs customers, in-stock products and orders; run generate_crm_data first.")
+    deep_row = Order.objects.order_by("-order_date", "-pk")[deep_offset - 1 : deep_offset].first()
+    if deep_row is None:
+        raise CommandError(f"Fewer than {deep_offset} orders exist; lower --deep-offset.")
+    top_values = Customer.objects.order_by("-lifetime_value").values_list("lifetime_value", flat=True)
+    lifetime_floor = top_values[min(TOP_CUSTOMERS, top_values.count()) - 1]
+    recent_filter = {
+        "totalAmountGte": MIN_ORDER_TOTAL,
+        "orderDateGte": (latest.order_date - timedelta(days=RECENT_DAYS)).isoformat(),
+    }
+
+    def new_customers():
+        tag = uuid.uuid4().hex[:12]
+        return {
+            "input": [
+                {"name": f"Benchmark {index}", "email": f"benchmark-{tag}-{index}@example.com", "phone": "+15550100"}
+                for index in range(BULK_CUSTOMERS)
+            ]
+        }
+
+    return [
+        Operation("filtered_all_orders", ORDERS_PAGE, lambda: {"filter": recent_filter, "first": PAGE_SIZE}),
+        Operation(
+            "deep_pagination_offset",
+            ORDERS_PAGE,
+            lambda: {"first": PAGE_SIZE, "after": offset_to_cursor(deep_offset - 1)},
+        ),
+        Operation(
+            "deep_pagination_keyset",
+            ORDERS_PAGE,
+            lambda: {"first": PAGE_SIZE, "after": encode_cursor(deep_row, ["-order_date", "-pk"]), "keyset": True},
+        ),
+        Operation(
+            "all_customers",
+            TOP_CUSTOMERS_QUERY,
+            lambda: {"filter": {"lifetimeValueGte": float(lifetime_floor)}, "first": TOP_CUSTOMERS},
+        ),
+        Operation(
+            "create_order",
+            CREATE_ORDER,
+            lambda: {"input": {"customerId": str(customer.pk), "items": [{"productId": str(product.pk), "quantity": 1}]}},
+            mutation=True,
+        ),
+        Operation("bulk_create_customers", BULK_CREATE_CUSTOMERS, new_customers, mutation=True),
+        Operation("update_low_stock_products", UPDATE_LOW_STOCK, mutation=True),
+    ]
+
+
+def run_once(operation: Operation) -> float:
+    """Execute ``operation`` once and return its wall time; mutations are rolled back."""
+    variables = operation.variables()
+    started = time.perf_counter()
+    if operation.mutation:
+        with transaction.atomic():
+            result = schema.execute(operation.query, variables=variables, context_value=SimpleNamespace())
+            transaction.set_rollback(True)
+    else:
+        result = schema.execute(operation.query, variables=variables, context_value=SimpleNamespace())
+    elapsed = time.perf_counter() - started
+    if result.errors:
+        raise CommandError(f"{operation.name} failed: {result.errors[0].message}")
+    return elapsed
+
+
+def benchmark(operation: Operation, iterations: int, warmup: int) -> OperationResult:
+    counter = _QueryCounter()
+    with connection.execute_wrapper(counter):
+        for _ in range(warmup):
+            run_once(operation)
+        latencies = []
+        for _ in range(iterations):
+            counter.count = 0
+            latencies.append(run_once(operation))
+        queries = counter.count
+        # tracemalloc slows execution down, so memory is measured on a separate iteration.
+        tracemalloc.start()
+        try:
+            run_once(operation)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return OperationResult(operation.name, queries, round(peak / 1024, 1), latencies)
+
+
+def compare(current: dict, baseline: dict, threshold: float, memory_threshold: float, min_delta_ms: float) -> List[str]:
+    """Return a description of every regression of ``current`` against ``baseline``."""
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if result[key] > before[key] * (1 + threshold) and result[key] - before[key] >= min_delta_ms:
+                regressions.append(f"{name}: {key} {before[key]} -> {result[key]}")
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+        if result["peak_memory_kib"] > before["peak_memory_kib"] * (1 + memory_threshold):
+            regressions.append(f"{name}: peak_memory_kib {before['peak_memory_kib']} -> {result['peak_memory_kib']}")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = "Benchmark GraphQL queries and mutations in-process and fail on regressions against a stored baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20, help="Measured runs per operation.")
+        parser.add_argument("--warmup", type=int, default=3, help="Unmeasured runs per operation.")
+        parser.add_argument("--deep-offset", type=int, default=10000, help="Row offset for the deep pagination pages.")
+        parser.add_argument("--operations", nargs="+", help="Only run these operations.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", help="Baseline JSON file to compare against (or write with --save-baseline).")
+        parser.add_argument("--save-baseline", action="store_true", help="Write this run to --baseline instead of comparing.")
+        parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative p50/p95 increase.")
+        parser.add_argument("--memory-threshold", type=float, default=0.25, help="Allowed relative peak memory increase.")
+        parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore latency increases smaller than this.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1 or options["warmup"] < 0 or options["deep_offset"] < 1:
+            raise CommandError("--iterations and --deep-offset must be positive and --warmup non-negative.")
+        if options["save_baseline"] and not options["baseline"]:
+            raise CommandError("--save-baseline requires --baseline.")
+        suite = build_suite(options["deep_offset"])
+        if options["operations"]:
+            unknown = set(options["operations"]) - {operation.name for operation in suite}
+            if unknown:
+                raise CommandError(f"Unknown operations: {', '.join(sorted(unknown))}.")
+            suite = [operation for operation in suite if operation.name in options["operations"]]
+
+        results: Dict[str, dict] = {}
+        self.stdout.write(f"{'operation':<26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>7} {'peak KiB':>10}")
+        for operation in suite:
+            summary = benchmark(operation, options["iterations"], options["warmup"]).summary()
+            results[operation.name] = summary
+            self.stdout.write(
+                f"{operation.name:<26} {summary['p50_ms']:>9} {summary['p95_ms']:>9} {summary['p99_ms']:>9} "
+                f"{summary['queries']:>7} {summary['peak_memory_kib']:>10}"
+            )
+        report = {"meta": self.meta(options), "operations": results}
+
+        if options["output"]:
+            self.write_json(options["output"], report)
+        if options["save_baseline"]:
+            self.write_json(options["baseline"], report)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}."))
+        elif options["baseline"]:
+            self.check_baseline(options, results)
+
+    def check_baseline(self, options, results):
+        baseline = self.load_baseline(options["baseline"])
+        if baseline["meta"].get("dataset") != self.meta(options)["dataset"]:
+            self.stderr.write("Warning: the baseline was recorded on a different dataset; latencies may not compare.")
+        regressions = compare(
+            results,
+            baseline["operations"],
+            options["threshold"],
+            options["memory_threshold"],
+            options["min_delta_ms"],
+        )
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(f"  {regression}")
+            raise CommandError(f"{len(regressions)} regressions against {options['baseline']}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
+
+    @staticmethod
+    def meta(options) -> dict:
+        return {
+            "recorded_at": timezone.now().isoformat(),
+            "dataset": {
+                "customers": Customer.objects.count(),
+                "products": Product.objects.count(),
+                "orders": Order.objects.count(),
+                "order_items": OrderItem.objects.count(),
+            },
+            "database": connection.vendor,
+            "django": django.get_version(),
+            "python": platform.python_version(),
+            "iterations": options["iterations"],
+            "deep_offset": options["deep_offset"],
+        }
+
+    @staticmethod
+    def write_json(path, report):
+        with open(path, "w") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+
+    @staticmethod
+    def load_baseline(path) -> dict:
+        try:
+            with open(path) as handle:
+                baseline = json.load(handle)
+            baseline["meta"], baseline["operations"]
+        except FileNotFoundError as exc:
+            raise CommandError(f"Baseline {path} does not exist; record one with --save-baseline.") from exc
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            raise CommandError(f"Cannot read baseline {path}: {exc}") from exc
+        return baseline
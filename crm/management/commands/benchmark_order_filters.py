@@ -0,0 +1,70 @@
+"""Compare the semi-join order product filters with the JOIN + DISTINCT shape they replaced.
+
+Run it on a large dataset (``generate_crm_data --order-items 3000000`` gives about a million
+orders). Scenarios are picked from the data: the most and least ordered products (the
+``productId`` filter) and a broad and a selective ``productName`` term. Each query is timed as
+``totalCount`` (a COUNT over the whole result) and as the first ``allOrders`` page ordered by
+``-order_date``. The median of ``--iterations`` runs is reported. The semi-join is an ``EXISTS``
+subquery, or ``IN (SELECT ...)`` on SQLite (see ``crm.filters``).
+"""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from crm.filters import OrderFilter
+from crm.models import Order, OrderItem, Product
+from crm.schema import _apply_filterset
+
+PAGE_SIZE = 50
+
+
+def _median_ms(run, iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def _scenarios():
+    ranked = OrderItem.objects.values("product").annotate(orders=Count("id")).order_by("-orders", "product")
+    popular, rare = ranked.first(), ranked.order_by("orders", "product").first()
+    if popular is None:
+        raise CommandError("No orders with items; run generate_crm_data first.")
+    popular_name = Product.objects.values_list("name", flat=True).get(pk=popular["product"])
+    rare_name = Product.objects.values_list("name", flat=True).get(pk=rare["product"])
+    broad_term = popular_name.split()[0]
+    return [
+        (f"productId {popular['product']} ({popular['orders']} items)", {"product_id": popular["product"]}, {"products__id": popular["product"]}),
+        (f"productId {rare['product']} ({rare['orders']} items)", {"product_id": rare["product"]}, {"products__id": rare["product"]}),
+        (f"productName {broad_term!r}", {"product_name": broad_term}, {"products__name__icontains": broad_term}),
+        (f"productName {rare_name!r}", {"product_name": rare_name}, {"products__name__icontains": rare_name}),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Time order product filters as semi-joins against the former JOIN + DISTINCT queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=5, help="Runs per query; the median is reported.")
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        if iterations < 1:
+            raise CommandError("--iterations must be positive.")
+        self.stdout.write(f"{Order.objects.count()} orders, {OrderItem.objects.count()} order items.")
+        self.stdout.write(f"{'filter':<44} {'shape':<14} {'rows':>8} {'count ms':>9} {'page ms':>8}")
+        for label, data, join_lookups in _scenarios():
+            shapes = [
+                ("semi-join", _apply_filterset(Order.objects.all(), OrderFilter, data)),
+                ("join+distinct", Order.objects.filter(**join_lookups).distinct()),
+            ]
+            for shape, queryset in shapes:
+                page = queryset.order_by("-order_date", "-pk").values_list("pk", flat=True)[:PAGE_SIZE]
+                count_ms = _median_ms(queryset.count, iterations)
+                page_ms = _median_ms(lambda: list(page.all()), iterations)
+                self.stdout.write(f"{label:<44} {shape:<14} {queryset.count():>8} {count_ms:>9} {page_ms:>8}")
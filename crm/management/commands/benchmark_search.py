@@ -0,0 +1,89 @@
+"""Show how substring search latency scales with table size, against a plain ``icontains`` scan.
+
+Customers are bulk-inserted in steps up to each ``--sizes`` value, all inside one transaction
+that is rolled back at the end, so the database is left as it was. After each step the command
+runs ``--queries`` selective lookups (the last 8 characters before the ``@`` of an existing
+email), first through ``crm.search`` as the ``emailIcontains`` filter does and then as
+``email__icontains``. It reports p50/p95 for both: indexed search should stay roughly flat while
+the scan grows with the table. Terms matching a large share of the table cost the index as much
+as the scan, since every match is collected.
+"""
+
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from crm import search
+from crm.management.commands.generate_crm_data import FIRST_NAMES, LAST_NAMES
+from crm.models import Customer
+
+PAGE_SIZE = 50
+TERM_LENGTH = 8
+
+
+def _timed(queryset) -> float:
+    started = time.perf_counter()
+    list(queryset.values_list("pk", flat=True)[:PAGE_SIZE])
+    return time.perf_counter() - started
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+class Command(BaseCommand):
+    help = "Measure indexed substring search against icontains scans as the customer table grows (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 500000], help="Synthetic rows to add.")
+        parser.add_argument("--queries", type=int, default=50, help="Lookups per size.")
+        parser.add_argument("--backend", choices=[search.TRIGRAM, search.FTS5, search.SCAN], help="Force a search backend.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["sizes"])
+        if options["queries"] < 1 or options["batch_size"] < 1 or sizes[0] < 1:
+            raise CommandError("--sizes, --queries and --batch-size must be positive.")
+        with override_settings(CRM_SEARCH_BACKEND=options["backend"]):
+            self.stdout.write(f"Search backend: {search.backend(Customer.objects.db)}")
+            self.stdout.write(f"{'rows':>9} {'search p50':>11} {'search p95':>11} {'icontains p50':>14} {'icontains p95':>14}")
+            with transaction.atomic():
+                self.run(sizes, options["queries"], options["batch_size"], random.Random(options["seed"]))
+                transaction.set_rollback(True)
+        search.reset()
+
+    def run(self, sizes, queries, batch_size, rng):
+        tag = uuid.uuid4().hex[:8]
+        emails = []
+        for size in sizes:
+            while len(emails) < size:
+                batch = []
+                for number in range(len(emails), min(len(emails) + batch_size, size)):
+                    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                    email = f"{first}.{last}.{number}@bench-{tag}.example.com".lower()
+                    batch.append(Customer(name=f"{first} {last}", email=email))
+                    emails.append(email)
+                Customer.objects.bulk_create(batch)
+            indexed, scanned = [], []
+            for _ in range(queries):
+                # The tail of the local part holds the row number, so the term matches a handful of rows.
+                term = rng.choice(emails).partition("@")[0][-TERM_LENGTH:]
+                indexed.append(_timed(search.contains(Customer.objects.all(), "email", term)))
+                scanned.append(_timed(Customer.objects.filter(email__icontains=term)))
+            total = Customer.objects.count()
+            self.stdout.write(
+                f"{total:>9} {_ms(statistics.median(indexed)):>11} {_ms(self.p95(indexed)):>11} "
+                f"{_ms(statistics.median(scanned)):>14} {_ms(self.p95(scanned)):>14}"
+            )
+
+    @staticmethod
+    def p95(samples):
+        if len(samples) == 1:
+            return samples[0]
+        return statistics.quantiles(samples, n=100, method="inclusive")[94]
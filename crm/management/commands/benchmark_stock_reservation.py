@@ -0,0 +1,105 @@
+"""Hammer one product with concurrent ``createOrder`` mutations and check for overselling.
+
+Each worker thread runs the mutation in-process on its own database connection, so the
+reservation's row locks and conditional UPDATE see real contention. The command creates a
+throwaway customer and product, reports throughput and the split between placed orders,
+``INSUFFICIENT_STOCK`` rejections and other failures, checks that units sold never exceed the
+starting stock, then deletes what it created (unless ``--keep``).
+
+Run it against the production database engine: SQLite serialises writers, so it reports lock
+timeouts rather than row-level contention.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from alx_backend_graphql.schema import schema
+from crm.models import Customer, Order, OrderItem, Product
+
+MUTATION = """
+mutation PlaceOrder($input: OrderInput!) {
+  createOrder(input: $input) { order { databaseId } }
+}
+"""
+
+
+def _place_orders(customer_id, product_id, quantity, count, results, lock):
+    variables = {"input": {"customerId": str(customer_id), "items": [{"productId": str(product_id), "quantity": quantity}]}}
+    outcomes = Counter()
+    try:
+        for _ in range(count):
+            result = schema.execute(MUTATION, variables=variables, context_value=SimpleNamespace())
+            if not result.errors:
+                outcomes["placed"] += 1
+            elif any((error.extensions or {}).get("code") == "INSUFFICIENT_STOCK" for error in result.errors):
+                outcomes["rejected"] += 1
+            else:
+                outcomes["failed"] += 1
+                outcomes[f"error: {result.errors[0].message}"] += 1
+    finally:
+        connection.close()
+        with lock:
+            results.update(outcomes)
+
+
+class Command(BaseCommand):
+    help = "Place concurrent orders for one hot product and report throughput, rejections and overselling."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent workers.")
+        parser.add_argument("--orders", type=int, default=50, help="Orders each worker attempts.")
+        parser.add_argument("--stock", type=int, default=500, help="Starting stock of the benchmark product.")
+        parser.add_argument("--quantity", type=int, default=1, help="Units per order.")
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark customer, product and orders.")
+
+    def handle(self, *args, **options):
+        threads, orders, quantity = options["threads"], options["orders"], options["quantity"]
+        if min(threads, orders, quantity) < 1 or options["stock"] < 0:
+            raise CommandError("--threads, --orders and --quantity must be positive and --stock non-negative.")
+        tag = uuid.uuid4().hex[:12]
+        customer = Customer.objects.create(name=f"Stock benchmark {tag}", email=f"stock-benchmark-{tag}@example.com")
+        product = Product.objects.create(name=f"Stock benchmark {tag}", price=Decimal("1.00"), stock=options["stock"])
+        try:
+            self.run(customer.pk, product.pk, options["stock"], quantity, threads, orders)
+        finally:
+            if not options["keep"]:
+                Order.objects.filter(customer=customer).delete()
+                customer.delete()
+                product.delete()
+
+    def run(self, customer_id, product_id, stock, quantity, threads, orders):
+        results = Counter()
+        lock = threading.Lock()
+        workers = [
+            threading.Thread(target=_place_orders, args=(customer_id, product_id, quantity, orders, results, lock))
+            for _ in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        remaining = Product.objects.filter(pk=product_id).values_list("stock", flat=True).get()
+        sold = OrderItem.objects.filter(product_id=product_id).aggregate(units=Sum("quantity"))["units"] or 0
+        attempted = threads * orders
+        self.stdout.write(
+            f"{attempted} orders from {threads} threads in {elapsed:.2f}s ({attempted / elapsed:.1f} orders/s): "
+            f"{results['placed']} placed, {results['rejected']} rejected for stock, {results['failed']} failed."
+        )
+        for key, count in sorted(results.items()):
+            if key.startswith("error: "):
+                self.stdout.write(f"  {count} x {key[7:]}")
+        self.stdout.write(f"Stock {stock} -> {remaining}; {sold} units sold.")
+        if sold > stock or remaining != stock - sold or sold != results["placed"] * quantity:
+            raise CommandError("Stock accounting mismatch: inventory was oversold or orders lost their items.")
+        self.stdout.write(self.style.SUCCESS("No overselling."))
@@ -0,0 +1,168 @@
+"""Delete customers without recent orders in small, throttled chunks.
+
+Candidates are customers with no order on or after the cutoff (a NOT EXISTS anti-join answered
+by the ``(customer, order_date)`` index). They are processed in primary-key order, ``--chunk-size``
+at a time, each chunk in its own short transaction: the candidates are re-checked, then their
+``Order.products`` rows, orders and the customers themselves are removed with one raw DELETE
+each, so Django never collects related objects in memory. Progress is checkpointed to
+``--state-file`` after every chunk; an interrupted run resumes from the checkpoint with the
+same cutoff.
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from crm.models import Customer, Order, OrderReminder
+from crm.response_cache import ORDER_PRODUCTS, bump_versions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAYS = 365
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_SLEEP = 0.5
+DEFAULT_STATE_FILE = "/tmp/crm_cleanup_inactive_customers.json"
+
+
+def inactive_customers(cutoff):
+    recent_orders = Order.objects.filter(customer=OuterRef("pk"), order_date__gte=cutoff)
+    return Customer.objects.filter(~Exists(recent_orders))
+
+
+def _delete_chunk(customer_ids):
+    """Remove the customers' order reminders, order-product rows, orders and customers with raw DELETEs.
+
+    OrderReminder, Order and Customer are the only models referencing these rows; extend this when
+    another relation points at them.
+    """
+    qn = connection.ops.quote_name
+    order_meta = Order._meta
+    through_meta = Order.products.through._meta
+    customer_meta = Customer._meta
+    reminder_meta = OrderReminder._meta
+    order_customer = qn(order_meta.get_field("customer").column)
+    through_order = qn(through_meta.get_field("order").column)
+    placeholders = ", ".join(["%s"] * len(customer_ids))
+    with connection.cursor() as cursor:
+        # A reminder belongs to the customer of its order, so this also covers the orders' reminders.
+        cursor.execute(
+            f"DELETE FROM {qn(reminder_meta.db_table)} WHERE {qn(reminder_meta.get_field('customer').column)} IN ({placeholders})",
+            customer_ids,
+        )
+        cursor.execute(
+            f"DELETE FROM {qn(through_meta.db_table)} WHERE {through_order} IN "
+            f"(SELECT {qn(order_meta.pk.column)} FROM {qn(order_meta.db_table)} WHERE {order_customer} IN ({placeholders}))",
+            customer_ids,
+        )
+        order_products = cursor.rowcount
+        cursor.execute(f"DELETE FROM {qn(order_meta.db_table)} WHERE {order_customer} IN ({placeholders})", customer_ids)
+        orders = cursor.rowcount
+        cursor.execute(
+            f"DELETE FROM {qn(customer_meta.db_table)} WHERE {qn(customer_meta.pk.column)} IN ({placeholders})",
+            customer_ids,
+        )
+        customers = cursor.rowcount
+    return customers, orders, order_products
+
+
+class Command(BaseCommand):
+    help = "Delete customers with no orders in the last --days days, in throttled, resumable chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Inactivity window in days.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Customers deleted per transaction.")
+        parser.add_argument("--sleep", type=float, default=DEFAULT_SLEEP, help="Seconds to pause between chunks.")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted without deleting.")
+        parser.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="Checkpoint file used to resume.")
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint.")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1 or options["days"] < 0 or options["sleep"] < 0:
+            raise CommandError("--chunk-size must be positive and --days/--sleep non-negative.")
+        state_file = options["state_file"]
+        state = None if options["restart"] or options["dry_run"] else self.load_state(state_file)
+        if state:
+            cutoff = datetime.fromisoformat(state["cutoff"])
+            self.log(f"Resuming after customer {state['last_pk']} with cutoff {cutoff.isoformat()}.")
+        else:
+            cutoff = timezone.now() - timedelta(days=options["days"])
+            state = {"cutoff": cutoff.isoformat(), "last_pk": 0, "customers": 0, "orders": 0, "order_products": 0}
+
+        candidates = inactive_customers(cutoff).order_by("pk")
+        if options["dry_run"]:
+            return self.dry_run(candidates, chunk_size)
+
+        started = time.monotonic()
+        chunks = 0
+        while True:
+            ids = list(candidates.filter(pk__gt=state["last_pk"]).values_list("pk", flat=True)[:chunk_size])
+            if not ids:
+                break
+            if chunks:
+                time.sleep(options["sleep"])
+            chunk_started = time.monotonic()
+            with transaction.atomic():
+                # Re-check under lock: a customer may have ordered since the candidate scan.
+                confirmed = list(
+                    candidates.filter(pk__in=ids).select_for_update().values_list("pk", flat=True)
+                )
+                counts = _delete_chunk(confirmed) if confirmed else (0, 0, 0)
+                # Raw deletes skip post_delete, so invalidate cached reads explicitly.
+                bump_versions(Customer._meta.model_name, Order._meta.model_name, ORDER_PRODUCTS)
+            chunks += 1
+            state["last_pk"] = ids[-1]
+            for key, value in zip(("customers", "orders", "order_products"), counts):
+                state[key] += value
+            self.save_state(state_file, state)
+            self.log(
+                f"Chunk {chunks}: customers {ids[0]}-{ids[-1]}, deleted {counts[0]} customers, {counts[1]} orders, "
+                f"{counts[2]} order products in {time.monotonic() - chunk_started:.3f}s."
+            )
+
+        self.clear_state(state_file)
+        self.log(
+            f"Deleted {state['customers']} inactive customers ({state['orders']} orders, "
+            f"{state['order_products']} order products) in {chunks} chunks, {time.monotonic() - started:.2f}s."
+        )
+
+    def dry_run(self, candidates, chunk_size):
+        total = candidates.count()
+        orders = Order.objects.filter(customer__in=candidates.values("pk")).count()
+        chunks = -(-total // chunk_size)
+        self.log(f"Dry run: would delete {total} inactive customers and {orders} orders in {chunks} chunks.")
+
+    def log(self, message):
+        logger.info(message)
+        self.stdout.write(message)
+
+    @staticmethod
+    def load_state(path):
+        try:
+            with open(path) as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read checkpoint {path}: {exc}; use --restart to ignore it.") from exc
+
+    @staticmethod
+    def save_state(path, state):
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as handle:
+            json.dump(state, handle)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def clear_state(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,187 @@
+"""Generate a large, reproducible synthetic CRM dataset with bulk inserts.
+
+``python manage.py generate_crm_data --customers 1000000 --products 100000 --order-items 10000000``
+builds a benchmark-sized database. The same ``--seed``, ``--tag`` and ``--until`` always produce
+the same rows. Customers and products are inserted with ``bulk_create`` in ``--batch-size``
+batches. Orders and their items stream in batches too, so memory stays flat however many rows are
+requested. Order volume is skewed (80% of orders come from 20% of customers and hit 20% of
+products), which leaves a realistic tail of inactive customers and slow-moving stock. Customer
+order stats are rebuilt set-based at the end.
+
+Generated emails and product names carry ``--tag`` and the seed. Run it more than once with a
+different seed or tag to add data. The backend must return primary keys from bulk inserts
+(PostgreSQL, SQLite 3.35+, MariaDB 10.5+).
+"""
+
+import random
+import time
+from datetime import datetime, time as datetime_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from crm.models import Customer, Order, OrderItem, Product
+from crm.response_cache import ORDER_PRODUCTS, bump_versions
+
+FIRST_NAMES = (
+    "Ada", "Ben", "Chloe", "Dev", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jonas", "Kemi", "Liam",
+    "Maya", "Noah", "Olga", "Priya", "Quinn", "Rosa", "Sam", "Tariq", "Uma", "Victor", "Wen", "Yusuf", "Zoe",
+)
+LAST_NAMES = (
+    "Adams", "Baker", "Chen", "Diaz", "Evans", "Fischer", "Garcia", "Haddad", "Ito", "Jensen", "Kim",
+    "Lopez", "Mensah", "Novak", "Okafor", "Patel", "Rossi", "Silva", "Tanaka", "Usman", "Weber", "Zhang",
+)
+PRODUCT_ADJECTIVES = ("Compact", "Deluxe", "Eco", "Ultra", "Smart", "Classic", "Pro", "Mini", "Rugged", "Silent")
+PRODUCT_NOUNS = (
+    "Laptop", "Phone", "Headphones", "Monitor", "Keyboard", "Mouse", "Speaker", "Camera", "Router", "Tablet",
+    "Charger", "Watch", "Printer", "Drive", "Lamp",
+)
+HOT_SHARE = 0.2
+HOT_TRAFFIC = 0.8
+LOW_STOCK_SHARE = 0.05
+PROGRESS_INTERVAL = 5.0
+
+
+def _skewed_choice(rng: random.Random, ids: list) -> int:
+    """Pick an id so that ``HOT_TRAFFIC`` of picks land on the first ``HOT_SHARE`` of ``ids``."""
+    hot = max(1, int(len(ids) * HOT_SHARE))
+    if rng.random() < HOT_TRAFFIC or hot == len(ids):
+        return ids[rng.randrange(hot)]
+    return ids[rng.randrange(hot, len(ids))]
+
+
+class Command(BaseCommand):
+    help = "Bulk-insert a reproducible synthetic dataset of customers, products, orders and order items."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=10000)
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--order-items", type=int, default=100000, help="Total order-product rows to create.")
+        parser.add_argument("--max-items-per-order", type=int, default=5)
+        parser.add_argument("--days", type=int, default=730, help="Spread order dates over this many days.")
+        parser.add_argument("--until", help="Latest order date (YYYY-MM-DD, UTC); defaults to today.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--tag", default="synthetic", help="Marker embedded in generated emails and names.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if min(options["customers"], options["products"], options["max_items_per_order"], options["batch_size"]) < 1:
+            raise CommandError("--customers, --products, --max-items-per-order and --batch-size must be positive.")
+        if options["order_items"] < 0 or options["days"] < 1:
+            raise CommandError("--order-items must be non-negative and --days positive.")
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError("This database backend does not return primary keys from bulk inserts.")
+        try:
+            last_day = datetime.strptime(options["until"], "%Y-%m-%d").date() if options["until"] else timezone.now().date()
+        except ValueError as exc:
+            raise CommandError("--until must be a YYYY-MM-DD date.") from exc
+        until = datetime.combine(last_day + timedelta(days=1), datetime_time.min, dt_timezone.utc)
+
+        rng = random.Random(options["seed"])
+        self._last_progress = 0.0
+        batch_size = options["batch_size"]
+        label = f"{options['tag']}-{options['seed']}"
+        started = time.monotonic()
+
+        customer_ids = self.create_customers(rng, options["customers"], label, batch_size)
+        products = self.create_products(rng, options["products"], label, batch_size)
+        orders, items = self.create_orders(
+            rng,
+            customer_ids,
+            products,
+            options["order_items"],
+            options["max_items_per_order"],
+            until,
+            options["days"],
+            batch_size,
+        )
+        call_command("rebuild_customer_stats", batch_size=batch_size, stdout=self.stdout)
+        bump_versions("customer", "product", "order", ORDER_PRODUCTS)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {len(customer_ids)} customers, {len(products)} products, {orders} orders and "
+                f"{items} order items in {time.monotonic() - started:.1f}s."
+            )
+        )
+
+    def progress(self, label, done, total, started):
+        now = time.monotonic()
+        if done < total and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self.stdout.write(f"  {label}: {done}/{total} ({done / max(now - started, 1e-9):,.0f}/s)")
+
+    def create_customers(self, rng, count, label, batch_size):
+        ids = []
+        started = time.monotonic()
+        for start in range(0, count, batch_size):
+            batch = []
+            for number in range(start, min(start + batch_size, count)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                if rng.random() < 0.5:
+                    phone = f"+1{rng.randrange(10**9, 10**10)}"
+                else:
+                    phone = f"{rng.randrange(200, 999)}-{rng.randrange(200, 999)}-{rng.randrange(1000, 9999)}"
+                batch.append(
+                    Customer(name=f"{first} {last}", email=f"{first}.{last}.{number}@{label}.example.com".lower(), phone=phone)
+                )
+            with transaction.atomic():
+                ids.extend(customer.pk for customer in Customer.objects.bulk_create(batch))
+            self.progress("customers", len(ids), count, started)
+        return ids
+
+    def create_products(self, rng, count, label, batch_size):
+        products = {}
+        started = time.monotonic()
+        for start in range(0, count, batch_size):
+            batch = []
+            for number in range(start, min(start + batch_size, count)):
+                price = Decimal(str(round(min(rng.lognormvariate(3.5, 1.0), 9999.0) + 1, 2)))
+                stock = rng.randrange(0, 10) if rng.random() < LOW_STOCK_SHARE else rng.randrange(10, 1000)
+                name = f"{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_NOUNS)} {label}-{number}"
+                batch.append(Product(name=name, price=price, stock=stock))
+            with transaction.atomic():
+                products.update((product.pk, product.price) for product in Product.objects.bulk_create(batch))
+            self.progress("products", len(products), count, started)
+        return products
+
+    def create_orders(self, rng, customer_ids, products, item_count, max_items, until, days, batch_size):
+        """Insert orders until ``item_count`` order items exist; returns (orders, items) created."""
+        product_ids = list(products)
+        max_items = min(max_items, len(product_ids))
+        window = days * 86400
+        orders_created = items_created = 0
+        started = time.monotonic()
+        while items_created < item_count:
+            orders, lines = [], []
+            batch_items = 0
+            while len(orders) < batch_size and items_created + batch_items < item_count:
+                size = min(rng.randint(1, max_items), item_count - items_created - batch_items)
+                chosen = set()
+                while len(chosen) < size:
+                    chosen.add(_skewed_choice(rng, product_ids))
+                quantities = {product_id: rng.choice((1, 1, 1, 2, 3)) for product_id in sorted(chosen)}
+                total = sum((products[pk] * quantity for pk, quantity in quantities.items()), Decimal("0.00"))
+                order_date = until - timedelta(seconds=rng.randrange(1, window + 1))
+                orders.append(
+                    Order(customer_id=_skewed_choice(rng, customer_ids), order_date=order_date, total_amount=total)
+                )
+                lines.append(quantities)
+                batch_items += size
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(order_id=order.pk, product_id=product_id, quantity=quantity)
+                        for order, quantities in zip(orders, lines)
+                        for product_id, quantity in quantities.items()
+                    ],
+                    batch_size=batch_size,
+                )
+            orders_created += len(orders)
+            items_created += batch_items
+            self.progress("order items", items_created, item_count, started)
+        return orders_created, items_created
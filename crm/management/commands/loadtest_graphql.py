@@ -0,0 +1,158 @@
+"""Compare the sync and async GraphQL endpoints under concurrent load.
+
+Serve the project with an ASGI server so both views run under the same process model, e.g.
+``uvicorn alx_backend_graphql.asgi:application --workers 4``, then run
+``python manage.py loadtest_graphql --clients 500 --requests 10000``.
+
+Clients are asyncio coroutines speaking plain HTTP/1.1, so the load generator itself does not
+need a thread per client.
+"""
+
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.graphql_client import DEFAULT_GRAPHQL_URL
+
+DEFAULT_QUERY = """
+query LoadTest {
+  allProducts(first: 20, orderBy: "name") { edges { node { name price stock } } }
+  allOrders(first: 20, orderBy: "-order_date") {
+    edges { node { totalAmount orderDate customer { name email } products { edges { node { name } } } } }
+  }
+}
+"""
+
+
+@dataclass
+class LoadTestResult:
+    endpoint: str
+    url: str
+    requests: int
+    errors: int
+    elapsed: float
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        if len(self.latencies) == 1:
+            return self.latencies[0]
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[int(percent) - 1]
+
+    def summary(self) -> dict:
+        data = asdict(self)
+        del data["latencies"]
+        data.update(
+            requests_per_second=round(self.requests_per_second, 1),
+            p50_ms=_ms(self.percentile(50)),
+            p95_ms=_ms(self.percentile(95)),
+            p99_ms=_ms(self.percentile(99)),
+        )
+        return data
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+async def _post(url: str, body: bytes, timeout: float) -> int:
+    """POST ``body`` over a fresh connection and return the HTTP status code."""
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, port, ssl=secure or None), timeout)
+    try:
+        writer.write(
+            (
+                f"POST {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+            ).encode("latin-1")
+            + body
+        )
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    status_line = response.split(b"\r\n", 1)[0].split()
+    status = int(status_line[1]) if len(status_line) > 1 else 0
+    if status == 200 and b'"errors"' in response.split(b"\r\n\r\n", 1)[-1]:
+        return 500
+    return status
+
+
+async def run_load(endpoint: str, url: str, body: bytes, clients: int, total: int, timeout: float) -> LoadTestResult:
+    remaining = iter(range(total))
+    latencies: List[float] = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status = await _post(url, body, timeout)
+            except (OSError, asyncio.TimeoutError):
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return LoadTestResult(endpoint, url, total, errors, time.perf_counter() - started, latencies)
+
+
+class Command(BaseCommand):
+    help = "Load test the sync (/graphql) and async (/graphql-async) GraphQL endpoints and compare throughput and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sync-url", default=getattr(settings, "CRM_GRAPHQL_URL", DEFAULT_GRAPHQL_URL))
+        parser.add_argument("--async-url", help="Defaults to the sync URL with an -async suffix.")
+        parser.add_argument("--clients", type=int, default=500, help="Concurrent clients per endpoint.")
+        parser.add_argument("--requests", type=int, default=5000, help="Total requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=50, help="Requests sent to each endpoint before measuring.")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+        parser.add_argument("--query", help="GraphQL document to send (defaults to a mixed products/orders query).")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        if options["clients"] < 1 or options["requests"] < 1:
+            raise CommandError("--clients and --requests must be positive.")
+        body = json.dumps({"query": options["query"] or DEFAULT_QUERY}).encode()
+        async_url = options["async_url"] or options["sync_url"].rstrip("/") + "-async"
+        endpoints = [("sync", options["sync_url"]), ("async", async_url)]
+        results = asyncio.run(self._run(endpoints, body, options))
+
+        if options["json"]:
+            self.stdout.write(json.dumps([result.summary() for result in results], indent=2))
+            return
+        self.stdout.write(f"{'endpoint':<8} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for result in results:
+            summary = result.summary()
+            self.stdout.write(
+                f"{result.endpoint:<8} {result.requests:>8} {result.errors:>6} {summary['requests_per_second']:>9} "
+                f"{summary['p50_ms']!s:>9} {summary['p95_ms']!s:>9} {summary['p99_ms']!s:>9}"
+            )
+
+    async def _run(self, endpoints, body, options):
+        results = []
+        for endpoint, url in endpoints:
+            if options["warmup"]:
+                await run_load(endpoint, url, body, min(options["clients"], options["warmup"]), options["warmup"], options["timeout"])
+            results.append(
+                await run_load(endpoint, url, body, options["clients"], options["requests"], options["timeout"])
+            )
+        return results
@@ -0,0 +1,60 @@
+"""Rebuild or verify the order statistics stored on ``Customer``.
+
+``order_count``, ``lifetime_value`` and ``last_order_at`` are maintained incrementally by the
+order write paths; this command recomputes them from the orders table (after imports, raw SQL
+fixes or admin edits to orders) and, with ``--verify``, reports customers whose stored values
+have drifted without changing anything.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+
+from crm.models import Customer
+from crm.response_cache import bump_versions
+
+DEFAULT_BATCH_SIZE = 5000
+SAMPLE_SIZE = 20
+
+
+class Command(BaseCommand):
+    help = "Recompute customer order stats (order_count, lifetime_value, last_order_at) in bulk, or verify them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verify", action="store_true", help="Only report customers whose stats are stale.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Customer id range per UPDATE.")
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            return self.verify()
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+        bounds = Customer.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            self.stdout.write("No customers.")
+            return
+        started = time.monotonic()
+        updated = 0
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            # One short transaction per id range keeps locks brief on large tables.
+            with transaction.atomic():
+                updated += Customer.objects.filter(pk__gte=start, pk__lt=start + batch_size).refresh_order_stats()
+        bump_versions("customer")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt order stats for {updated} customers in {time.monotonic() - started:.2f}s."))
+
+    def verify(self):
+        stale = Customer.objects.stale_order_stats().order_by("pk")
+        count = stale.count()
+        if not count:
+            self.stdout.write(self.style.SUCCESS("Customer order stats are consistent."))
+            return
+        for customer in stale[:SAMPLE_SIZE]:
+            self.stdout.write(
+                f"customer {customer.pk}: order_count {customer.order_count} != {customer.actual_order_count}, "
+                f"lifetime_value {customer.lifetime_value} != {customer.actual_lifetime_value}, "
+                f"last_order_at {customer.last_order_at} != {customer.actual_last_order_at}"
+            )
+        raise CommandError(f"{count} customers have stale order stats; run rebuild_customer_stats to fix them.")
@@ -0,0 +1,127 @@
+"""Send one reminder per customer for their new orders, incrementally and once per order.
+
+A run has two phases, each in bounded pages with one short transaction per page:
+
+1. Intake. Orders with an id above the ``order_reminders`` watermark (a ``JobWatermark`` row) and
+   an ``order_date`` within the last ``--days`` days get an ``OrderReminder`` row, and the watermark
+   advances past them. Ids are assigned at insert but become visible at commit, so a slow
+   transaction can commit an id below the mark. Each run therefore re-reads the last
+   ``--overlap`` ids, skipping orders that already have a reminder.
+2. Delivery. Unsent reminders are read through a partial index, ``--page-size`` customers at a
+   time. Each customer gets one line in ``--log-file`` listing their orders, and the reminders
+   are marked sent in the same transaction.
+
+Reruns therefore only pick up new orders and unsent reminders, and a run costs time in proportion
+to the orders placed since the last one, not to the window. A crash between writing a page and
+its commit sends that page again on the next run.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from crm.models import JobWatermark, Order, OrderReminder
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "order_reminders"
+DEFAULT_DAYS = 7
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_OVERLAP = 1000
+DEFAULT_LOG_FILE = "/tmp/order_reminders_log.txt"
+
+
+class Command(BaseCommand):
+    help = "Record reminders for orders placed since the last run and send them, grouped per customer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Only orders placed within this many days.")
+        parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Orders or customers per transaction.")
+        parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP, help="Order ids below the watermark to re-read.")
+        parser.add_argument("--log-file", default=DEFAULT_LOG_FILE, help="Where reminders are written.")
+
+    def handle(self, *args, **options):
+        page_size = options["page_size"]
+        if page_size < 1 or options["days"] < 0 or options["overlap"] < 0:
+            raise CommandError("--page-size must be positive and --days/--overlap non-negative.")
+        started = time.monotonic()
+        since = timezone.now() - timedelta(days=options["days"])
+        recorded = self.intake(since, page_size, options["overlap"])
+        customers, sent = self.deliver(page_size, options["log_file"])
+        self.log(
+            f"Recorded {recorded} new order reminders; sent {sent} reminders to {customers} customers "
+            f"in {time.monotonic() - started:.2f}s."
+        )
+
+    def intake(self, since, page_size, overlap):
+        watermark, _ = JobWatermark.objects.get_or_create(name=JOB_NAME)
+        newest = Order.objects.aggregate(newest=Max("pk"))["newest"] or 0
+        cursor = max(0, watermark.last_id - overlap)
+        recorded = 0
+        while True:
+            with transaction.atomic():
+                watermark = JobWatermark.objects.select_for_update().get(pk=watermark.pk)
+                orders = list(
+                    Order.objects.filter(pk__gt=cursor, order_date__gte=since, reminder__isnull=True)
+                    .order_by("pk")
+                    .values_list("pk", "customer_id", "order_date")[:page_size]
+                )
+                OrderReminder.objects.bulk_create(
+                    [OrderReminder(order_id=pk, customer_id=customer_id) for pk, customer_id, _ in orders],
+                    ignore_conflicts=True,
+                )
+                if orders:
+                    cursor = orders[-1][0]
+                    if cursor > watermark.last_id:
+                        watermark.last_id, watermark.last_timestamp = cursor, orders[-1][2]
+                done = len(orders) < page_size
+                if done:
+                    # Every order up to the newest at the start is taken in or outside the window.
+                    watermark.last_id = max(watermark.last_id, newest)
+                watermark.save(update_fields=["last_id", "last_timestamp", "updated_at"])
+            recorded += len(orders)
+            if done:
+                return recorded
+
+    def deliver(self, page_size, log_file):
+        pending = OrderReminder.objects.filter(sent_at__isnull=True)
+        after_customer = 0
+        customers = sent = 0
+        while True:
+            customer_ids = list(
+                pending.filter(customer_id__gt=after_customer)
+                .order_by("customer_id")
+                .values_list("customer_id", flat=True)
+                .distinct()[:page_size]
+            )
+            if not customer_ids:
+                return customers, sent
+            with transaction.atomic():
+                reminders = list(
+                    pending.filter(customer_id__in=customer_ids)
+                    .select_for_update(of=("self",))
+                    .order_by("customer_id", "order_id")
+                    .values_list("pk", "customer_id", "customer__email", "order_id")
+                )
+                by_customer = defaultdict(list)
+                for _, customer_id, email, order_id in reminders:
+                    by_customer[(customer_id, email)].append(order_id)
+                timestamp = timezone.now()
+                with open(log_file, "a") as handle:
+                    for (_, email), order_ids in by_customer.items():
+                        listed = ", ".join(str(order_id) for order_id in order_ids)
+                        handle.write(f"{timestamp:%Y-%m-%d %H:%M:%S}: Reminder to {email} for order ID(s) {listed}\n")
+                OrderReminder.objects.filter(pk__in=[reminder[0] for reminder in reminders]).update(sent_at=timestamp)
+            customers += len(by_customer)
+            sent += len(reminders)
+            after_customer = customer_ids[-1]
+
+    def log(self, message):
+        logger.info(message)
+        self.stdout.write(message)
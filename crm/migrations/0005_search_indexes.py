@@ -0,0 +1,109 @@
+import logging
+
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+# Frozen copy of the indexes crm.search reads; later changes there need a new migration.
+SEARCH_FIELDS = {
+    'Customer': ('name', 'email'),
+    'Product': ('name',),
+}
+
+
+def _search_fields(apps):
+    return {apps.get_model('crm', name): fields for name, fields in SEARCH_FIELDS.items()}
+
+
+def _create_trigram_indexes(schema_editor, fields):
+    qn = schema_editor.quote_name
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError as exc:
+        logger.warning('pg_trgm is unavailable (%s); substring search falls back to icontains scans.', exc)
+        return
+    for model, names in fields.items():
+        table = model._meta.db_table
+        for field in names:
+            column = model._meta.get_field(field).column
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {qn(f"{table}_{column}_trgm")} ON {qn(table)} '
+                f'USING gin (UPPER({qn(column)}::text) gin_trgm_ops)'
+            )
+
+
+def _fts5_trigram_available(cursor):
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.crm_fts5_probe USING fts5(value, tokenize = 'trigram')")
+    except DatabaseError:
+        return False
+    cursor.execute('DROP TABLE temp.crm_fts5_probe')
+    return True
+
+
+def _create_fts5_tables(schema_editor, fields):
+    qn = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        if not _fts5_trigram_available(cursor):
+            logger.warning('SQLite lacks the FTS5 trigram tokenizer; substring search falls back to icontains scans.')
+            return
+        for model, names in fields.items():
+            table = model._meta.db_table
+            search_table = f'{table}_search'
+            columns = [qn(model._meta.get_field(field).column) for field in names]
+            pk = qn(model._meta.pk.column)
+            column_list = ', '.join(columns)
+            new_values = ', '.join(f'new.{column}' for column in columns)
+            old_values = ', '.join(f'old.{column}' for column in columns)
+            delete_old = (
+                f'INSERT INTO {qn(search_table)} ({qn(search_table)}, rowid, {column_list}) '
+                f"VALUES ('delete', old.{pk}, {old_values});"
+            )
+            insert_new = f'INSERT INTO {qn(search_table)} (rowid, {column_list}) VALUES (new.{pk}, {new_values});'
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {qn(search_table)} USING fts5('
+                f"{column_list}, tokenize = 'trigram', content = '{table}', content_rowid = '{model._meta.pk.column}')"
+            )
+            triggers = {
+                'insert': f'AFTER INSERT ON {qn(table)} BEGIN {insert_new} END',
+                'delete': f'AFTER DELETE ON {qn(table)} BEGIN {delete_old} END',
+                'update': f'AFTER UPDATE OF {column_list} ON {qn(table)} BEGIN {delete_old} {insert_new} END',
+            }
+            for suffix, body in triggers.items():
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {qn(f"{search_table}_{suffix}")} {body}')
+            cursor.execute(f"INSERT INTO {qn(search_table)} ({qn(search_table)}) VALUES ('rebuild')")
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _create_trigram_indexes(schema_editor, _search_fields(apps))
+    elif vendor == 'sqlite':
+        _create_fts5_tables(schema_editor, _search_fields(apps))
+
+
+def drop_search_indexes(apps, schema_editor):
+    qn = schema_editor.quote_name
+    vendor = schema_editor.connection.vendor
+    for model, names in _search_fields(apps).items():
+        table = model._meta.db_table
+        if vendor == 'postgresql':
+            for field in names:
+                schema_editor.execute(f'DROP INDEX IF EXISTS {qn(f"{table}_{model._meta.get_field(field).column}_trgm")}')
+        elif vendor == 'sqlite':
+            for suffix in ('insert', 'delete', 'update'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {qn(f"{table}_search_{suffix}")}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {qn(f"{table}_search")}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_order_items'),
+    ]
+
+    operations = [
+        # Trigram indexes on PostgreSQL, FTS5 trigram tables on SQLite; crm.search queries them.
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
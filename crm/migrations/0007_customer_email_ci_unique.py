@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-17 07:13
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+REPORTED_DUPLICATES = 20
+
+
+def check_case_variant_emails(apps, schema_editor):
+    """Refuse to add the constraint over emails that differ only in case, naming them."""
+    Customer = apps.get_model('crm', 'Customer')
+    duplicates = list(
+        Customer.objects.using(schema_editor.connection.alias)
+        .annotate(email_lower=django.db.models.functions.text.Lower('email'))
+        .values('email_lower')
+        .annotate(count=models.Count('pk'))
+        .filter(count__gt=1)
+        .order_by('email_lower')
+        .values_list('email_lower', 'count')[:REPORTED_DUPLICATES + 1]
+    )
+    if not duplicates:
+        return
+    listed = ', '.join(f'{email} ({count} customers)' for email, count in duplicates[:REPORTED_DUPLICATES])
+    more = ' and more' if len(duplicates) > REPORTED_DUPLICATES else ''
+    raise RuntimeError(
+        f'Cannot make customer emails unique regardless of case: {listed}{more} share an email. '
+        'Merge those customers (move their orders to one of them, then run rebuild_customer_stats) '
+        'or change their emails, and migrate again.'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0006_order_reminders'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_variant_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='crm_customer_email_ci_unique'),
+        ),
+    ]
@@ -1,8 +1,30 @@
 from decimal import Decimal
 
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Lower, Round
 from django.utils import timezone
 
+from crm.response_cache import bump_versions
+
+
+def _case_by_pk(queryset, values: dict, field_name: str) -> RawSQL:
+	"""``CASE <pk> WHEN ... THEN ... END`` mapping primary keys to ``values`` for ``field_name``.
+
+	Equivalent to ``Case(When(pk=..., then=Value(...)), ...)`` but cheap to build for
+	hundreds of rows, which matters for the per-row UPDATEs of bulk writes.
+	"""
+	connection = connections[queryset.db]
+	meta = queryset.model._meta
+	field = meta.get_field(field_name)
+	qn = connection.ops.quote_name
+	params = []
+	for pk, value in values.items():
+		params += [pk, field.get_db_prep_value(value, connection)]
+	whens = ' '.join(['WHEN %s THEN %s'] * len(values))
+	return RawSQL(f'CASE {qn(meta.db_table)}.{qn(meta.pk.column)} {whens} END', params, output_field=field)
+
 
 class TimeStampedModel(models.Model):
 	"""Abstract base model that tracks creation and update timestamps."""
@@ -14,36 +36,365 @@ class TimeStampedModel(models.Model):
 		abstract = True
 
 
-	"""Abstract base model that tracks creation and update timestamps."""
-class Customer(models.Model):
-	name = models.CharField(max_length=100)
+class CustomerQuerySet(models.QuerySet):
+	"""Maintains the order statistics denormalized onto ``Customer``.
+
+	Writers fold each change in with a single-row UPDATE; ``refresh_order_stats`` recomputes
+	them from the orders table for bulk rebuilds.
+	"""
+
+	def record_order(self, customer_id: int, order_date, amount: Decimal) -> int:
+		"""Fold a new order into the customer's stats."""
+		return self.filter(pk=customer_id).update(
+			order_count=F('order_count') + 1,
+			lifetime_value=F('lifetime_value') + amount,
+			last_order_at=Case(
+				When(Q(last_order_at__isnull=True) | Q(last_order_at__lt=order_date), then=Value(order_date)),
+				default=F('last_order_at'),
+			),
+		)
+
+	def record_orders(self, orders, batch_size: int = 100) -> int:
+		"""Fold many new orders into their customers' stats with one UPDATE per ``batch_size`` customers."""
+		stats = {}
+		for order in orders:
+			count, amount, latest = stats.get(order.customer_id, (0, Decimal('0.00'), None))
+			if latest is None or order.order_date > latest:
+				latest = order.order_date
+			stats[order.customer_id] = (count + 1, amount + order.total_amount, latest)
+		customer_ids = sorted(stats)
+		updated = 0
+		for start in range(0, len(customer_ids), batch_size):
+			batch = {pk: stats[pk] for pk in customer_ids[start:start + batch_size]}
+
+			latest = _case_by_pk(self, {pk: values[2] for pk, values in batch.items()}, 'last_order_at')
+			updated += self.filter(pk__in=batch).update(
+				order_count=F('order_count') + _case_by_pk(self, {pk: values[0] for pk, values in batch.items()}, 'order_count'),
+				lifetime_value=F('lifetime_value') + _case_by_pk(
+					self, {pk: values[1] for pk, values in batch.items()}, 'lifetime_value'
+				),
+				last_order_at=Case(
+					When(Q(last_order_at__isnull=True) | Q(last_order_at__lt=latest), then=latest),
+					default=F('last_order_at'),
+				),
+			)
+		return updated
+
+	def forget_order(self, customer_id: int, order_date, amount: Decimal) -> int:
+		"""Remove a deleted order from the customer's stats; call after the row is gone."""
+		latest = Order.objects.filter(customer=OuterRef('pk')).order_by('-order_date').values('order_date')[:1]
+		return self.filter(pk=customer_id).update(
+			order_count=Case(When(order_count__gt=0, then=F('order_count') - 1), default=Value(0)),
+			lifetime_value=F('lifetime_value') - amount,
+			last_order_at=Case(When(last_order_at=order_date, then=Subquery(latest)), default=F('last_order_at')),
+		)
+
+	def _actual_order_stats(self):
+		orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+		return {
+			'actual_order_count': Coalesce(Subquery(orders.annotate(value=Count('pk')).values('value')), 0),
+			# Rounded to cents: SQLite stores decimals as floats and sums drift in the last bits.
+			'actual_lifetime_value': Round(
+				Coalesce(
+					Subquery(orders.annotate(value=Sum('total_amount')).values('value')),
+					Value(0),
+					output_field=DecimalField(max_digits=14, decimal_places=2),
+				),
+				2,
+			),
+			'actual_last_order_at': Subquery(orders.annotate(value=Max('order_date')).values('value')),
+		}
+
+	def refresh_order_stats(self) -> int:
+		"""Recompute the stats of every customer in the queryset from their orders in one UPDATE."""
+		actual = self._actual_order_stats()
+		return self.update(
+			order_count=actual['actual_order_count'],
+			lifetime_value=actual['actual_lifetime_value'],
+			last_order_at=actual['actual_last_order_at'],
+		)
+
+	def stale_order_stats(self):
+		"""Customers whose stored stats disagree with their orders."""
+		# Spelled with lt/gt rather than negated equality so NULL = NULL counts as a match.
+		return self.annotate(stored_lifetime_value=Round('lifetime_value', 2), **self._actual_order_stats()).filter(
+			Q(order_count__lt=F('actual_order_count'))
+			| Q(order_count__gt=F('actual_order_count'))
+			| Q(stored_lifetime_value__lt=F('actual_lifetime_value'))
+			| Q(stored_lifetime_value__gt=F('actual_lifetime_value'))
+			| Q(last_order_at__lt=F('actual_last_order_at'))
+			| Q(last_order_at__gt=F('actual_last_order_at'))
+			| Q(last_order_at__isnull=True, actual_last_order_at__isnull=False)
+			| Q(last_order_at__isnull=False, actual_last_order_at__isnull=True)
+		)
+
+
+class Customer(TimeStampedModel):
+	name = models.CharField(max_length=255)
 	email = models.EmailField(unique=True)
 	phone = models.CharField(max_length=32, blank=True)
+	last_order_at = models.DateTimeField(null=True, blank=True, editable=False)
+	order_count = models.PositiveIntegerField(default=0, editable=False)
+	lifetime_value = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), editable=False)
+
+	objects = CustomerQuerySet.as_manager()
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['name'], name='crm_customer_name_idx'),
+			models.Index(fields=['phone'], name='crm_customer_phone_idx'),
+			models.Index(fields=['created_at'], name='crm_customer_created_idx'),
+			models.Index(fields=['last_order_at'], name='crm_customer_last_order_idx'),
+			models.Index(fields=['order_count'], name='crm_customer_order_count_idx'),
+			models.Index(fields=['lifetime_value'], name='crm_customer_ltv_idx'),
+		]
+		constraints = [
+			# Emails are unique regardless of case; the expression index also answers LOWER(email) lookups.
+			models.UniqueConstraint(Lower('email'), name='crm_customer_email_ci_unique'),
+		]
 
 	def __str__(self):
 		return self.name
 
+
+class InsufficientStock(Exception):
+	"""Raised when a reservation asks for more units than a product has in stock."""
+
+	def __init__(self, shortages: dict[int, tuple[int, int]]):
+		# product id -> (requested, available)
+		self.shortages = shortages
+		details = ', '.join(
+			f'{product_id} (requested {requested}, available {available})'
+			for product_id, (requested, available) in sorted(shortages.items())
+		)
+		super().__init__(f'Insufficient stock for product(s): {details}')
+
+
+class ProductQuerySet(models.QuerySet):
+	def locked(self, ids) -> dict[int, 'Product']:
+		"""Lock the products with ``ids`` for update, in id order so concurrent writers queue instead of deadlocking."""
+		return self.order_by('pk').select_for_update().in_bulk(sorted(ids))
+
+	def take_stock(self, products: dict[int, 'Product'], quantities: dict[int, int], batch_size: int = 100) -> None:
+		"""Subtract ``quantities`` from already checked ``products`` with one UPDATE per ``batch_size`` products.
+
+		The UPDATE is guarded by ``stock >= quantity``, so it still refuses to oversell on
+		backends without row locks; the in-memory instances are decremented to match.
+		"""
+		pks = sorted(pk for pk, quantity in quantities.items() if quantity and pk in products)
+		for start in range(0, len(pks), batch_size):
+			batch = {pk: quantities[pk] for pk in pks[start:start + batch_size]}
+			requested = _case_by_pk(self, batch, 'stock')
+			updated = self.filter(pk__in=batch, stock__gte=requested).update(
+				stock=F('stock') - requested, updated_at=timezone.now()
+			)
+			if updated != len(batch):
+				# Only reachable without row locks: a concurrent writer got there first.
+				current = dict(self.filter(pk__in=batch).values_list('pk', 'stock'))
+				raise InsufficientStock({
+					pk: (quantity, current.get(pk, 0))
+					for pk, quantity in batch.items()
+					if current.get(pk, 0) < quantity
+				})
+			for pk, quantity in batch.items():
+				products[pk].stock -= quantity
+
+	def reserve(self, quantities: dict[int, int]) -> dict[int, 'Product']:
+		"""Take ``quantities`` (product id -> units) out of stock, all or nothing.
+
+		Must run inside a transaction. Returns the locked products (prices as of the
+		reservation); ids that do not exist are left out for the caller to report.
+		"""
+		if not quantities:
+			return {}
+		products = self.locked(quantities)
+		shortages = {
+			pk: (quantities[pk], product.stock)
+			for pk, product in products.items()
+			if product.stock < quantities[pk]
+		}
+		if shortages:
+			raise InsufficientStock(shortages)
+		self.take_stock(products, quantities)
+		return products
+
+	def restock_below(self, threshold: int, amount: int) -> list['Product']:
+		"""Add ``amount`` to the stock of every product below ``threshold`` in one UPDATE.
+
+		Returns the updated rows, read back with RETURNING where the backend supports it
+		and through a locked, keyed re-select otherwise.
+		"""
+		connection = connections[self.db]
+		now = timezone.now()
+		if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+			return self._restock_returning(connection, threshold, amount, now)
+		with transaction.atomic(using=self.db):
+			ids = list(self.filter(stock__lt=threshold).select_for_update().values_list('pk', flat=True))
+			if not ids:
+				return []
+			self.filter(pk__in=ids).update(stock=F('stock') + amount, updated_at=now)
+			return list(self.filter(pk__in=ids).order_by('pk'))
+
+	def _restock_returning(self, connection, threshold, amount, now):
+		meta = self.model._meta
+		qn = connection.ops.quote_name
+		fields = meta.concrete_fields
+		stock = qn(meta.get_field('stock').column)
+		sql = (
+			f'UPDATE {qn(meta.db_table)} '
+			f'SET {stock} = {stock} + %s, {qn(meta.get_field("updated_at").column)} = %s '
+			f'WHERE {stock} < %s '
+			f'RETURNING {", ".join(qn(field.column) for field in fields)}'
+		)
+		updated_at = connection.ops.adapt_datetimefield_value(now)
+		with connection.cursor() as cursor:
+			cursor.execute(sql, [amount, updated_at, threshold])
+			rows = cursor.fetchall()
+		field_names = [field.attname for field in fields]
+		columns = [field.get_col(meta.db_table) for field in fields]
+		converters = [
+			connection.ops.get_db_converters(column) + column.get_db_converters(connection)
+			for column in columns
+		]
+		products = []
+		for row in rows:
+			values = []
+			for value, column, column_converters in zip(row, columns, converters):
+				for converter in column_converters:
+					value = converter(value, column, connection)
+				values.append(value)
+			products.append(self.model.from_db(self.db, field_names, values))
+		return sorted(products, key=lambda product: product.pk)
+
+
 class Product(TimeStampedModel):
 	name = models.CharField(max_length=255)
 	price = models.DecimalField(max_digits=10, decimal_places=2)
 	stock = models.PositiveIntegerField(default=0)
 
+	objects = ProductQuerySet.as_manager()
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['name'], name='crm_product_name_idx'),
+			models.Index(fields=['price'], name='crm_product_price_idx'),
+			models.Index(fields=['stock'], name='crm_product_stock_idx'),
+			models.Index(fields=['created_at'], name='crm_product_created_idx'),
+			models.Index(fields=['stock'], condition=Q(stock__lt=10), name='crm_product_low_stock_idx'),
+		]
+
 	def __str__(self):
 		return self.name
 
 
+def _item_total():
+	"""Sum of price x quantity over the items of the order referenced by ``OuterRef('pk')``."""
+	amount = DecimalField(max_digits=12, decimal_places=2)
+	items = (
+		OrderItem.objects.filter(order=OuterRef('pk'))
+		.order_by()
+		.values('order')
+		.annotate(total=Sum(F('product__price') * F('quantity'), output_field=amount))
+		.values('total')
+	)
+	return Coalesce(Subquery(items), Value(0), output_field=amount)
+
+
+class OrderQuerySet(models.QuerySet):
+	def recalculate_totals(self) -> int:
+		"""Recompute ``total_amount`` from current product prices for every order in the queryset.
+
+		Runs two UPDATEs, both computed in the database: the first adds each affected
+		customer's net change to ``lifetime_value``, the second rewrites the order totals.
+		Returns the number of orders updated.
+		"""
+		item_total = _item_total()
+		changes = (
+			self.filter(customer=OuterRef('pk'))
+			.order_by()
+			.values('customer')
+			.annotate(delta=Sum(item_total - F('total_amount'), output_field=DecimalField(max_digits=14, decimal_places=2)))
+			.values('delta')
+		)
+		with transaction.atomic(using=self.db):
+			# Customers first: the queryset may filter on the totals that are about to change.
+			delta = Coalesce(Subquery(changes), Value(0), output_field=DecimalField(max_digits=14, decimal_places=2))
+			Customer.objects.using(self.db).filter(pk__in=self.values('customer_id')).update(
+				lifetime_value=F('lifetime_value') + delta
+			)
+			updated = self.update(total_amount=item_total)
+			# Set-based UPDATEs skip post_save.
+			bump_versions(self.model._meta.model_name, Customer._meta.model_name, using=self.db)
+		return updated
+
+
 class Order(TimeStampedModel):
 	customer = models.ForeignKey(Customer, related_name='orders', on_delete=models.CASCADE)
-	products = models.ManyToManyField(Product, related_name='orders')
+	products = models.ManyToManyField(Product, related_name='orders', through='OrderItem')
 	order_date = models.DateTimeField(default=timezone.now)
 	total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
 
+	objects = OrderQuerySet.as_manager()
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['order_date'], name='crm_order_date_idx'),
+			models.Index(fields=['total_amount'], name='crm_order_total_idx'),
+			models.Index(fields=['created_at'], name='crm_order_created_idx'),
+			models.Index(fields=['customer', 'order_date'], name='crm_order_customer_date_idx'),
+		]
+
 	def __str__(self)																																																							:
 		return f"Order #{self.pk}"
 
 	def recalculate_total(self) -> None:
 		"""Recompute order total using current product prices."""
-		total = sum((product.price for product in self.products.all()), Decimal('0.00'))
-		self.total_amount = total
-		self.save(update_fields=['total_amount'])
-																																																																																														
\ No newline at end of file
+		Order.objects.using(self._state.db).filter(pk=self.pk).recalculate_totals()
+		self.refresh_from_db(fields=['total_amount'])
+																																																																																														
+
+class OrderItem(models.Model):
+	"""A product line on an order; the table behind ``Order.products``."""
+
+	order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
+	product = models.ForeignKey(Product, related_name='order_items', on_delete=models.CASCADE)
+	quantity = models.PositiveIntegerField(default=1)
+
+	class Meta:
+		db_table = 'crm_order_products'
+		unique_together = [('order', 'product')]
+
+	def __str__(self):
+		return f'{self.quantity} x {self.product_id} on order #{self.order_id}'
+
+
+class JobWatermark(models.Model):
+	"""How far an incremental job has read a table: the last row id it took in, and its timestamp."""
+
+	name = models.CharField(max_length=100, unique=True)
+	last_id = models.BigIntegerField(default=0)
+	last_timestamp = models.DateTimeField(null=True, blank=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	def __str__(self):
+		return f'{self.name} @ {self.last_id}'
+
+
+class OrderReminder(models.Model):
+	"""The reminder owed for one order; ``sent_at`` is set once it went out, so it goes out once."""
+
+	order = models.OneToOneField(Order, related_name='reminder', on_delete=models.CASCADE)
+	customer = models.ForeignKey(Customer, related_name='order_reminders', on_delete=models.CASCADE)
+	created_at = models.DateTimeField(auto_now_add=True)
+	sent_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		indexes = [
+			# Only unsent reminders, grouped by customer: delivery never reads what was already sent.
+			models.Index(
+				fields=['customer', 'order'], condition=Q(sent_at__isnull=True), name='crm_reminder_pending_idx'
+			),
+		]
+
+	def __str__(self):
+		return f'Reminder for order #{self.order_id}'
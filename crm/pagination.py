@@ -0,0 +1,125 @@
+"""Keyset (seek) pagination for CRM connections.
+
+Offset cursors turn deep pages into ``OFFSET n`` scans. A keyset cursor instead records the
+sort-key values of the last row served plus its primary key, and the next page starts with
+``WHERE (sort_key, id) > (last_sort_key, last_id)``, which an index on the sort key answers
+in constant time regardless of depth.
+
+NULL compares as neither greater nor smaller than anything, so keyset pages sort NULLs in
+nullable keys last in both directions and seek past them with explicit ``IS NULL`` clauses.
+"""
+
+import base64
+import datetime
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from typing import Any, List, Optional, Sequence
+
+from django.db.models import F, Q
+from graphql import GraphQLError
+
+
+@dataclass
+class KeysetPage:
+    items: List[Any]
+    cursors: List[str]
+    has_next_page: bool
+
+
+def keyset_ordering(queryset) -> List[str]:
+    """Return the queryset's active ordering with a primary-key tiebreaker appended."""
+    ordering = [value for value in queryset.query.order_by if isinstance(value, str)]
+    ordering = [value for value in ordering if value.lstrip("-") not in ("pk", "id")]
+    descending = bool(ordering) and ordering[0].startswith("-")
+    return ordering + ["-pk" if descending else "pk"]
+
+
+def _field_name(value: str) -> str:
+    return value.lstrip("-")
+
+
+def _field(model, name: str):
+    return model._meta.pk if name == "pk" else model._meta.get_field(name)
+
+
+def _order_expression(model, name: str):
+    field = _field_name(name)
+    if not _field(model, field).null:
+        return name
+    expression = F(field)
+    return expression.desc(nulls_last=True) if name.startswith("-") else expression.asc(nulls_last=True)
+
+
+def _encode_value(value):
+    # DjangoJSONEncoder truncates datetimes to milliseconds, which would break ties on equal keys.
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(instance, ordering: Sequence[str]) -> str:
+    values = [_encode_value(getattr(instance, _field(type(instance), _field_name(name)).attname)) for name in ordering]
+    payload = json.dumps({"order": list(ordering), "values": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, model, ordering: Sequence[str]) -> List[Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        order, values = payload["order"], payload["values"]
+    except (ValueError, KeyError, TypeError) as exc:
+        raise GraphQLError("Invalid keyset cursor.") from exc
+    if order != list(ordering) or len(values) != len(order):
+        raise GraphQLError("Keyset cursor does not match the requested orderBy.")
+    return [_field(model, _field_name(name)).to_python(value) for name, value in zip(order, values)]
+
+
+def seek_filter(model, ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    """Build ``(k1, k2, ...) > (v1, v2, ...)`` honouring each key's direction, NULLs last."""
+    clauses = []
+    equal = {}
+    for name, value in zip(ordering, values):
+        field = _field_name(name)
+        if value is None:
+            # Nothing sorts after NULL: only rows sharing it continue on the next key.
+            equal[f"{field}__isnull"] = True
+            continue
+        lookup = "lt" if name.startswith("-") else "gt"
+        after = Q(**{f"{field}__{lookup}": value})
+        if _field(model, field).null:
+            after |= Q(**{f"{field}__isnull": True})
+        clauses.append(Q(**equal) & after)
+        equal[field] = value
+    return reduce(or_, clauses)
+
+
+def _seek(queryset, after: Optional[str]):
+    ordering = keyset_ordering(queryset)
+    queryset = queryset.order_by(*(_order_expression(queryset.model, name) for name in ordering))
+    if after:
+        queryset = queryset.filter(seek_filter(queryset.model, ordering, decode_cursor(after, queryset.model, ordering)))
+    return queryset, ordering
+
+
+def _page(rows, first: int, ordering: Sequence[str]) -> KeysetPage:
+    items = rows[:first]
+    return KeysetPage(
+        items=items,
+        cursors=[encode_cursor(item, ordering) for item in items],
+        has_next_page=len(rows) > first,
+    )
+
+
+def keyset_paginate(queryset, first: int, after: Optional[str] = None) -> KeysetPage:
+    queryset, ordering = _seek(queryset, after)
+    return _page(list(queryset[: first + 1]), first, ordering)
+
+
+async def akeyset_paginate(queryset, first: int, after: Optional[str] = None) -> KeysetPage:
+    queryset, ordering = _seek(queryset, after)
+    return _page([row async for row in queryset[: first + 1]], first, ordering)
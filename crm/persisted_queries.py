@@ -0,0 +1,109 @@
+"""Persisted queries and a shared cache of parsed, validated GraphQL documents.
+
+Clients may send ``extensions.persistedQuery.sha256Hash`` instead of the query text
+(Apollo's automatic persisted queries protocol): an unknown hash answers
+``PersistedQueryNotFound`` and the client retries once with the full text, which is then
+registered. Whatever way the text arrives, its parsed and validated document is kept in a
+bounded LRU keyed by the same hash, so parse/validate runs once per distinct document. A
+document is valid only against the schema and rules it was checked with, so both are part of
+the key: the sync and async endpoints share the cache without sharing entries.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Hashable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import DocumentNode, GraphQLError, GraphQLSchema, parse, validate
+
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+PERSISTED_QUERY_KEY_PREFIX = "crm:persisted-query:"
+DEFAULT_DOCUMENT_CACHE_SIZE = 256
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class DocumentCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class DocumentCache:
+    """Thread-safe LRU of validated documents keyed by schema, validation rules and the SHA-256 of their source."""
+
+    def __init__(self, max_size: int = DEFAULT_DOCUMENT_CACHE_SIZE):
+        self.max_size = max_size
+        self.stats = DocumentCacheStats()
+        self._documents: "OrderedDict[Hashable, DocumentNode]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, schema: GraphQLSchema, query: str, validation_rules=None, max_errors=None) -> Tuple[Optional[DocumentNode], List[GraphQLError]]:
+        """Return ``(document, errors)``; documents that fail to parse or validate are not cached."""
+        rules = None if validation_rules is None else tuple(validation_rules)
+        key = (schema, rules, query_hash(query))
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                self.stats.hits += 1
+                return document, []
+            self.stats.misses += 1
+        try:
+            document = parse(query)
+        except GraphQLError as exc:
+            return None, [exc]
+        errors = validate(schema, document, validation_rules, max_errors=max_errors)
+        if errors:
+            return None, errors
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.max_size:
+                self._documents.popitem(last=False)
+                self.stats.evictions += 1
+        return document, []
+
+    def stats_dict(self):
+        with self._lock:
+            return {**asdict(self.stats), "size": len(self._documents), "max_size": self.max_size}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._documents.clear()
+            self.stats = DocumentCacheStats()
+
+
+class PersistedQueryRegistry:
+    """Maps query hashes to query text in a Django cache alias.
+
+    Workers share registrations only when the alias is a shared backend (Redis, Memcached);
+    with locmem each process keeps its own, and clients re-register after a miss.
+    """
+
+    def __init__(self, cache_alias: str = "default"):
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def lookup(self, sha256_hash: str) -> Optional[str]:
+        return self.cache.get(PERSISTED_QUERY_KEY_PREFIX + sha256_hash)
+
+    def register(self, query: str, sha256_hash: Optional[str] = None) -> str:
+        computed = query_hash(query)
+        if sha256_hash is not None and sha256_hash != computed:
+            raise GraphQLError("provided sha does not match query")
+        self.cache.set(PERSISTED_QUERY_KEY_PREFIX + computed, query, timeout=None)
+        return computed
+
+
+document_cache = DocumentCache(getattr(settings, "CRM_DOCUMENT_CACHE_SIZE", DEFAULT_DOCUMENT_CACHE_SIZE))
+persisted_queries = PersistedQueryRegistry(getattr(settings, "CRM_PERSISTED_QUERY_CACHE", "graphql"))
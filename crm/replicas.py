@@ -0,0 +1,118 @@
+"""Send GraphQL query operations to a read replica and everything else to the primary.
+
+``ReplicaRouter`` routes writes to ``CRM_DB_PRIMARY_ALIAS``. Reads go there too, except while
+``ReplicaExecutionContext`` runs a GraphQL ``query`` operation: its reads, including loader
+batches and connection counts, go to ``CRM_DB_READ_ALIAS``. Mutations, the admin, management
+commands and the exports keep reading the primary. Without a read alias in ``DATABASES``,
+everything uses the primary.
+
+Replicas lag, so after a mutation the client reads from the primary for
+``CRM_DB_STICKY_SECONDS``. The views record the end of that window in the ``STICKY_COOKIE``
+cookie, which marks the client's session without a session-store write per mutation. A forged
+cookie can only make its own client read from the primary.
+"""
+
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from graphql import ExecutionContext, OperationType
+
+STICKY_COOKIE = "crm_read_primary_until"
+STICKY_ATTRIBUTE = "crm_read_primary_until"
+
+_read_alias: ContextVar[Optional[str]] = ContextVar("crm_read_alias", default=None)
+
+
+def primary_alias() -> str:
+    return getattr(settings, "CRM_DB_PRIMARY_ALIAS", DEFAULT_DB_ALIAS)
+
+
+def replica_alias() -> Optional[str]:
+    """The configured read alias, or None when ``DATABASES`` does not define it."""
+    alias = getattr(settings, "CRM_DB_READ_ALIAS", None)
+    return alias if alias and alias != primary_alias() and alias in connections.settings else None
+
+
+def _sticky_until(request) -> float:
+    until = getattr(request, STICKY_ATTRIBUTE, 0.0)
+    cookies = getattr(request, "COOKIES", None) or {}
+    try:
+        return max(until, float(cookies.get(STICKY_COOKIE, 0)))
+    except ValueError:
+        return until
+
+
+def reads_primary(request) -> bool:
+    """Whether ``request`` is inside the read-your-writes window of an earlier mutation."""
+    return _sticky_until(request) > time.time()
+
+
+def record_write(request) -> None:
+    """Start the read-your-writes window for the client of ``request``."""
+    window = getattr(settings, "CRM_DB_STICKY_SECONDS", 0)
+    if window > 0 and request is not None:
+        setattr(request, STICKY_ATTRIBUTE, time.time() + window)
+
+
+def set_sticky_cookie(request, response) -> None:
+    """Send the window started by ``record_write`` during this request back to the client."""
+    until = getattr(request, STICKY_ATTRIBUTE, None)
+    if until is not None:
+        response.set_cookie(STICKY_COOKIE, f"{until:.3f}", max_age=max(1, int(until - time.time()) + 1), httponly=True, samesite="Lax")
+
+
+@contextmanager
+def reading_from(alias: Optional[str]):
+    """Route reads inside the block to ``alias`` (None: the primary)."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+async def _awaited_reading_from(alias: Optional[str], awaitable):
+    with reading_from(alias):
+        return await awaitable
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or primary_alias()
+
+    def db_for_write(self, model, **hints):
+        return primary_alias()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A row read from the replica is the same row on the primary.
+        aliases = {primary_alias(), replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the schema through replication.
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaExecutionContext(ExecutionContext):
+    """Execution context that reads query operations from the replica; ``context_value`` is the request."""
+
+    def execute_operation(self, operation, root_value):
+        alias = None
+        if operation.operation == OperationType.QUERY and not reads_primary(self.context_value):
+            alias = replica_alias()
+        elif operation.operation == OperationType.MUTATION:
+            record_write(self.context_value)
+        with reading_from(alias):
+            result = super().execute_operation(operation, root_value)
+        if inspect.isawaitable(result):
+            return _awaited_reading_from(alias, result)
+        return result
@@ -0,0 +1,203 @@
+"""Opt-in cache of read-query results, invalidated by per-model version counters.
+
+Each cached response is keyed by the query hash, operation name, variables and the current
+version of every model the operation reads. Writes bump the versions of the models they touch
+(through signals, or explicitly for bulk paths that bypass them), so stale entries are simply
+never looked up again and expire on their own. Versions live in the same cache alias as the
+responses; use a shared backend (Redis, Memcached) when several processes serve requests.
+
+A replica may not have caught up with a write yet, so for ``CRM_DB_STICKY_SECONDS`` after a
+model is written, operations reading it from the replica bypass the cache: their result could
+be stored under the post-write versions.
+"""
+
+import hashlib
+import json
+import math
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    OperationType,
+    get_named_type,
+)
+
+from crm.persisted_queries import query_hash
+from crm.replicas import primary_alias
+
+VERSION_KEY_PREFIX = "crm:model-version:"
+WRITTEN_KEY_PREFIX = "crm:model-written:"
+RESPONSE_KEY_PREFIX = "crm:response:"
+ORDER_PRODUCTS = "order_products"
+
+# Root query fields that may be cached, with the models their filters can read besides the
+# types that appear in the selection.
+ROOT_FIELD_DEPENDENCIES: Dict[str, Set[str]] = {
+    "hello": set(),
+    # Customer order stats are maintained with UPDATEs whenever orders change.
+    "allCustomers": {"customer", "order"},
+    "allProducts": {"product"},
+    "allOrders": {"order", "customer", "product", ORDER_PRODUCTS},
+    "crmStats": {"order", "customer", "product", ORDER_PRODUCTS},
+}
+RELATION_DEPENDENCIES: Dict[tuple, Set[str]] = {
+    ("OrderNode", "products"): {ORDER_PRODUCTS},
+    ("OrderNode", "items"): {ORDER_PRODUCTS},
+    ("ProductNode", "orders"): {ORDER_PRODUCTS},
+}
+
+
+def _cache():
+    return caches[getattr(settings, "CRM_RESPONSE_CACHE_ALIAS", "default")]
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "CRM_RESPONSE_CACHE_ENABLED", False)
+
+
+def bump_versions(*names: str, using: Optional[str] = None) -> None:
+    """Invalidate cached responses reading ``names`` once the transaction on ``using`` commits.
+
+    ``using`` defaults to the primary database, where every write goes.
+    """
+
+    def bump():
+        cache = _cache()
+        for name in names:
+            key = VERSION_KEY_PREFIX + name
+            if not cache.add(key, 1, timeout=None):
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    cache.set(key, 1, timeout=None)
+        window = _lag_window()
+        if window > 0:
+            written = time.time()
+            cache.set_many({WRITTEN_KEY_PREFIX + name: written for name in names}, timeout=math.ceil(window))
+
+    transaction.on_commit(bump, using=using or primary_alias())
+
+
+def _lag_window() -> float:
+    return getattr(settings, "CRM_DB_STICKY_SECONDS", 0)
+
+
+def _recently_written(names: Iterable[str]) -> bool:
+    """Whether any of ``names`` was written within the replica lag window."""
+    written = _cache().get_many([WRITTEN_KEY_PREFIX + name for name in names])
+    since = time.time() - _lag_window()
+    return any(value > since for value in written.values())
+
+
+def model_version(name: str) -> int:
+    """Current version of ``name``; it changes whenever a write bumps it."""
+    return _cache().get(VERSION_KEY_PREFIX + name, 0)
+
+
+def _model_name(graphql_type) -> Optional[str]:
+    graphene_type = getattr(graphql_type, "graphene_type", None)
+    model = getattr(getattr(graphene_type, "_meta", None), "model", None)
+    return model._meta.model_name if model is not None else None
+
+
+def operation_dependencies(schema, document: DocumentNode, operation: OperationDefinitionNode) -> Optional[Set[str]]:
+    """Return the model versions a query reads, or None when it must not be cached."""
+    if operation.operation != OperationType.QUERY:
+        return None
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    dependencies: Set[str] = set()
+    root_type = schema.query_type
+
+    def walk(parent_type, selection_set, is_root, seen_fragments):
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, FieldNode):
+                name = selection.name.value
+                if name.startswith("__"):
+                    continue
+                if is_root:
+                    if name not in ROOT_FIELD_DEPENDENCIES:
+                        return False
+                    dependencies.update(ROOT_FIELD_DEPENDENCIES[name])
+                dependencies.update(RELATION_DEPENDENCIES.get((parent_type.name, name), ()))
+                field_def = parent_type.fields.get(name)
+                if field_def is None:
+                    continue
+                named_type = get_named_type(field_def.type)
+                model_name = _model_name(named_type)
+                if model_name:
+                    dependencies.add(model_name)
+                if hasattr(named_type, "fields") and walk(named_type, selection.selection_set, False, seen_fragments) is False:
+                    return False
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = schema.get_type(selection.type_condition.name.value) or parent_type
+                if walk(fragment_type, selection.selection_set, is_root, seen_fragments) is False:
+                    return False
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment_name = selection.name.value
+                fragment = fragments.get(fragment_name)
+                if fragment is None or fragment_name in seen_fragments:
+                    continue
+                fragment_type = schema.get_type(fragment.type_condition.name.value) or parent_type
+                if walk(fragment_type, fragment.selection_set, is_root, seen_fragments | {fragment_name}) is False:
+                    return False
+        return True
+
+    if walk(root_type, operation.selection_set, True, frozenset()) is False:
+        return None
+    return dependencies
+
+
+def _response_key(query: str, operation_name: Optional[str], variables, dependencies: Iterable[str]) -> str:
+    names = sorted(dependencies)
+    cache = _cache()
+    versions = cache.get_many([VERSION_KEY_PREFIX + name for name in names])
+    payload = json.dumps(
+        {
+            "query": query_hash(query),
+            "operation": operation_name,
+            "variables": variables or {},
+            "versions": [versions.get(VERSION_KEY_PREFIX + name, 0) for name in names],
+        },
+        cls=DjangoJSONEncoder,
+        sort_keys=True,
+    )
+    return RESPONSE_KEY_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_response(key: str):
+    return _cache().get(key)
+
+
+def set_cached_response(key: str, data) -> None:
+    _cache().set(key, data, timeout=getattr(settings, "CRM_RESPONSE_CACHE_TIMEOUT", 60))
+
+
+def response_key(schema, document, operation, query, operation_name, variables, replica=False) -> Optional[str]:
+    """Return the cache key for a cacheable read operation, or None when caching does not apply.
+
+    ``replica`` says the operation reads from a replica, which may still lag a recent write.
+    """
+    if not is_enabled() or operation is None:
+        return None
+    dependencies = operation_dependencies(schema, document, operation)
+    if dependencies is None:
+        return None
+    if replica and _recently_written(dependencies):
+        return None
+    return _response_key(query, operation_name, variables, dependencies)
@@ -1,24 +1,33 @@
 import re
 from decimal import Decimal
-from typing import Dict, Iterable, List, Sequence
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
 
 import graphene
-from django.db import transaction
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Lower, TruncDay, TruncMonth, TruncWeek
 from django.utils import timezone
 from graphene import relay
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
 from graphql import GraphQLError
 from graphql_relay import from_global_id
 
+from crm.fields import CountableConnection, CRMConnectionField, CRMFilterConnectionField, relation_window
 from crm.filters import CustomerFilter, OrderFilter, ProductFilter
-from crm.models import Customer, Order, Product
-from crm.models import Product
+from crm.loaders import get_loaders
+from crm.models import Customer, InsufficientStock, Order, OrderItem, Product
+from crm.response_cache import ORDER_PRODUCTS, bump_versions
 
 PHONE_PATTERN = re.compile(r"^(\+\d{7,15}|\d{3}-\d{3}-\d{4})$")
-CUSTOMER_ORDER_FIELDS = {"name", "email", "created_at"}
+CUSTOMER_ORDER_FIELDS = {"name", "email", "created_at", "last_order_at", "order_count", "lifetime_value"}
 PRODUCT_ORDER_FIELDS = {"name", "price", "stock", "created_at"}
 ORDER_ORDER_FIELDS = {"order_date", "total_amount", "created_at"}
+BULK_CREATE_CHUNK_SIZE = 500
+LOW_STOCK_THRESHOLD = 10
+LOW_STOCK_RESTOCK_AMOUNT = 10
+CENTS = Decimal("0.01")
+STATS_TRUNCATORS = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+ORDER_TOTALS = {"order_count": Count("id"), "total_revenue": Sum("total_amount")}
 
 
 def _coerce_input(input_value: Dict | None) -> Dict:
@@ -40,13 +49,23 @@ def _coerce_input(input_value: Dict | None) -> Dict:
     return data
 
 
+def _fans_out(queryset) -> bool:
+    """True when the query joins a to-many relation, so a row may appear more than once."""
+    return any(
+        getattr(join, "join_field", None) is not None and (join.join_field.one_to_many or join.join_field.many_to_many)
+        for join in queryset.query.alias_map.values()
+    )
+
+
 def _apply_filterset(queryset, filterset_class, filter_input):
     data = _coerce_input(filter_input)
     if not data:
         return queryset
     filterset = filterset_class(data=data, queryset=queryset)
     if filterset.form.is_valid():
-        return filterset.qs.distinct()
+        filtered = filterset.qs
+        # Only a join to a to-many relation can repeat rows; EXISTS-based filters never do.
+        return filtered.distinct() if _fans_out(filtered) else filtered
     errors = []
     for field, messages in filterset.form.errors.items():
         errors.extend(messages)
@@ -87,15 +106,32 @@ def _validate_phone(phone: str | None) -> None:
         raise GraphQLError("Phone must match +1234567890 or 123-456-7890.")
 
 
-def _ensure_unique_email(email: str) -> str:
-    cleaned = email.strip()
+def _clean_email(email: str | None) -> str:
+    cleaned = (email or "").strip()
     if not cleaned:
         raise GraphQLError("Email is required.")
-    if Customer.objects.filter(email__iexact=cleaned).exists():
+    return cleaned
+
+
+def _ensure_unique_email(email: str) -> str:
+    cleaned = _clean_email(email)
+    if _existing_emails([cleaned]):
         raise GraphQLError("Email already exists.")
     return cleaned
 
 
+def _existing_emails(emails: Iterable[str]) -> Set[str]:
+    """Return the lower-cased subset of ``emails`` already stored, using one IN lookup.
+
+    ``LOWER(email)`` matches the expression of the case-insensitive unique index, which answers it.
+    """
+    lowered = {email.lower() for email in emails}
+    if not lowered:
+        return set()
+    queryset = Customer.objects.annotate(email_lower=Lower("email")).filter(email_lower__in=lowered)
+    return set(queryset.values_list("email_lower", flat=True))
+
+
 def _create_customer_instance(name: str, email: str, phone: str | None = None) -> Customer:
     if not name or not name.strip():
         raise GraphQLError("Name is required.")
@@ -104,6 +140,36 @@ def _create_customer_instance(name: str, email: str, phone: str | None = None) -
     return Customer.objects.create(name=name.strip(), email=normalized_email, phone=phone or "")
 
 
+def _build_customer_instance(name: str, email: str, phone: str | None = None) -> Customer:
+    """Validate a customer payload without touching the database; uniqueness is checked by the caller."""
+    if not name or not name.strip():
+        raise GraphQLError("Name is required.")
+    normalized_email = _clean_email(email)
+    _validate_phone(phone)
+    return Customer(name=name.strip(), email=normalized_email, phone=phone or "")
+
+
+def _bulk_insert_customers(rows: List[Tuple[int, Customer]], batch_size: int) -> Tuple[List[Customer], List[Tuple[int, str]]]:
+    """Insert validated rows with ``bulk_create``, falling back to per-row inserts if a concurrent writer wins a race."""
+    customers = [customer for _, customer in rows]
+    try:
+        with transaction.atomic(using=router.db_for_write(Customer)):
+            return Customer.objects.bulk_create(customers, batch_size=batch_size), []
+    except IntegrityError:
+        pass
+    created: List[Customer] = []
+    errors: List[Tuple[int, str]] = []
+    for index, customer in rows:
+        customer.pk = None
+        try:
+            with transaction.atomic(using=router.db_for_write(Customer)):
+                customer.save(force_insert=True)
+            created.append(customer)
+        except IntegrityError:
+            errors.append((index, "Email already exists."))
+    return created, errors
+
+
 def _validate_price_and_stock(price: Decimal, stock: int) -> None:
     if price is None or Decimal(price) <= Decimal("0"):
         raise GraphQLError("Price must be a positive value.")
@@ -111,16 +177,50 @@ def _validate_price_and_stock(price: Decimal, stock: int) -> None:
         raise GraphQLError("Stock cannot be negative.")
 
 
-def _fetch_products(product_ids: Iterable[str | int]) -> List[Product]:
-    db_ids = [_to_db_id(raw_id, "Product") for raw_id in product_ids]
-    products = list(Product.objects.filter(id__in=db_ids))
-    missing = set(db_ids) - {product.id for product in products}
+def _invalid_products_error(missing: Iterable[int]) -> GraphQLError:
+    missing_str = ", ".join(str(value) for value in sorted(missing))
+    return GraphQLError(f"Invalid product ID(s): {missing_str}")
+
+
+def _order_quantities(payload: Dict) -> Dict[int, int]:
+    """Merge ``productIds`` (one unit per occurrence) and ``items`` into product id -> units."""
+    quantities: Dict[int, int] = {}
+    for raw_id in payload.get("product_ids") or []:
+        product_id = _to_db_id(raw_id, "Product")
+        quantities[product_id] = quantities.get(product_id, 0) + 1
+    for item in payload.get("order_items") or []:
+        item = _coerce_input(item)
+        quantity = item.get("quantity", 1)
+        if quantity is None or quantity < 1:
+            raise GraphQLError("Quantity must be a positive integer.")
+        product_id = _to_db_id(item.get("product_id"), "Product")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if not quantities:
+        raise GraphQLError("At least one product ID is required.")
+    return quantities
+
+
+def _reserve_products(quantities: Dict[int, int]) -> Dict[int, Product]:
+    """Reserve stock for an order; call inside the order's transaction."""
+    try:
+        products = Product.objects.reserve(quantities)
+    except InsufficientStock as exc:
+        raise GraphQLError(str(exc), extensions={"code": "INSUFFICIENT_STOCK"}) from exc
+    missing = set(quantities) - set(products)
     if missing:
-        missing_str = ", ".join(str(value) for value in sorted(missing))
-        raise GraphQLError(f"Invalid product ID(s): {missing_str}")
+        raise _invalid_products_error(missing)
     return products
 
 
+def _insert_orders(orders: List[Order], batch_size: int) -> List[Order]:
+    """Insert ``orders`` and return them with primary keys set, which their items need."""
+    if connections[router.db_for_write(Order)].features.can_return_rows_from_bulk_insert:
+        return Order.objects.bulk_create(orders, batch_size=batch_size)
+    for order in orders:
+        order.save(force_insert=True)
+    return orders
+
+
 def _get_customer(raw_id: str | int) -> Customer:
     customer_id = _to_db_id(raw_id, "Customer")
     try:
@@ -135,6 +235,12 @@ class CustomerFilterInput(graphene.InputObjectType):
     created_at_gte = graphene.DateTime()
     created_at_lte = graphene.DateTime()
     phone_pattern = graphene.String()
+    last_order_at_gte = graphene.DateTime()
+    last_order_at_lte = graphene.DateTime()
+    order_count_gte = graphene.Int()
+    order_count_lte = graphene.Int()
+    lifetime_value_gte = graphene.Float()
+    lifetime_value_lte = graphene.Float()
 
 
 class ProductFilterInput(graphene.InputObjectType):
@@ -167,44 +273,71 @@ class ProductInput(graphene.InputObjectType):
     stock = graphene.Int(default_value=0)
 
 
+class OrderItemInput(graphene.InputObjectType):
+    product_id = graphene.ID(required=True)
+    quantity = graphene.Int(default_value=1)
+
+
 class OrderInput(graphene.InputObjectType):
     customer_id = graphene.ID(required=True)
-    product_ids = graphene.List(graphene.NonNull(graphene.ID), required=True)
+    product_ids = graphene.List(graphene.NonNull(graphene.ID))
+    # Exposed as ``items``; the Python name must not shadow the input container's dict.items().
+    order_items = graphene.List(graphene.NonNull(OrderItemInput), name="items")
     order_date = graphene.DateTime()
 
 
 class CustomerType(DjangoObjectType):
     class Meta:
         model = Customer
-        fields = ("id", "name", "email", "phone")
+        fields = ("id", "name", "email", "phone", "last_order_at", "order_count", "lifetime_value")
 
 
 class CustomerNode(DjangoObjectType):
     database_id = graphene.Int()
+    orders = CRMConnectionField(lambda: OrderNode, required=True)
 
     class Meta:
         model = Customer
-        fields = ("id", "name", "email", "phone", "created_at", "updated_at")
+        fields = (
+            "id", "name", "email", "phone", "created_at", "updated_at", "orders",
+            "last_order_at", "order_count", "lifetime_value",
+        )
         interfaces = (relay.Node,)
+        connection_class = CountableConnection
 
     def resolve_database_id(self, info):
         return self.id
 
+    def resolve_orders(self, info, **kwargs):
+        return get_loaders(info.context).orders_by_customer.load((self.id, relation_window(kwargs)))
+
 
 class ProductNode(DjangoObjectType):
     database_id = graphene.Int()
+    orders = CRMConnectionField(lambda: OrderNode, required=True)
 
     class Meta:
         model = Product
-        fields = ("id", "name", "price", "stock", "created_at", "updated_at")
+        fields = ("id", "name", "price", "stock", "created_at", "updated_at", "orders")
         interfaces = (relay.Node,)
 
     def resolve_database_id(self, info):
         return self.id
 
+    def resolve_orders(self, info, **kwargs):
+        return get_loaders(info.context).orders_by_product.load((self.id, relation_window(kwargs)))
+
+
+class OrderItemType(DjangoObjectType):
+    class Meta:
+        model = OrderItem
+        fields = ("product", "quantity")
+
 
 class OrderNode(DjangoObjectType):
     database_id = graphene.Int()
+    products = CRMConnectionField(ProductNode, required=True)
+    items = graphene.List(graphene.NonNull(OrderItemType), required=True)
 
     class Meta:
         model = Order
@@ -214,22 +347,104 @@ class OrderNode(DjangoObjectType):
     def resolve_database_id(self, info):
         return self.id
 
+    def resolve_customer(self, info):
+        return get_loaders(info.context).customers.load(self.customer_id)
+
+    def resolve_products(self, info, **kwargs):
+        return get_loaders(info.context).products_by_order.load(self.id)
+
+    def resolve_items(self, info):
+        return get_loaders(info.context).items_by_order.load(self.id)
+
+
+class StatsPeriod(graphene.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class RevenueBucketType(graphene.ObjectType):
+    period_start = graphene.DateTime()
+    order_count = graphene.Int()
+    revenue = graphene.Decimal()
+
+
+def _cents(amount) -> Decimal:
+    # SQLite sums decimals as floats ("1482267.10000000"); report whole cents like the stored amounts.
+    return Decimal(amount or 0).quantize(CENTS)
+
+
+def _revenue_bucket(row) -> RevenueBucketType:
+    return RevenueBucketType(**{**row, "revenue": _cents(row["revenue"])})
+
+
+class CRMStatsType(graphene.ObjectType):
+    customer_count = graphene.Int()
+    order_count = graphene.Int()
+    total_revenue = graphene.Decimal()
+    revenue_by_period = graphene.List(RevenueBucketType, period=StatsPeriod(default_value=StatsPeriod.DAY.value))
+
+    def __init__(self, orders, **kwargs):
+        super().__init__(**kwargs)
+        self._orders = orders
+        self._totals = None
+
+    def _order_totals(self) -> Dict:
+        if self._totals is None:
+            self._totals = self._orders.aggregate(**ORDER_TOTALS)
+        return self._totals
+
+    def resolve_customer_count(self, info):
+        return Customer.objects.count()
+
+    def resolve_order_count(self, info):
+        return self._order_totals()["order_count"]
+
+    def resolve_total_revenue(self, info):
+        return _cents(self._order_totals()["total_revenue"])
+
+    def _revenue_rows(self, period):
+        truncate = STATS_TRUNCATORS[getattr(period, "value", period)]
+        return (
+            self._orders.annotate(period_start=truncate("order_date"))
+            .values("period_start")
+            .annotate(order_count=Count("id"), revenue=Sum("total_amount"))
+            .order_by("period_start")
+        )
+
+    def resolve_revenue_by_period(self, info, period=StatsPeriod.DAY.value):
+        return [_revenue_bucket(row) for row in self._revenue_rows(period)]
+
+
+def _stats_orders(filter_input):
+    orders = _apply_filterset(Order.objects.all(), OrderFilter, filter_input)
+    if orders.query.distinct:
+        # Aggregate over matching ids so a fanned-out join cannot double-count revenue.
+        orders = Order.objects.filter(pk__in=orders.values("pk"))
+    return orders
+
 
 class Query(graphene.ObjectType):
     hello = graphene.String(default_value="Hello, GraphQL!")
-    all_customers = graphene.List(CustomerType)
-    all_products = DjangoFilterConnectionField(
+    all_customers = CRMFilterConnectionField(
+        CustomerNode,
+        filter=CustomerFilterInput(),
+        order_by=graphene.String(),
+        filterset_class=CustomerFilter,
+    )
+    all_products = CRMFilterConnectionField(
         ProductNode,
         filter=ProductFilterInput(),
         order_by=graphene.String(),
         filterset_class=ProductFilter,
     )
-    all_orders = DjangoFilterConnectionField(
+    all_orders = CRMFilterConnectionField(
         OrderNode,
         filter=OrderFilterInput(),
         order_by=graphene.String(),
         filterset_class=OrderFilter,
     )
+    crm_stats = graphene.Field(CRMStatsType, filter=OrderFilterInput())
 
     def resolve_all_customers(self, info, filter=None, order_by=None, **kwargs):
         queryset = Customer.objects.all()
@@ -242,9 +457,12 @@ class Query(graphene.ObjectType):
         return _apply_ordering(queryset, order_by, PRODUCT_ORDER_FIELDS)
 
     def resolve_all_orders(self, info, filter=None, order_by=None, **kwargs):
-        queryset = Order.objects.all().prefetch_related("products", "customer")
+        queryset = Order.objects.all()
         queryset = _apply_filterset(queryset, OrderFilter, filter)
-        return _apply_ordering(queryset.distinct(), order_by, ORDER_ORDER_FIELDS)
+        return _apply_ordering(queryset, order_by, ORDER_ORDER_FIELDS)
+
+    def resolve_crm_stats(self, info, filter=None):
+        return CRMStatsType(orders=_stats_orders(filter))
 
 
 class CreateCustomer(graphene.Mutation):
@@ -268,27 +486,59 @@ class CreateCustomer(graphene.Mutation):
 class BulkCreateCustomers(graphene.Mutation):
     class Arguments:
         input = graphene.List(graphene.NonNull(CustomerInput), required=True)
+        chunk_size = graphene.Int(default_value=BULK_CREATE_CHUNK_SIZE)
 
     customers = graphene.List(CustomerNode)
     errors = graphene.List(graphene.String)
 
     @classmethod
-    def mutate(cls, root, info, input):
+    def mutate(cls, root, info, input, chunk_size=BULK_CREATE_CHUNK_SIZE):
+        if not chunk_size or chunk_size < 1:
+            raise GraphQLError("Chunk size must be a positive integer.")
+        rows = list(enumerate(input, start=1))
         created: List[Customer] = []
-        errors: List[str] = []
-        for index, payload in enumerate(input, start=1):
-            try:
-                normalized = _coerce_input(payload)
-                with transaction.atomic():
-                    customer = _create_customer_instance(
-                        name=normalized.get("name", ""),
-                        email=normalized.get("email", ""),
-                        phone=normalized.get("phone"),
-                    )
-                created.append(customer)
-            except GraphQLError as exc:
-                errors.append(f"Row {index}: {exc.message}")
-        return BulkCreateCustomers(customers=created, errors=errors)
+        errors: List[Tuple[int, str]] = []
+        seen_emails: Set[str] = set()
+        with transaction.atomic(using=router.db_for_write(Customer)):
+            for start in range(0, len(rows), chunk_size):
+                candidates: List[Tuple[int, Customer]] = []
+                for index, payload in rows[start:start + chunk_size]:
+                    try:
+                        normalized = _coerce_input(payload)
+                        customer = _build_customer_instance(
+                            name=normalized.get("name", ""),
+                            email=normalized.get("email", ""),
+                            phone=normalized.get("phone"),
+                        )
+                    except GraphQLError as exc:
+                        errors.append((index, exc.message))
+                        continue
+                    email_key = customer.email.lower()
+                    if email_key in seen_emails:
+                        errors.append((index, "Email already exists."))
+                        continue
+                    seen_emails.add(email_key)
+                    candidates.append((index, customer))
+
+                existing = _existing_emails(customer.email for _, customer in candidates)
+                valid: List[Tuple[int, Customer]] = []
+                for index, customer in candidates:
+                    if customer.email.lower() in existing:
+                        errors.append((index, "Email already exists."))
+                    else:
+                        valid.append((index, customer))
+                if valid:
+                    inserted, insert_errors = _bulk_insert_customers(valid, chunk_size)
+                    created.extend(inserted)
+                    errors.extend(insert_errors)
+        if created:
+            # bulk_create skips post_save, so invalidate cached customer reads explicitly.
+            bump_versions("customer")
+        errors.sort(key=lambda item: item[0])
+        return BulkCreateCustomers(
+            customers=created,
+            errors=[f"Row {index}: {message}" for index, message in errors],
+        )
 
 
 class CreateProduct(graphene.Mutation):
@@ -321,39 +571,117 @@ class CreateOrder(graphene.Mutation):
     @classmethod
     def mutate(cls, root, info, input):
         payload = _coerce_input(input)
-        product_ids = payload.get("product_ids") or []
-        if not product_ids:
-            raise GraphQLError("At least one product ID is required.")
+        quantities = _order_quantities(payload)
         customer = _get_customer(payload.get("customer_id"))
-        products = _fetch_products(product_ids)
         order_date = payload.get("order_date") or timezone.now()
-        with transaction.atomic():
-            order = Order.objects.create(customer=customer, order_date=order_date)
-            order.products.set(products)
-            total = sum((product.price for product in products), Decimal("0.00"))
-            order.total_amount = total
-            order.save()
+        with transaction.atomic(using=router.db_for_write(Order)):
+            # Prices are read from the rows locked by the reservation, never from a stale copy.
+            products = _reserve_products(quantities)
+            total = sum((products[pk].price * quantity for pk, quantity in quantities.items()), Decimal("0.00"))
+            order = Order.objects.create(customer=customer, order_date=order_date, total_amount=total)
+            OrderItem.objects.bulk_create(
+                [OrderItem(order=order, product=products[pk], quantity=quantity) for pk, quantity in quantities.items()]
+            )
+            Customer.objects.record_order(customer.pk, order.order_date, total)
+            # The stock UPDATE and the item bulk insert bypass model signals.
+            bump_versions("product", ORDER_PRODUCTS)
         return CreateOrder(order=order)
 
 
+class BulkCreateOrders(graphene.Mutation):
+    class Arguments:
+        input = graphene.List(graphene.NonNull(OrderInput), required=True)
+        chunk_size = graphene.Int(default_value=BULK_CREATE_CHUNK_SIZE)
+
+    orders = graphene.List(OrderNode)
+    errors = graphene.List(graphene.String)
+
+    @classmethod
+    def mutate(cls, root, info, input, chunk_size=BULK_CREATE_CHUNK_SIZE):
+        if not chunk_size or chunk_size < 1:
+            raise GraphQLError("Chunk size must be a positive integer.")
+        errors: List[Tuple[int, str]] = []
+        rows = []
+        now = timezone.now()
+        for index, payload in enumerate(input, start=1):
+            try:
+                normalized = _coerce_input(payload)
+                quantities = _order_quantities(normalized)
+                customer_id = _to_db_id(normalized.get("customer_id"), "Customer")
+            except GraphQLError as exc:
+                errors.append((index, exc.message))
+                continue
+            rows.append((index, customer_id, quantities, normalized.get("order_date") or now))
+
+        created: List[Order] = []
+        with transaction.atomic(using=router.db_for_write(Order)):
+            # One query for every referenced customer and one locking query for every product.
+            customers = Customer.objects.in_bulk(sorted({customer_id for _, customer_id, _, _ in rows}))
+            products = Product.objects.locked({pk for _, _, quantities, _ in rows for pk in quantities})
+            available = {pk: product.stock for pk, product in products.items()}
+            taken: Dict[int, int] = {}
+            orders: List[Order] = []
+            order_quantities: List[Dict[int, int]] = []
+            for index, customer_id, quantities, order_date in rows:
+                if customer_id not in customers:
+                    errors.append((index, f"Customer with id {customer_id} not found."))
+                    continue
+                missing = set(quantities) - set(products)
+                if missing:
+                    errors.append((index, _invalid_products_error(missing).message))
+                    continue
+                shortages = {pk: (quantity, available[pk]) for pk, quantity in quantities.items() if available[pk] < quantity}
+                if shortages:
+                    errors.append((index, str(InsufficientStock(shortages))))
+                    continue
+                for pk, quantity in quantities.items():
+                    available[pk] -= quantity
+                    taken[pk] = taken.get(pk, 0) + quantity
+                total = sum((products[pk].price * quantity for pk, quantity in quantities.items()), Decimal("0.00"))
+                orders.append(Order(customer=customers[customer_id], order_date=order_date, total_amount=total))
+                order_quantities.append(quantities)
+            if orders:
+                Product.objects.take_stock(products, taken)
+                created = _insert_orders(orders, chunk_size)
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(order=order, product=products[pk], quantity=quantity)
+                        for order, quantities in zip(created, order_quantities)
+                        for pk, quantity in quantities.items()
+                    ],
+                    batch_size=chunk_size,
+                )
+                Customer.objects.record_orders(created)
+                # Bulk inserts and set-based UPDATEs skip model signals.
+                bump_versions("order", "customer", "product", ORDER_PRODUCTS)
+        loaders = get_loaders(info.context)
+        loaders.prime(customers.values())
+        loaders.prime(created)
+        errors.sort(key=lambda item: item[0])
+        return BulkCreateOrders(
+            orders=created,
+            errors=[f"Row {index}: {message}" for index, message in errors],
+        )
+
+
 class UpdateLowStockProducts(graphene.Mutation):
     class Arguments:
-        pass
+        threshold = graphene.Int(default_value=LOW_STOCK_THRESHOLD)
+        restock_amount = graphene.Int(default_value=LOW_STOCK_RESTOCK_AMOUNT)
 
     products = graphene.List(ProductNode)
     message = graphene.String()
 
     @classmethod
-    def mutate(cls, root, info):
-        # Query products with stock < 10
-        low_stock_products = Product.objects.filter(stock__lt=10)
-        
-        updated_products = []
-        for product in low_stock_products:
-            product.stock += 10
-            product.save()
-            updated_products.append(product)
-        
+    def mutate(cls, root, info, threshold=LOW_STOCK_THRESHOLD, restock_amount=LOW_STOCK_RESTOCK_AMOUNT):
+        if threshold is None or threshold < 0:
+            raise GraphQLError("Threshold cannot be negative.")
+        if restock_amount is None or restock_amount <= 0:
+            raise GraphQLError("Restock amount must be a positive value.")
+        updated_products = Product.objects.restock_below(threshold, restock_amount)
+        if updated_products:
+            # The set-based UPDATE bypasses post_save; only product reads are affected.
+            bump_versions("product")
         message = f"Updated {len(updated_products)} products with low stock."
         return UpdateLowStockProducts(products=updated_products, message=message)
 
@@ -363,4 +691,5 @@ class Mutation(graphene.ObjectType):
     bulk_create_customers = BulkCreateCustomers.Field()
     create_product = CreateProduct.Field()
     create_order = CreateOrder.Field()
+    bulk_create_orders = BulkCreateOrders.Field()
     update_low_stock_products = UpdateLowStockProducts.Field()
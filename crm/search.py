@@ -0,0 +1,163 @@
+"""Indexed substring search behind the name/email ``icontains`` filters.
+
+``LIKE '%term%'`` cannot use a B-tree index, so it scans the whole table. The columns listed in
+``SEARCH_FIELDS`` are searched through the best index the database offers instead:
+
+* PostgreSQL: GIN trigram indexes (``pg_trgm``) on ``UPPER(column)``. They serve the SQL that
+  Django already emits for ``icontains``, so the query is unchanged.
+* SQLite 3.34+: one FTS5 table per model with the ``trigram`` tokenizer. Triggers keep it in
+  step with the model table, and a term is matched as ``column MATCH '"term"'``.
+* Anything else, or a database without those extensions: a plain ``icontains`` scan.
+
+``CRM_SEARCH_BACKEND`` forces a strategy (``trigram``, ``fts5`` or ``scan``). Otherwise it is
+detected when a connection opens and after ``migrate``, both in sync code, so requests on the
+event loop never query for it; until it is known, a term is matched with a scan. Terms shorter
+than ``MIN_TERM_LENGTH`` contain no trigram and are scanned as well. Matching is
+case-insensitive on every backend.
+
+Migration ``0005_search_indexes`` creates the indexes with its own frozen copy of this DDL. SQLite drops a table's triggers when a
+migration rebuilds the table, so ``repair`` runs after every ``migrate`` and re-creates them.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models.expressions import RawSQL
+
+from crm.models import Customer, Product
+
+logger = logging.getLogger(__name__)
+
+MIN_TERM_LENGTH = 3
+SEARCH_FIELDS = {
+    Customer: ("name", "email"),
+    Product: ("name",),
+}
+
+TRIGRAM = "trigram"
+FTS5 = "fts5"
+SCAN = "scan"
+
+_backends: Dict[str, str] = {}
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _search_table(model) -> str:
+    return f"{model._meta.db_table}_search"
+
+
+def _detect(connection) -> str:
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            return TRIGRAM if cursor.fetchone() else SCAN
+        if connection.vendor == "sqlite":
+            tables = [_search_table(model) for model in SEARCH_FIELDS]
+            placeholders = ", ".join(["%s"] * len(tables))
+            cursor.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})", tables)
+            return FTS5 if cursor.fetchone()[0] == len(tables) else SCAN
+    return SCAN
+
+
+def backend(using: str = DEFAULT_DB_ALIAS) -> Optional[str]:
+    """The search strategy used on database ``using``, or None on the event loop before it is known."""
+    forced = getattr(settings, "CRM_SEARCH_BACKEND", None)
+    if forced:
+        return forced
+    if using not in _backends and not _in_event_loop():
+        _backends[using] = _detect(connections[using])
+    return _backends.get(using)
+
+
+def remember_backend(sender, connection, **kwargs) -> None:
+    """``connection_created`` hook: detect the strategy in the sync code that opened the connection."""
+    if connection.alias in _backends or getattr(settings, "CRM_SEARCH_BACKEND", None):
+        return
+    try:
+        _backends[connection.alias] = _detect(connection)
+    except DatabaseError as exc:
+        logger.warning("Could not detect the search backend of %r (%s); detecting on first use.", connection.alias, exc)
+
+
+def reset() -> None:
+    """Forget detected backends, e.g. after changing the schema."""
+    _backends.clear()
+
+
+def contains(queryset, field: str, term: str):
+    """Filter ``queryset`` to rows whose ``field`` contains ``term``, ignoring case."""
+    model = queryset.model
+    strategy = backend(queryset.db)
+    if strategy == FTS5 and len(term) >= MIN_TERM_LENGTH and field in SEARCH_FIELDS.get(model, ()):
+        qn = connections[queryset.db].ops.quote_name
+        sql = f"SELECT rowid FROM {qn(_search_table(model))} WHERE {qn(model._meta.get_field(field).column)} MATCH %s"
+        phrase = '"' + term.replace('"', '""') + '"'
+        return queryset.filter(pk__in=RawSQL(sql, [phrase]))
+    return queryset.filter(**{f"{field}__icontains": term})
+
+
+def _fts5_trigram_available(cursor) -> bool:
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.crm_fts5_probe USING fts5(value, tokenize = 'trigram')")
+    except DatabaseError:
+        return False
+    cursor.execute("DROP TABLE temp.crm_fts5_probe")
+    return True
+
+
+def _install_fts5(connection, fields) -> None:
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if not _fts5_trigram_available(cursor):
+            logger.warning("SQLite lacks the FTS5 trigram tokenizer; substring search falls back to icontains scans.")
+            return
+        for model, names in fields.items():
+            table, search_table = model._meta.db_table, _search_table(model)
+            columns = [qn(model._meta.get_field(field).column) for field in names]
+            pk = qn(model._meta.pk.column)
+            new_values = ", ".join(f"new.{column}" for column in columns)
+            old_values = ", ".join(f"old.{column}" for column in columns)
+            column_list = ", ".join(columns)
+            delete_old = (
+                f"INSERT INTO {qn(search_table)} ({qn(search_table)}, rowid, {column_list}) "
+                f"VALUES ('delete', old.{pk}, {old_values});"
+            )
+            insert_new = f"INSERT INTO {qn(search_table)} (rowid, {column_list}) VALUES (new.{pk}, {new_values});"
+            triggers = {
+                f"{search_table}_insert": f"AFTER INSERT ON {qn(table)} BEGIN {insert_new} END",
+                f"{search_table}_delete": f"AFTER DELETE ON {qn(table)} BEGIN {delete_old} END",
+                f"{search_table}_update": f"AFTER UPDATE OF {column_list} ON {qn(table)} BEGIN {delete_old} {insert_new} END",
+            }
+            cursor.execute(
+                f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * (len(triggers) + 1))})",
+                [search_table, *triggers],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            if existing == {search_table, *triggers}:
+                continue
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {qn(search_table)} USING fts5("
+                f"{column_list}, tokenize = 'trigram', content = '{table}', content_rowid = '{model._meta.pk.column}')"
+            )
+            for name, body in triggers.items():
+                cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {qn(name)} {body}")
+            # Rows written while the triggers were missing are not indexed; rebuild from the table.
+            cursor.execute(f"INSERT INTO {qn(search_table)} ({qn(search_table)}) VALUES ('rebuild')")
+
+
+def repair(using: str = DEFAULT_DB_ALIAS, **kwargs) -> None:
+    """``post_migrate`` hook: restore SQLite search triggers that a table rebuild dropped."""
+    connection = connections[using]
+    _backends[using] = _detect(connection)
+    if connection.vendor == "sqlite" and _backends[using] == FTS5:
+        _install_fts5(connection, SEARCH_FIELDS)
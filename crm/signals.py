@@ -0,0 +1,37 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from crm.models import Customer, Order, OrderItem, Product
+from crm.response_cache import ORDER_PRODUCTS, bump_versions
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def invalidate_model_responses(sender, using, **kwargs):
+    bump_versions(sender._meta.model_name, using=using)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def invalidate_order_product_responses(sender, action, using, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_versions(ORDER_PRODUCTS, using=using)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_item_responses(sender, using, **kwargs):
+    bump_versions(ORDER_PRODUCTS, using=using)
+
+
+@receiver(post_delete, sender=Order)
+def forget_deleted_order(sender, instance, using, origin=None, **kwargs):
+    # Orders cascading from a customer delete would update a row that is about to go too.
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is Customer:
+        return
+    Customer.objects.db_manager(using).forget_order(instance.customer_id, instance.order_date, instance.total_amount)
@@ -1,25 +1,21 @@
 from datetime import datetime
 from celery import shared_task
-from gql import gql, Client
 
-import requests
-from gql.transport.requests import RequestsHTTPTransport
+from crm.graphql_client import execute_graphql
+
+CRM_REPORT_QUERY = '''
+query CRMReport {
+  crmStats { customerCount orderCount totalRevenue }
+}
+'''
 
 @shared_task
 def generate_crm_report():
-    transport = RequestsHTTPTransport(url='http://localhost:8000/graphql')
-    client = Client(transport=transport, fetch_schema_from_transport=True)
-    query = gql('''
-    query CRMReport {
-      totalCustomers: allCustomers { totalCount }
-      totalOrders: allOrders { totalCount }
-      orders: allOrders { edges { node { totalAmount } } }
-    }
-    ''')
-    result = client.execute(query)
-    total_customers = result['totalCustomers']['totalCount']
-    total_orders = result['totalOrders']['totalCount']
-    total_revenue = sum(edge['node']['totalAmount'] for edge in result['orders']['edges'])
+    result = execute_graphql(CRM_REPORT_QUERY)
+    stats = result['crmStats']
+    total_customers = stats['customerCount']
+    total_orders = stats['orderCount']
+    total_revenue = stats['totalRevenue']
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     with open('/tmp/crm_report_log.txt', 'a') as f:
       f.write(f"{timestamp} - Report: {total_customers} customers, {total_orders} orders, {total_revenue} revenue\n")
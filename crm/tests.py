@@ -1,3 +1,1561 @@
-from django.test import TestCase
+import base64
+import contextlib
+import io
+import json
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import django_filters
+import graphene
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, router, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from graphene_django import DjangoObjectType
+
+from alx_backend_graphql.database import database_from_env
+from alx_backend_graphql.schema import async_schema, schema
+from crm.filters import CustomerFilter, OrderFilter, ProductFilter
+from crm import search
+from crm.models import Customer, InsufficientStock, JobWatermark, Order, OrderItem, OrderReminder, Product
+from crm.persisted_queries import persisted_queries, query_hash
+from crm.replicas import STICKY_COOKIE
+from crm.schema import (
+    CUSTOMER_ORDER_FIELDS,
+    ORDER_ORDER_FIELDS,
+    PRODUCT_ORDER_FIELDS,
+    _apply_filterset,
+    _apply_ordering,
+)
+from crm.views import CUSTOMER_EXPORT_COLUMNS, ORDER_EXPORT_COLUMNS, export_customers, export_orders
+
+PRIMARY = "crm_test_primary"
+REPLICA = "crm_test_replica"
+
+# A MATCH against an FTS5 table reads its full-text index ("VIRTUAL TABLE INDEX n:M..."), not every row.
+FULL_SCAN = re.compile(r"\bSCAN (?:TABLE )?(crm_\w+)\b(?! USING| VIRTUAL TABLE INDEX \d+:M)")
+
+NOW = timezone.now()
+CUSTOMER_FILTERS = [
+    {"created_at_gte": NOW},
+    {"created_at_lte": NOW},
+    {"phone_pattern": "+1"},
+    {"last_order_at_lte": NOW},
+    {"order_count_gte": 5},
+    {"lifetime_value_gte": 100},
+    {"name_icontains": "omer 12"},
+    {"email_icontains": "customer12@"},
+]
+PRODUCT_FILTERS = [
+    {"price_gte": 10},
+    {"price_lte": 10},
+    {"stock_gte": 5},
+    {"stock_lte": 5},
+    {"name_icontains": "duct 12"},
+]
+ORDER_FILTERS = [
+    {"total_amount_gte": 10},
+    {"total_amount_lte": 10},
+    {"order_date_gte": NOW},
+    {"order_date_lte": NOW},
+    {"product_id": 1},
+    {"customer_name": "omer 12"},
+    {"product_name": "duct 12"},
+]
+
+
+def post_graphql(query, variables=None, asynchronous=False, extensions=None):
+    """POST ``query`` to the sync or async GraphQL view and return the decoded response body."""
+    from crm.views import AsyncCRMGraphQLView, CRMGraphQLView
+
+    payload = {"query": query, "variables": variables or {}}
+    if extensions is not None:
+        payload["extensions"] = extensions
+    body = json.dumps(payload)
+    request = RequestFactory().post("/graphql", data=body, content_type="application/json")
+    # No graphene debug middleware (on when DEBUG was set at import): it rewraps every cursor.
+    if asynchronous:
+        response = async_to_sync(AsyncCRMGraphQLView.as_view(schema=async_schema, middleware=[]))(request)
+    else:
+        response = CRMGraphQLView.as_view(schema=schema, middleware=[])(request)
+    return json.loads(response.content)
+
+
+@skipUnless(connection.vendor == "sqlite", "Plan assertions use SQLite's EXPLAIN QUERY PLAN output.")
+class IndexCoverageTests(TestCase):
+    """Every indexed filter and ordering path must avoid a full table scan.
+
+    The tables hold rows and fresh ``ANALYZE`` statistics, so the planner weighs the indexes as
+    it would in production rather than picking them because every table looks empty. Substring
+    filters use terms of at least ``search.MIN_TERM_LENGTH`` characters; shorter ones scan by design.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        products = Product.objects.bulk_create(
+            Product(name=f"Product {index}", price=index % 50 + 1, stock=index % 40) for index in range(200)
+        )
+        customers = Customer.objects.bulk_create(
+            Customer(
+                name=f"Customer {index}",
+                email=f"customer{index}@example.com",
+                phone=f"555-{index:04}",
+                order_count=index % 7,
+                lifetime_value=index % 300,
+                last_order_at=NOW - timedelta(days=index % 700),
+            )
+            for index in range(1000)
+        )
+        orders = Order.objects.bulk_create(
+            Order(
+                customer=customers[index % len(customers)],
+                total_amount=index % 500,
+                order_date=NOW - timedelta(days=index % 700, minutes=index),
+            )
+            for index in range(3000)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=products[(index * 7 + offset) % len(products)], quantity=1)
+            for index, order in enumerate(orders)
+            for offset in range(2)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertNoFullScan(self, queryset, label):
+        plan = queryset.explain()
+        scans = FULL_SCAN.findall(plan)
+        self.assertFalse(scans, f"{label} scans {', '.join(scans)}:\n{plan}")
+
+    def check_paths(self, model, filterset_class, filters, order_fields):
+        for data in filters:
+            queryset = _apply_filterset(model.objects.all(), filterset_class, data)
+            self.assertNoFullScan(queryset, f"{model.__name__} filter {data}")
+            for field in order_fields:
+                ordered = _apply_ordering(queryset, field, order_fields)
+                self.assertNoFullScan(ordered, f"{model.__name__} filter {data} order_by {field}")
+        for field in order_fields:
+            for direction in ("", "-"):
+                ordered = _apply_ordering(model.objects.all(), direction + field, order_fields)
+                self.assertNoFullScan(ordered, f"{model.__name__} order_by {direction}{field}")
+
+    def test_customer_paths(self):
+        self.check_paths(Customer, CustomerFilter, CUSTOMER_FILTERS, CUSTOMER_ORDER_FIELDS)
+
+    def test_product_paths(self):
+        self.check_paths(Product, ProductFilter, PRODUCT_FILTERS, PRODUCT_ORDER_FIELDS)
+
+    def test_order_paths(self):
+        self.check_paths(Order, OrderFilter, ORDER_FILTERS, ORDER_ORDER_FIELDS)
+
+    def test_low_stock_lookup(self):
+        self.assertNoFullScan(Product.objects.filter(stock__lt=10), "low stock")
+
+    def test_inactive_customer_lookup(self):
+        cutoff = timezone.now() - timedelta(days=365)
+        inactive = Customer.objects.exclude(orders__order_date__gte=cutoff)
+        # Every customer is a candidate, but the per-customer order probe must be an index search.
+        self.assertIn("crm_order_customer_date_idx", inactive.explain())
+
+    def test_case_insensitive_email_lookup(self):
+        lookup = Customer.objects.annotate(email_lower=Lower("email")).filter(email_lower__in=["ada@example.com"])
+        self.assertIn("crm_customer_email_ci_unique", lookup.explain())
+
+    def test_inactive_customer_stats_lookup(self):
+        cutoff = timezone.now() - timedelta(days=365)
+        inactive = Customer.objects.filter(Q(last_order_at__lt=cutoff) | Q(last_order_at__isnull=True))
+        self.assertNoFullScan(inactive, "inactive customers by last_order_at")
+
+
+class OrderProductFilterTests(TestCase):
+    """Product filters on orders are semi-joins and never need DISTINCT."""
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        cls.laptop = Product.objects.create(name="Laptop Pro", price=10, stock=5)
+        cls.sleeve = Product.objects.create(name="Laptop Sleeve", price=2, stock=5)
+        mouse = Product.objects.create(name="Mouse", price=1, stock=5)
+        cls.both = Order.objects.create(customer=customer, total_amount=12)
+        cls.both.products.add(cls.laptop, cls.sleeve)
+        cls.mouse_only = Order.objects.create(customer=customer, total_amount=1)
+        cls.mouse_only.products.add(mouse)
+
+    def filtered(self, data):
+        return _apply_filterset(Order.objects.all(), OrderFilter, data)
+
+    def test_product_filters_compile_to_semi_joins(self):
+        semi_join = '"CRM_ORDER"."ID" IN (SELECT' if connection.vendor == "sqlite" else "EXISTS"
+        for data in ({"product_id": self.laptop.pk}, {"product_name": "laptop"}, {"product_name": "la"}):
+            sql = str(self.filtered(data).query).upper()
+            self.assertIn(semi_join, sql, data)
+            self.assertIn("CRM_ORDER_PRODUCTS", sql, data)
+            self.assertNotIn("DISTINCT", sql, data)
+            self.assertNotIn("JOIN", sql, data)
+
+    def test_product_filters_return_each_order_once(self):
+        self.assertEqual(list(self.filtered({"product_name": "laptop"})), [self.both])
+        self.assertEqual(list(self.filtered({"product_id": self.sleeve.pk})), [self.both])
+        self.assertEqual(list(self.filtered({"product_name": "Mou", "product_id": self.laptop.pk})), [])
+
+    def test_distinct_only_for_fan_out(self):
+        class ProductPriceFilter(OrderFilter):
+            product_price_gte = django_filters.NumberFilter(field_name="products__price", lookup_expr="gte")
+
+        self.assertFalse(self.filtered({"total_amount_gte": 1}).query.distinct)
+        fanned_out = _apply_filterset(Order.objects.all(), ProductPriceFilter, {"product_price_gte": 2})
+        self.assertTrue(fanned_out.query.distinct)
+        self.assertEqual(list(fanned_out), [self.both])
+
+
+class KeysetPaginationTests(TestCase):
+    """Walking every keyset page returns each row once, in the order of a single query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        day = NOW - timedelta(days=3)
+        for index, (last_order_at, order_count) in enumerate(
+            [(day, 2), (None, 0), (day, 2), (NOW, 5), (None, 0), (day, 1), (NOW, 5)]
+        ):
+            Customer.objects.create(
+                name=f"Customer {index}",
+                email=f"customer{index}@example.com",
+                last_order_at=last_order_at,
+                order_count=order_count,
+            )
+
+    def walk(self, order_by):
+        ids, after = [], None
+        while True:
+            result = post_graphql(
+                """
+                query Page($orderBy: String, $after: String) {
+                  allCustomers(keyset: true, first: 2, after: $after, orderBy: $orderBy) {
+                    edges { node { databaseId } }
+                    pageInfo { hasNextPage endCursor }
+                  }
+                }
+                """,
+                {"orderBy": order_by, "after": after},
+            )
+            self.assertNotIn("errors", result)
+            page = result["data"]["allCustomers"]
+            ids.extend(edge["node"]["databaseId"] for edge in page["edges"])
+            if not page["pageInfo"]["hasNextPage"]:
+                return ids
+            after = page["pageInfo"]["endCursor"]
+
+    def expected(self, key, descending):
+        customers = list(Customer.objects.all())
+        present = [customer for customer in customers if getattr(customer, key) is not None]
+        present.sort(key=lambda customer: (getattr(customer, key), customer.pk), reverse=descending)
+        missing = sorted((customer.pk for customer in customers if getattr(customer, key) is None), reverse=descending)
+        return [customer.pk for customer in present] + missing
+
+    def test_ties_in_both_directions(self):
+        self.assertEqual(self.walk("order_count"), self.expected("order_count", False))
+        self.assertEqual(self.walk("-order_count"), self.expected("order_count", True))
+
+    def test_nulls_come_last_in_both_directions(self):
+        self.assertEqual(self.walk("last_order_at"), self.expected("last_order_at", False))
+        self.assertEqual(self.walk("-last_order_at"), self.expected("last_order_at", True))
+
+
+@override_settings(CRM_RESPONSE_CACHE_ENABLED=False)
+class AllCustomersConnectionTests(TestCase):
+    """``allCustomers`` caps page sizes, counts every match and pages through filtered rows."""
+
+    PAGE = """
+    query Page($filter: CustomerFilterInput, $first: Int, $last: Int, $after: String, $keyset: Boolean) {
+      allCustomers(filter: $filter, orderBy: "name", first: $first, last: $last, after: $after, keyset: $keyset) {
+        totalCount
+        edges { node { name } }
+        pageInfo { hasNextPage endCursor }
+      }
+    }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ("Ada", "Alan", "Barbara", "Grace", "Katherine", "Linus"):
+            Customer.objects.create(name=name, email=f"{name.lower()}@example.com")
+
+    def page(self, asynchronous=False, **variables):
+        result = post_graphql(self.PAGE, variables, asynchronous)
+        self.assertNotIn("errors", result)
+        page = result["data"]["allCustomers"]
+        names = [edge["node"]["name"] for edge in page["edges"]]
+        return page["totalCount"], names, page["pageInfo"]
+
+    def test_page_size_is_capped(self):
+        for asynchronous in (False, True):
+            for name, variables in (("first", {"first": 101}), ("last", {"last": 101}), ("first", {"first": 101, "keyset": True})):
+                with self.subTest(asynchronous=asynchronous, variables=variables):
+                    result = post_graphql(self.PAGE, variables, asynchronous)
+                    self.assertEqual(
+                        [error["message"] for error in result["errors"]],
+                        [f"Requesting 101 records on the `allCustomers` connection exceeds the `{name}` limit of 100 records."],
+                    )
+                    self.assertIsNone(result["data"]["allCustomers"])
+            with self.subTest(asynchronous=asynchronous, variables="at the limit"):
+                self.assertEqual(self.page(asynchronous, first=100)[:2], (6, ["Ada", "Alan", "Barbara", "Grace", "Katherine", "Linus"]))
+
+    def test_total_count_spans_pages(self):
+        for asynchronous in (False, True):
+            with self.subTest(asynchronous=asynchronous):
+                self.assertEqual(self.page(asynchronous)[0], 6)
+                self.assertEqual(self.page(asynchronous, first=2)[:2], (6, ["Ada", "Alan"]))
+                self.assertEqual(self.page(asynchronous, last=1)[:2], (6, ["Linus"]))
+                self.assertEqual(self.page(asynchronous, first=2, keyset=True)[:2], (6, ["Ada", "Alan"]))
+
+    def test_filtered_pages(self):
+        # "a" matches every name but Linus.
+        for asynchronous in (False, True):
+            for keyset in (False, True):
+                with self.subTest(asynchronous=asynchronous, keyset=keyset):
+                    seen, after = [], None
+                    while True:
+                        total, names, page_info = self.page(
+                            asynchronous, filter={"nameIcontains": "A"}, first=2, after=after, keyset=keyset
+                        )
+                        self.assertEqual(total, 5)
+                        seen.append(names)
+                        if not page_info["hasNextPage"]:
+                            break
+                        after = page_info["endCursor"]
+                    self.assertEqual(seen, [["Ada", "Alan"], ["Barbara", "Grace"], ["Katherine"]])
+        total, names, _ = self.page(filter={"nameIcontains": "a", "emailIcontains": "grace"}, first=2)
+        self.assertEqual((total, names), (1, ["Grace"]))
+
+
+@override_settings(
+    DATABASE_ROUTERS=["crm.replicas.ReplicaRouter"],
+    CRM_DB_PRIMARY_ALIAS=PRIMARY,
+    CRM_DB_READ_ALIAS=REPLICA,
+    CRM_DB_STICKY_SECONDS=30,
+    CRM_RESPONSE_CACHE_ENABLED=False,
+)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Two SQLite files stand in for the primary and a replica that stopped replicating after setup."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The aliases are added once SimpleTestCase has blocked the configured databases. The test
+        # runner never sees them, and a query that misses the router and reaches "default" fails.
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        for alias in (PRIMARY, REPLICA):
+            configured = connections.configure_settings({
+                DEFAULT_DB_ALIAS: {},
+                alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": str(Path(cls.directory.name) / f"{alias}.sqlite3")},
+            })
+            connections.settings[alias] = configured[alias]
+        cls.databases = {PRIMARY, REPLICA}
+        try:
+            call_command("migrate", database=PRIMARY, verbosity=0)
+            Customer.objects.create(name="Replicated", email="replicated@example.com")
+            connections[PRIMARY].close()
+            shutil.copyfile(connections.settings[PRIMARY]["NAME"], connections.settings[REPLICA]["NAME"])
+        except Exception:
+            cls.tearDownClass()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in (PRIMARY, REPLICA):
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.databases = set()
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def graphql(self, query, cookies=None):
+        from crm.views import CRMGraphQLView
+
+        request = RequestFactory().post("/graphql", data=json.dumps({"query": query}), content_type="application/json")
+        request.COOKIES.update(cookies or {})
+        # No graphene debug middleware (on when DEBUG was set at import): it rewraps every cursor.
+        response = CRMGraphQLView.as_view(schema=schema, middleware=[])(request)
+        return json.loads(response.content), response
+
+    def customer_emails(self, cookies=None):
+        result, _ = self.graphql("{ allCustomers(orderBy: \"email\") { edges { node { email } } } }", cookies)
+        return [edge["node"]["email"] for edge in result["data"]["allCustomers"]["edges"]]
+
+    def test_writes_go_to_the_primary_and_queries_to_the_replica(self):
+        Customer.objects.create(name="Unreplicated", email="unreplicated@example.com")
+        self.assertEqual(router.db_for_read(Customer), PRIMARY)
+        self.assertEqual(self.customer_emails(), ["replicated@example.com"])
+
+        result, response = self.graphql(
+            'mutation { createCustomer(input: {name: "Grace", email: "grace@example.com"}) { customer { email } } }'
+        )
+        self.assertEqual(result["data"]["createCustomer"]["customer"]["email"], "grace@example.com")
+        self.assertTrue(Customer.objects.using(PRIMARY).filter(email="grace@example.com").exists())
+        self.assertFalse(Customer.objects.using(REPLICA).filter(email="grace@example.com").exists())
+
+        # The mutation's cookie pins this client to the primary; others still read the replica.
+        sticky = {STICKY_COOKIE: response.cookies[STICKY_COOKIE].value}
+        self.assertIn("grace@example.com", self.customer_emails(sticky))
+        self.assertEqual(self.customer_emails(), ["replicated@example.com"])
+
+    def test_replica_is_read_again_after_the_window(self):
+        self.assertEqual(self.customer_emails({STICKY_COOKIE: str(time.time() - 1)}), ["replicated@example.com"])
+        self.assertEqual(self.customer_emails({STICKY_COOKIE: "garbage"}), ["replicated@example.com"])
+
+    def test_deleted_orders_leave_stats_on_their_database(self):
+        customer = Customer.objects.using(REPLICA).create(
+            name="Replica only", email="replica-only@example.com", order_count=1, lifetime_value=5
+        )
+        self.addCleanup(Customer.objects.using(REPLICA).filter(pk=customer.pk).delete)
+        order = Order.objects.using(REPLICA).create(customer=customer, total_amount=5)
+        Order.objects.using(REPLICA).filter(pk=order.pk).delete()
+        customer.refresh_from_db(using=REPLICA)
+        self.assertEqual((customer.order_count, customer.lifetime_value), (0, 0))
+
+    @override_settings(CRM_RESPONSE_CACHE_ENABLED=True)
+    def test_replica_reads_are_not_cached_right_after_a_write(self):
+        caches["graphql"].clear()
+        self.addCleanup(caches["graphql"].clear)
+        self.addCleanup(Customer.objects.using(PRIMARY).filter(email="lagged@example.com").delete)
+        self.graphql('mutation { createCustomer(input: {name: "Lagged", email: "lagged@example.com"}) { customer { id } } }')
+
+        # The replica lags the write; its answer must not be cached under the new customer version.
+        for _ in range(2):
+            with CaptureQueriesContext(connections[REPLICA]) as queries:
+                self.assertEqual(self.customer_emails(), ["replicated@example.com"])
+            self.assertTrue(queries)
+
+        later = time.time() + 31
+        with mock.patch("crm.response_cache.time.time", return_value=later):
+            self.customer_emails()
+            with CaptureQueriesContext(connections[REPLICA]) as queries:
+                self.customer_emails()
+        self.assertFalse(queries)
+
+    def test_replica_is_never_migrated(self):
+        self.assertIs(router.allow_migrate(REPLICA, "crm"), False)
+        self.assertIsNot(router.allow_migrate(PRIMARY, "crm"), False)
+
+
+class SendOrderRemindersTests(TestCase):
+    """Reminders are taken in past the watermark, sent once per customer, and never resent."""
+
+    def setUp(self):
+        self.ada = Customer.objects.create(name="Ada", email="ada@example.com")
+        self.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        self.log_file = Path(tempfile.mkdtemp()) / "reminders.log"
+        self.addCleanup(shutil.rmtree, self.log_file.parent)
+
+    def run_job(self, **options):
+        call_command("send_order_reminders", log_file=str(self.log_file), page_size=1, stdout=io.StringIO(), **options)
+        return self.log_file.read_text().splitlines() if self.log_file.exists() else []
+
+    def test_reruns_only_send_new_orders(self):
+        first = Order.objects.create(customer=self.ada)
+        second = Order.objects.create(customer=self.ada)
+        Order.objects.create(customer=self.bob, order_date=NOW - timedelta(days=30))
+        lines = self.run_job()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith(f"Reminder to ada@example.com for order ID(s) {first.pk}, {second.pk}"))
+
+        self.assertEqual(self.run_job(), lines)
+        third = Order.objects.create(customer=self.bob)
+        lines = self.run_job()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(f"Reminder to bob@example.com for order ID(s) {third.pk}"))
+        self.assertEqual(JobWatermark.objects.get(name="order_reminders").last_id, third.pk)
+        self.assertFalse(OrderReminder.objects.filter(sent_at__isnull=True).exists())
+
+    def test_late_commits_below_the_watermark_are_picked_up(self):
+        Order.objects.create(customer=self.ada)
+        self.run_job()
+        late = Order.objects.create(customer=self.bob)
+        # As if ``late`` had committed after a run that already moved the watermark past its id.
+        JobWatermark.objects.filter(name="order_reminders").update(last_id=late.pk + 5)
+        lines = self.run_job()
+        self.assertTrue(lines[-1].endswith(f"Reminder to bob@example.com for order ID(s) {late.pk}"))
+        self.assertEqual(len(self.run_job(overlap=0)), len(lines))
+
+
+class ExportTests(TestCase):
+    """Exports stream filtered, ordered rows and reject parameters they don't know."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ada = Customer.objects.create(name="Ada", email="ada@example.com", phone="555-0100")
+        cls.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        pen = Product.objects.create(name="Pen", price="2.00", stock=10)
+        ink = Product.objects.create(name="Ink", price="7.00", stock=10)
+        cls.first = Order.objects.create(
+            customer=cls.ada, total_amount="4.00", order_date=datetime(2025, 1, 5, tzinfo=dt_timezone.utc)
+        )
+        OrderItem.objects.create(order=cls.first, product=pen, quantity=2)
+        cls.second = Order.objects.create(
+            customer=cls.bob, total_amount="9.00", order_date=datetime(2025, 2, 1, tzinfo=dt_timezone.utc)
+        )
+        OrderItem.objects.create(order=cls.second, product=pen, quantity=1)
+        OrderItem.objects.create(order=cls.second, product=ink, quantity=1)
+
+    def export(self, view, **params):
+        view = {"orders": export_orders, "customers": export_customers}[view]
+        response = view(RequestFactory().get("/export", params))
+        if response.status_code != 200:
+            return response.status_code, response.content.decode()
+        return response["Content-Type"], b"".join(response.streaming_content).decode()
+
+    def ndjson(self, view, **params):
+        content_type, body = self.export(view, **params)
+        self.assertEqual(content_type, "application/x-ndjson")
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_orders_ndjson(self):
+        rows = self.ndjson("orders")
+        self.assertEqual(rows, [
+            {
+                "id": self.first.pk, "order_date": "2025-01-05T00:00:00Z", "total_amount": "4.00",
+                "customer_id": self.ada.pk, "customer_name": "Ada", "customer_email": "ada@example.com",
+                "product_ids": [self.first.items.get().product_id], "product_names": ["Pen"],
+            },
+            {
+                "id": self.second.pk, "order_date": "2025-02-01T00:00:00Z", "total_amount": "9.00",
+                "customer_id": self.bob.pk, "customer_name": "Bob", "customer_email": "bob@example.com",
+                "product_ids": sorted(self.second.items.values_list("product_id", flat=True)),
+                "product_names": ["Pen", "Ink"],
+            },
+        ])
+
+    def test_orders_csv(self):
+        content_type, body = self.export("orders", format="csv", order_by="-total_amount")
+        self.assertEqual(content_type, "text/csv")
+        lines = body.splitlines()
+        self.assertEqual(lines[0], ",".join(ORDER_EXPORT_COLUMNS))
+        self.assertEqual([line.split(",")[0] for line in lines[1:]], [str(self.second.pk), str(self.first.pk)])
+        self.assertTrue(lines[1].endswith(",Pen;Ink"))
+
+    def test_order_filters(self):
+        for params in (
+            {"filter": json.dumps({"customerName": "ad"})},
+            {"customerName": "ad"},
+            {"customer_name": "ad"},
+            {"filter": json.dumps({"orderDateLte": "2025-01-31T00:00:00Z"})},
+            {"total_amount_lte": "5"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual([row["id"] for row in self.ndjson("orders", **params)], [self.first.pk])
+        rows = self.ndjson("orders", productName="ink", order_by="-order_date")
+        self.assertEqual([row["id"] for row in rows], [self.second.pk])
+
+    def test_customers(self):
+        rows = self.ndjson("customers", order_by="-name")
+        self.assertEqual([(row["name"], row["email"], row["phone"]) for row in rows], [
+            ("Bob", "bob@example.com", ""), ("Ada", "ada@example.com", "555-0100"),
+        ])
+        content_type, body = self.export("customers", format="csv", filter=json.dumps({"emailIcontains": "BOB"}))
+        self.assertEqual(content_type, "text/csv")
+        self.assertEqual(body.splitlines()[0], ",".join(CUSTOMER_EXPORT_COLUMNS))
+        self.assertEqual([line.split(",")[1] for line in body.splitlines()[1:]], ["Bob"])
+
+    def test_bad_requests(self):
+        for view, params in (
+            ("orders", {"format": "xml"}),
+            ("orders", {"orderDateGte": "yesterday"}),
+            ("orders", {"filter": json.dumps({"orderDateGte": "yesterday"})}),
+            ("orders", {"bogus": "1"}),
+            ("orders", {"customer_nme": "x"}),
+            ("orders", {"filter": json.dumps({"bogus": 1})}),
+            ("orders", {"filter": "[1]"}),
+            ("customers", {"nameIcontain": "a"}),
+            ("customers", {"format": "xml"}),
+        ):
+            with self.subTest(view=view, params=params):
+                self.assertEqual(self.export(view, **params)[0], 400)
+
+
+class CleanupInactiveCustomersTests(TestCase):
+    """Inactive customers go in checkpointed chunks; anyone who ordered since the scan stays."""
+
+    def setUp(self):
+        self.inactive = []
+        for index in range(5):
+            customer = Customer.objects.create(name=f"Idle {index}", email=f"idle{index}@example.com")
+            if index % 2:
+                order = Order.objects.create(customer=customer, order_date=NOW - timedelta(days=400))
+                OrderItem.objects.create(order=order, product=self.product(), quantity=1)
+                OrderReminder.objects.create(order=order, customer=customer)
+            self.inactive.append(customer.pk)
+        self.active = Customer.objects.create(name="Active", email="active@example.com")
+        Order.objects.create(customer=self.active)
+        self.state_file = Path(tempfile.mkdtemp()) / "cleanup.json"
+        self.addCleanup(shutil.rmtree, self.state_file.parent)
+
+    def product(self):
+        return Product.objects.get_or_create(name="Pen", defaults={"price": "2.00", "stock": 10})[0]
+
+    def run_job(self, **options):
+        output = io.StringIO()
+        call_command(
+            "cleanup_inactive_customers", chunk_size=2, sleep=0, state_file=str(self.state_file), stdout=output,
+            **options,
+        )
+        return output.getvalue().splitlines()
+
+    def remaining(self):
+        return sorted(Customer.objects.values_list("pk", flat=True))
+
+    def test_deletes_in_chunks(self):
+        lines = self.run_job()
+        self.assertEqual([line.split(":")[0] for line in lines[:-1]], ["Chunk 1", "Chunk 2", "Chunk 3"])
+        self.assertEqual(lines[-1].split(" in ")[0], "Deleted 5 inactive customers (2 orders, 2 order products)")
+        self.assertEqual(self.remaining(), [self.active.pk])
+        self.assertEqual(list(Order.objects.values_list("customer_id", flat=True)), [self.active.pk])
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(OrderReminder.objects.exists())
+        self.assertFalse(self.state_file.exists())
+
+    def test_dry_run_deletes_nothing(self):
+        lines = self.run_job(dry_run=True)
+        self.assertEqual(lines, ["Dry run: would delete 5 inactive customers and 2 orders in 3 chunks."])
+        self.assertEqual(len(self.remaining()), 6)
+        self.assertFalse(self.state_file.exists())
+
+    def test_resumes_from_the_checkpoint(self):
+        cutoff = NOW - timedelta(days=365)
+        self.state_file.write_text(json.dumps({
+            "cutoff": cutoff.isoformat(), "last_pk": self.inactive[1], "customers": 2, "orders": 1, "order_products": 1,
+        }))
+        lines = self.run_job()
+        self.assertEqual(lines[0], f"Resuming after customer {self.inactive[1]} with cutoff {cutoff.isoformat()}.")
+        self.assertEqual(lines[-1].split(" in ")[0], "Deleted 5 inactive customers (2 orders, 2 order products)")
+        self.assertEqual(self.remaining(), self.inactive[:2] + [self.active.pk])
+        self.assertFalse(self.state_file.exists())
+
+        # --restart ignores a checkpoint and starts over.
+        self.state_file.write_text(json.dumps({"cutoff": cutoff.isoformat(), "last_pk": self.active.pk}))
+        self.run_job(restart=True)
+        self.assertEqual(self.remaining(), [self.active.pk])
+
+    def test_spares_customers_who_ordered_since_the_scan(self):
+        def order_meanwhile(seconds):
+            # Chunk 2's ids are already read; its first customer orders before the chunk is locked.
+            Order.objects.create(customer_id=self.inactive[2])
+
+        with mock.patch("crm.management.commands.cleanup_inactive_customers.time.sleep", side_effect=order_meanwhile):
+            self.run_job()
+        self.assertEqual(self.remaining(), [self.inactive[2], self.active.pk])
+
+
+class AsyncGraphQLViewTests(TestCase):
+    def test_bulk_create_orders(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        product = Product.objects.create(name="Pen", price="2.50", stock=5)
+        result = post_graphql(
+            """
+            mutation Place($input: [OrderInput!]!) {
+              bulkCreateOrders(input: $input) { orders { totalAmount customer { name } } errors }
+            }
+            """,
+            {"input": [
+                {"customerId": str(customer.pk), "items": [{"productId": str(product.pk), "quantity": 2}]},
+                {"customerId": str(customer.pk), "items": [{"productId": str(product.pk), "quantity": 9}]},
+            ]},
+            asynchronous=True,
+        )
+        self.assertNotIn("errors", result)
+        payload = result["data"]["bulkCreateOrders"]
+        self.assertEqual(payload["orders"], [{"totalAmount": "5.00", "customer": {"name": "Ada"}}])
+        self.assertEqual(len(payload["errors"]), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.get().quantity, 2)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 3)
+
+    @override_settings(CRM_RESPONSE_CACHE_ENABLED=True)
+    def test_cache_calls_stay_off_the_event_loop(self):
+        Product.objects.create(name="Pen", price="2.50", stock=5)
+        query = "{ allProducts { edges { node { name } } } }"
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}
+        calls = []
+        for cache in {persisted_queries.cache, caches["graphql"]}:
+            for method in ("get", "get_many", "set"):
+                original = getattr(cache, method)
+
+                def record(*args, original=original, method=method, **kwargs):
+                    calls.append((method, search._in_event_loop()))
+                    return original(*args, **kwargs)
+
+                patcher = mock.patch.object(cache, method, record)
+                patcher.start()
+                self.addCleanup(patcher.stop)
+        caches["graphql"].clear()
+        self.addCleanup(caches["graphql"].clear)
+        for _ in range(2):
+            result = post_graphql(query, asynchronous=True, extensions=extensions)
+            self.assertEqual(result["data"], {"allProducts": {"edges": [{"node": {"name": "Pen"}}]}})
+        self.assertEqual({method for method, _ in calls}, {"get", "get_many", "set"})
+        self.assertEqual([call for call in calls if call[1]], [])
+
+
+@override_settings(CRM_RESPONSE_CACHE_ENABLED=False)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ada = Customer.objects.create(name="Ada Lovelace", email="ada@example.com")
+        cls.grace = Customer.objects.create(name="Grace Hopper", email="GLOVER@example.com")
+        laptop = Product.objects.create(name="Laptop", price="1000.00", stock=5)
+        mouse = Product.objects.create(name="Mouse", price="20.00", stock=5)
+        Order.objects.create(customer=cls.ada, total_amount="1000.00").products.add(laptop)
+        Order.objects.create(customer=cls.grace, total_amount="20.00").products.add(mouse)
+
+    def setUp(self):
+        self.addCleanup(search.reset)
+
+    def matches(self, field, term):
+        return list(search.contains(Customer.objects.order_by("pk"), field, term))
+
+    def test_backends_match_icontains(self):
+        for forced in (None, search.SCAN):
+            with self.subTest(backend=forced), override_settings(CRM_SEARCH_BACKEND=forced):
+                search.reset()
+                self.assertEqual(self.matches("name", "LOVE"), [self.ada])
+                self.assertEqual(self.matches("email", "love"), [self.grace])
+                self.assertEqual(self.matches("name", "ho"), [self.grace])
+
+    def test_async_requests_never_query_for_the_backend(self):
+        query = '{ crmStats(filter: {productName: "lapt"}) { orderCount totalRevenue } }'
+        for forced in (None, search.SCAN):
+            with self.subTest(backend=forced), override_settings(CRM_SEARCH_BACKEND=forced):
+                search.reset()
+                result = post_graphql(query, asynchronous=True)
+                self.assertNotIn("errors", result)
+                stats = result["data"]["crmStats"]
+                self.assertEqual((stats["orderCount"], stats["totalRevenue"]), (1, "1000.00"))
+
+
+@override_settings(CRM_RESPONSE_CACHE_ENABLED=False)
+class RelationWindowTests(TestCase):
+    """Nested order connections read only the rows their page needs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.orders = {}
+        for name in ("Ada", "Bob"):
+            customer = Customer.objects.create(name=name, email=f"{name.lower()}@example.com")
+            cls.orders[name] = [Order.objects.create(customer=customer).pk for _ in range(4)]
+
+    def pages(self, arguments, asynchronous=False):
+        query = """
+        { allCustomers(orderBy: "name") { edges { node {
+            orders(%s) { edges { node { databaseId } } pageInfo { hasNextPage } }
+        } } } }
+        """ % arguments
+        with CaptureQueriesContext(connection) as queries:
+            result = post_graphql(query, asynchronous=asynchronous)
+        self.assertNotIn("errors", result)
+        pages = []
+        for edge in result["data"]["allCustomers"]["edges"]:
+            page = edge["node"]["orders"]
+            pages.append(([order["node"]["databaseId"] for order in page["edges"]], page["pageInfo"]["hasNextPage"]))
+        return pages, queries
+
+    def test_first_pages_load_a_window_per_customer(self):
+        for asynchronous in (False, True):
+            with self.subTest(asynchronous=asynchronous):
+                pages, queries = self.pages("first: 2", asynchronous)
+                self.assertEqual(pages, [(self.orders["Ada"][:2], True), (self.orders["Bob"][:2], True)])
+                windowed = [query["sql"] for query in queries if "ROW_NUMBER()" in query["sql"]]
+                self.assertEqual(len(windowed), 1)
+
+    def test_later_and_last_pages(self):
+        after = base64.b64encode(b"arrayconnection:1").decode()
+        before = base64.b64encode(b"arrayconnection:3").decode()
+        pages, _ = self.pages(f'first: 2, after: "{after}"')
+        self.assertEqual(pages, [(self.orders["Ada"][2:], False), (self.orders["Bob"][2:], False)])
+        for asynchronous in (False, True):
+            with self.subTest(asynchronous=asynchronous):
+                # allCustomers' count and page, then one window query for every nested page.
+                pages, queries = self.pages("last: 1", asynchronous)
+                self.assertEqual(pages, [(self.orders["Ada"][-1:], False), (self.orders["Bob"][-1:], False)])
+                self.assertEqual(len(queries), 3)
+                pages, queries = self.pages(f'last: 2, before: "{before}"', asynchronous)
+                self.assertEqual(pages, [(self.orders["Ada"][1:3], False), (self.orders["Bob"][1:3], False)])
+                self.assertEqual(len(queries), 3)
+
+    def test_pages_past_the_end_count_the_relation(self):
+        after = base64.b64encode(b"arrayconnection:5").decode()
+        for asynchronous in (False, True):
+            with self.subTest(asynchronous=asynchronous):
+                query = """
+                { allCustomers(orderBy: "name") { edges { node {
+                    orders(first: 2, after: "%s") { edges { node { databaseId } } pageInfo { hasNextPage } }
+                } } } }
+                """ % after
+                with CaptureQueriesContext(connection) as queries:
+                    result = post_graphql(query, asynchronous=asynchronous)
+                self.assertNotIn("errors", result)
+                pages = [edge["node"]["orders"] for edge in result["data"]["allCustomers"]["edges"]]
+                self.assertEqual(pages, [{"edges": [], "pageInfo": {"hasNextPage": False}}] * 2)
+                # The empty window query, then one grouped count for both customers.
+                self.assertEqual(len(queries), 4)
+
+
+CREATE_ORDER = """
+mutation Place($input: OrderInput!) {
+  createOrder(input: $input) { order { databaseId totalAmount } }
+}
+"""
+
+
+def place_order(customer, items, product_ids=()):
+    variables = {"input": {
+        "customerId": str(customer.pk),
+        "productIds": [str(product.pk) for product in product_ids],
+        "items": [{"productId": str(product.pk), "quantity": quantity} for product, quantity in items],
+    }}
+    return schema.execute(CREATE_ORDER, variables=variables, context_value=SimpleNamespace())
+
+
+class StockReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        cls.pen = Product.objects.create(name="Pen", price="2.00", stock=5)
+        cls.ink = Product.objects.create(name="Ink", price="7.00", stock=1)
+
+    def stock(self):
+        return dict(Product.objects.values_list("name", "stock"))
+
+    def test_partial_reservation_rolls_back(self):
+        with self.assertRaises(InsufficientStock) as raised, transaction.atomic():
+            Product.objects.reserve({self.pen.pk: 2, self.ink.pk: 3})
+        self.assertEqual(raised.exception.shortages, {self.ink.pk: (3, 1)})
+        self.assertEqual(self.stock(), {"Pen": 5, "Ink": 1})
+
+    def test_failed_order_reports_the_shortage_and_keeps_stock(self):
+        result = place_order(self.customer, [(self.pen, 2), (self.ink, 3)])
+        self.assertEqual([error.extensions["code"] for error in result.errors], ["INSUFFICIENT_STOCK"])
+        self.assertEqual(self.stock(), {"Pen": 5, "Ink": 1})
+        self.assertFalse(Order.objects.exists())
+
+    def test_duplicate_products_are_reserved_together(self):
+        result = place_order(self.customer, [(self.pen, 2)], product_ids=[self.pen, self.pen])
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["createOrder"]["order"]["totalAmount"], "8.00")
+        self.assertEqual(list(OrderItem.objects.values_list("product__name", "quantity")), [("Pen", 4)])
+        self.assertEqual(self.stock(), {"Pen": 1, "Ink": 1})
+
+        # Two lines of 1 each exceed what is left even though each fits on its own.
+        result = place_order(self.customer, [(self.pen, 1)], product_ids=[self.pen])
+        self.assertEqual([error.extensions["code"] for error in result.errors], ["INSUFFICIENT_STOCK"])
+        self.assertEqual(self.stock(), {"Pen": 1, "Ink": 1})
+
+    def test_take_stock_refuses_a_decrement_that_lost_a_race(self):
+        with transaction.atomic():
+            products = Product.objects.in_bulk([self.pen.pk])
+            # Without row locks another writer can sell the units after they were checked.
+            Product.objects.filter(pk=self.pen.pk).update(stock=1)
+            with self.assertRaises(InsufficientStock):
+                Product.objects.take_stock(products, {self.pen.pk: 3})
+        self.assertEqual(self.stock()["Pen"], 1)
+
+
+class RestockTests(TestCase):
+    """``restock_below`` reads the rows back with RETURNING, or re-selects them where it can't."""
+
+    RESTOCK = """
+    mutation { updateLowStockProducts(threshold: 10, restockAmount: 5) { products { name stock } message } }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pen = Product.objects.create(name="Pen", price="2.00", stock=2)
+        cls.ink = Product.objects.create(name="Ink", price="7.00", stock=9)
+        cls.pad = Product.objects.create(name="Pad", price="3.00", stock=20)
+
+    def returning(self, enabled):
+        if enabled:
+            return contextlib.nullcontext()
+        return mock.patch.object(connection.features, "can_return_columns_from_insert", False)
+
+    def assert_restocked(self, products, started):
+        self.assertEqual([(product.pk, product.stock) for product in products], [(self.pen.pk, 7), (self.ink.pk, 14)])
+        stored = Product.objects.in_bulk()
+        for product in products:
+            self.assertGreaterEqual(product.updated_at, started)
+            self.assertEqual((product.stock, product.updated_at), (stored[product.pk].stock, stored[product.pk].updated_at))
+        self.assertEqual((stored[self.pad.pk].stock, stored[self.pad.pk].updated_at), (20, self.pad.updated_at))
+
+    @skipUnless(connection.vendor in ("postgresql", "sqlite"), "UPDATE ... RETURNING path")
+    def test_returning_path_is_one_query(self):
+        started = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            products = Product.objects.restock_below(10, 5)
+        self.assertEqual(len(queries), 1)
+        self.assertIn("RETURNING", queries[0]["sql"])
+        self.assert_restocked(products, started)
+
+    def test_reselect_path(self):
+        started = timezone.now()
+        with self.returning(False), CaptureQueriesContext(connection) as queries:
+            products = Product.objects.restock_below(10, 5)
+        self.assertFalse(any("RETURNING" in query["sql"] for query in queries))
+        self.assert_restocked(products, started)
+
+    def test_nothing_below_threshold(self):
+        for returning in (True, False):
+            with self.subTest(returning=returning):
+                with self.returning(returning):
+                    self.assertEqual(Product.objects.restock_below(1, 5), [])
+        self.assertEqual(dict(Product.objects.values_list("name", "stock")), {"Pen": 2, "Ink": 9, "Pad": 20})
+
+    def test_mutation(self):
+        for returning in (True, False):
+            with self.subTest(returning=returning), transaction.atomic():
+                with self.returning(returning):
+                    result = schema.execute(self.RESTOCK, context_value=SimpleNamespace())
+                self.assertIsNone(result.errors)
+                self.assertEqual(result.data["updateLowStockProducts"], {
+                    "products": [{"name": "Pen", "stock": 7}, {"name": "Ink", "stock": 14}],
+                    "message": "Updated 2 products with low stock.",
+                })
+                transaction.set_rollback(True)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentStockTests(TransactionTestCase):
+    """Real contention needs row locks; SQLite serialises writers instead."""
+
+    def test_concurrent_orders_never_oversell(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        product = Product.objects.create(name="Pen", price="2.00", stock=5)
+        outcomes = []
+
+        def order():
+            try:
+                result = place_order(customer, [(product, 1)])
+                outcomes.append(result.errors[0].extensions.get("code") if result.errors else "placed")
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=order) for _ in range(10)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(sorted(outcomes), ["INSUFFICIENT_STOCK"] * 5 + ["placed"] * 5)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.count(), 5)
+
+
+class CustomerEmailTests(TestCase):
+    """Emails are unique regardless of case, within a batch and against stored rows."""
+
+    BULK_CREATE = """
+    mutation Create($input: [CustomerInput!]!) {
+      bulkCreateCustomers(input: $input) { customers { email } errors }
+    }
+    """
+
+    def test_bulk_create_rejects_case_variants(self):
+        Customer.objects.create(name="Ada", email="Ada@Example.com")
+        rows = [
+            {"name": "Grace", "email": "grace@example.com"},
+            {"name": "Grace again", "email": "GRACE@example.com"},
+            {"name": "Ada again", "email": "ada@EXAMPLE.com"},
+        ]
+        result = schema.execute(self.BULK_CREATE, variables={"input": rows}, context_value=SimpleNamespace())
+        self.assertIsNone(result.errors)
+        payload = result.data["bulkCreateCustomers"]
+        self.assertEqual(payload["customers"], [{"email": "grace@example.com"}])
+        self.assertEqual(payload["errors"], ["Row 2: Email already exists.", "Row 3: Email already exists."])
+
+    def test_create_customer_rejects_case_variant(self):
+        Customer.objects.create(name="Ada", email="ada@example.com")
+        result = schema.execute(
+            'mutation { createCustomer(input: {name: "Ada", email: "ADA@example.com"}) { customer { email } } }',
+            context_value=SimpleNamespace(),
+        )
+        self.assertEqual([error.message for error in result.errors], ["Email already exists."])
+
+    def test_database_rejects_case_variant(self):
+        Customer.objects.create(name="Ada", email="ada@example.com")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Customer.objects.create(name="Ada", email="ADA@EXAMPLE.COM")
+
+
+class CaseInsensitiveEmailMigrationTests(TransactionTestCase):
+    """0007 names case-variant duplicates instead of failing on the constraint."""
+
+    def test_duplicates_stop_the_migration(self):
+        from django.db.migrations.executor import MigrationExecutor
+
+        executor = MigrationExecutor(connection)
+        executor.migrate([("crm", "0006_order_reminders")])
+        self.addCleanup(call_command, "migrate", "crm", verbosity=0)
+        Customer.objects.bulk_create([
+            Customer(name="Ada", email="ada@example.com"),
+            Customer(name="Ada", email="Ada@Example.com"),
+            Customer(name="Bob", email="bob@example.com"),
+        ])
+        executor.loader.build_graph()
+        with self.assertRaisesMessage(RuntimeError, "ada@example.com (2 customers) share an email"):
+            executor.migrate([("crm", "0007_customer_email_ci_unique")])
+
+        Customer.objects.filter(email="Ada@Example.com").delete()
+        executor.loader.build_graph()
+        executor.migrate([("crm", "0007_customer_email_ci_unique")])
+        self.assertEqual(Customer.objects.count(), 2)
+
+
+class OrderStatsTests(TestCase):
+    def test_customer_delete_skips_per_order_stat_updates(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        for _ in range(3):
+            Order.objects.create(customer=customer, total_amount=5)
+        Customer.objects.filter(pk=customer.pk).update(order_count=3, lifetime_value=15)
+        for target in (customer, Customer.objects.filter(pk=customer.pk)):
+            with self.subTest(target=type(target).__name__), transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    target.delete()
+                updates = [query["sql"] for query in queries if query["sql"].startswith('UPDATE "crm_customer"')]
+                self.assertEqual(updates, [])
+                transaction.set_rollback(True)
+
+    def test_order_delete_updates_stats(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        first = Order.objects.create(customer=customer, total_amount=5, order_date=NOW - timedelta(days=1))
+        second = Order.objects.create(customer=customer, total_amount=7, order_date=NOW)
+        Customer.objects.filter(pk=customer.pk).update(order_count=2, lifetime_value=12, last_order_at=NOW)
+        second.delete()
+        customer.refresh_from_db()
+        self.assertEqual((customer.order_count, customer.lifetime_value, customer.last_order_at), (1, 5, first.order_date))
+
+
+class RecalculateTotalsTests(TestCase):
+    """Recalculated totals move ``lifetime_value`` by the change only, however often they run."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ada = Customer.objects.create(name="Ada", email="ada@example.com")
+        cls.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        cls.pen = Product.objects.create(name="Pen", price=Decimal("2.00"), stock=100)
+        cls.ink = Product.objects.create(name="Ink", price=Decimal("7.00"), stock=100)
+        cls.first = cls.order(cls.ada, {cls.pen: 3, cls.ink: 1})
+        cls.second = cls.order(cls.ada, {cls.pen: 1})
+        cls.third = cls.order(cls.bob, {cls.ink: 2})
+        Customer.objects.all().refresh_order_stats()
+
+    @classmethod
+    def order(cls, customer, quantities):
+        order = Order.objects.create(
+            customer=customer,
+            total_amount=sum(product.price * quantity for product, quantity in quantities.items()),
+        )
+        for product, quantity in quantities.items():
+            OrderItem.objects.create(order=order, product=product, quantity=quantity)
+        return order
+
+    def totals(self):
+        orders = dict(Order.objects.values_list("pk", "total_amount"))
+        customers = dict(Customer.objects.values_list("name", "lifetime_value"))
+        return [orders[self.first.pk], orders[self.second.pk], orders[self.third.pk]], customers
+
+    def test_single_order(self):
+        Product.objects.filter(pk=self.pen.pk).update(price="2.50")
+        for _ in range(2):
+            self.first.recalculate_total()
+            self.assertEqual(self.first.total_amount, Decimal("14.50"))
+            self.assertEqual(self.totals(), (
+                [Decimal("14.50"), Decimal("2.00"), Decimal("14.00")],
+                {"Ada": Decimal("16.50"), "Bob": Decimal("14.00")},
+            ))
+
+    def test_queryset(self):
+        Product.objects.filter(pk=self.pen.pk).update(price="2.50")
+        Product.objects.filter(pk=self.ink.pk).update(price="6.00")
+        for _ in range(2):
+            self.assertEqual(Order.objects.recalculate_totals(), 3)
+            self.assertEqual(self.totals(), (
+                [Decimal("13.50"), Decimal("2.50"), Decimal("12.00")],
+                {"Ada": Decimal("16.00"), "Bob": Decimal("12.00")},
+            ))
+        self.assertFalse(Customer.objects.stale_order_stats().exists())
+
+    def test_queryset_filtered_on_the_totals(self):
+        Product.objects.filter(pk=self.ink.pk).update(price="6.00")
+        self.assertEqual(Order.objects.filter(total_amount__gte=10).recalculate_totals(), 2)
+        self.assertEqual(self.totals(), (
+            [Decimal("12.00"), Decimal("2.00"), Decimal("12.00")],
+            {"Ada": Decimal("14.00"), "Bob": Decimal("12.00")},
+        ))
+
+
+@override_settings(CRM_QUERY_MAX_COST=1000, CRM_QUERY_MAX_DEPTH=4, CRM_RESPONSE_CACHE_ENABLED=False)
+class QueryComplexityTests(TestCase):
+    """Operations over the cost or depth budget are refused before any resolver runs."""
+
+    def assertRejected(self, query, code, variables=None):
+        for asynchronous in (False, True):
+            with self.subTest(asynchronous=asynchronous), CaptureQueriesContext(connection) as queries:
+                result = post_graphql(query, variables, asynchronous=asynchronous)
+                self.assertNotIn("data", result)
+                self.assertEqual([error["extensions"]["code"] for error in result["errors"]], [code])
+                self.assertEqual(len(queries), 0)
+
+    def cost(self, query, variables=None):
+        result = post_graphql(query, variables)
+        self.assertNotIn("errors", result)
+        return result["extensions"]["cost"]["requestedQueryCost"]
+
+    def test_over_budget(self):
+        self.assertRejected(
+            "{ allCustomers(first: 20) { edges { node { orders(first: 50) { edges { node { databaseId } } } } } } }",
+            "QUERY_TOO_COMPLEX",
+        )
+        # Connection sizes passed as variables count too.
+        self.assertRejected(
+            "query Q($n: Int) { allCustomers(first: $n) { edges { node { name } } } }",
+            "QUERY_TOO_COMPLEX",
+            {"n": 1001},
+        )
+
+    def test_over_depth(self):
+        self.assertRejected(
+            "{ allOrders(first: 1) { edges { node { customer { orders(first: 1) { edges { node { customer { name } } } } } } } } }",
+            "QUERY_TOO_DEEP",
+        )
+
+    def test_relations_are_counted(self):
+        # 10 customers x (1 + 5 orders x (1 + customer)).
+        self.assertEqual(
+            self.cost("{ allCustomers(first: 10) { edges { node { orders(first: 5) { edges { node { customer { name } } } } } } } }"),
+            10 * (1 + 5 * (1 + 1)),
+        )
+        # Plain list fields count CRM_QUERY_DEFAULT_LIST_SIZE items.
+        with override_settings(CRM_QUERY_DEFAULT_LIST_SIZE=3):
+            self.assertEqual(
+                self.cost("{ allOrders(first: 2) { edges { node { items { product { name } } } } } }"),
+                2 * (1 + 3 * (1 + 1)),
+            )
+
+
+@override_settings(CRM_RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheInvalidationTests(TestCase):
+    """A cached response is never served after a write to a model it reads."""
+
+    CUSTOMERS = '{ allCustomers(orderBy: "name") { edges { node { name orderCount } } } }'
+    PRODUCTS = '{ allProducts(orderBy: "name") { edges { node { name stock } } } }'
+    ORDERS = '{ allOrders { edges { node { totalAmount products { edges { node { name } } } } } } }'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ada = Customer.objects.create(name="Ada", email="ada@example.com")
+        cls.pen = Product.objects.create(name="Pen", price="2.00", stock=5)
+        cls.ink = Product.objects.create(name="Ink", price="7.00", stock=5)
+        cls.order = Order.objects.create(customer=cls.ada, total_amount="2.00")
+        cls.order.products.add(cls.pen)
+
+    def setUp(self):
+        caches["graphql"].clear()
+        self.addCleanup(caches["graphql"].clear)
+
+    def read(self, query):
+        """Run ``query`` twice; the second run must be answered from the cache."""
+        first = post_graphql(query)
+        self.assertNotIn("errors", first)
+        with CaptureQueriesContext(connection) as queries:
+            second = post_graphql(query)
+        self.assertEqual((second["data"], len(queries)), (first["data"], 0))
+        return first["data"]
+
+    def names(self, data, field):
+        return [edge["node"]["name"] for edge in data[field]["edges"]]
+
+    def write(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    def test_create_update_and_delete(self):
+        self.read(self.CUSTOMERS)
+        self.write(lambda: Customer.objects.create(name="Bob", email="bob@example.com"))
+        self.assertEqual(self.names(self.read(self.CUSTOMERS), "allCustomers"), ["Ada", "Bob"])
+
+        self.read(self.PRODUCTS)
+        self.pen.name = "Pencil"
+        self.write(self.pen.save)
+        self.assertEqual(self.names(self.read(self.PRODUCTS), "allProducts"), ["Ink", "Pencil"])
+
+        self.read(self.ORDERS)
+        self.write(self.order.delete)
+        self.assertEqual(self.read(self.ORDERS)["allOrders"]["edges"], [])
+
+    def test_many_to_many_change(self):
+        self.read(self.ORDERS)
+        self.write(lambda: self.order.products.add(self.ink))
+        products = self.read(self.ORDERS)["allOrders"]["edges"][0]["node"]["products"]["edges"]
+        self.assertEqual(sorted(edge["node"]["name"] for edge in products), ["Ink", "Pen"])
+
+    def test_bulk_create_orders(self):
+        # Bulk inserts and stock UPDATEs skip signals; the mutation bumps the versions itself.
+        for query in (self.CUSTOMERS, self.PRODUCTS, self.ORDERS):
+            self.read(query)
+        mutation = """
+        mutation Place($input: [OrderInput!]!) { bulkCreateOrders(input: $input) { errors } }
+        """
+        items = [{"productId": str(self.ink.pk), "quantity": 2}]
+        self.write(lambda: post_graphql(mutation, {"input": [{"customerId": str(self.ada.pk), "items": items}]}))
+        self.assertEqual(len(self.read(self.ORDERS)["allOrders"]["edges"]), 2)
+        stock = {edge["node"]["name"]: edge["node"]["stock"] for edge in self.read(self.PRODUCTS)["allProducts"]["edges"]}
+        self.assertEqual(stock, {"Ink": 3, "Pen": 5})
+        self.assertEqual(self.read(self.CUSTOMERS)["allCustomers"]["edges"][0]["node"]["orderCount"], 1)
+
+
+class CRMStatsTests(TestCase):
+    """Totals and revenue buckets over orders placed on known dates."""
+
+    @classmethod
+    def setUpTestData(cls):
+        ada = Customer.objects.create(name="Ada", email="ada@example.com")
+        bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        pen = Product.objects.create(name="Pen", price="5.00", stock=10)
+        pencil = Product.objects.create(name="Pencil", price="5.00", stock=10)
+        ink = Product.objects.create(name="Ink", price="20.00", stock=10)
+        for customer, placed, amount, products in [
+            (ada, datetime(2026, 1, 5, 10), "10.10", [pen, pencil]),
+            (bob, datetime(2026, 1, 5, 15), "5.20", [pen]),
+            (ada, datetime(2026, 1, 7, 9), "20.30", [ink]),
+            (bob, datetime(2026, 2, 2, 12), "40.40", [ink]),
+        ]:
+            order = Order.objects.create(
+                customer=customer, order_date=placed.replace(tzinfo=dt_timezone.utc), total_amount=amount
+            )
+            order.products.add(*products)
+
+    def stats(self, period, filter_input=None):
+        result = schema.execute(
+            """
+            query Stats($period: StatsPeriod, $filter: OrderFilterInput) {
+              crmStats(filter: $filter) {
+                customerCount orderCount totalRevenue
+                revenueByPeriod(period: $period) { periodStart orderCount revenue }
+              }
+            }
+            """,
+            variables={"period": period, "filter": filter_input},
+            context_value=SimpleNamespace(),
+        )
+        self.assertIsNone(result.errors)
+        stats = result.data["crmStats"]
+        buckets = [
+            (bucket["periodStart"][:10], bucket["orderCount"], bucket["revenue"])
+            for bucket in stats["revenueByPeriod"]
+        ]
+        return (stats["customerCount"], stats["orderCount"], stats["totalRevenue"]), buckets
+
+    def test_totals_and_buckets(self):
+        # Amounts are reported in cents even where the database sums them as floats.
+        expected = {
+            "DAY": [("2026-01-05", 2, "15.30"), ("2026-01-07", 1, "20.30"), ("2026-02-02", 1, "40.40")],
+            "WEEK": [("2026-01-05", 3, "35.60"), ("2026-02-02", 1, "40.40")],
+            "MONTH": [("2026-01-01", 3, "35.60"), ("2026-02-01", 1, "40.40")],
+        }
+        for period, buckets in expected.items():
+            with self.subTest(period=period):
+                self.assertEqual(self.stats(period), ((2, 4, "76.00"), buckets))
+
+    def test_filters(self):
+        self.assertEqual(
+            self.stats("WEEK", {"totalAmountGte": 15}),
+            ((2, 2, "60.70"), [("2026-01-05", 1, "20.30"), ("2026-02-02", 1, "40.40")]),
+        )
+        self.assertEqual(self.stats("MONTH", {"customerName": "ada"}), ((2, 2, "30.40"), [("2026-01-01", 2, "30.40")]))
+        # The first order has two products matching "pen"; it is still counted once.
+        self.assertEqual(self.stats("DAY", {"productName": "pen"}), ((2, 2, "15.30"), [("2026-01-05", 2, "15.30")]))
+        self.assertEqual(self.stats("DAY", {"totalAmountGte": 1000}), ((2, 0, "0.00"), []))
+
+
+class ScheduledJobTests(TestCase):
+    """Cron jobs and Celery tasks run their GraphQL in-process unless HTTP is chosen."""
+
+    @classmethod
+    def setUpTestData(cls):
+        ada = Customer.objects.create(name="Ada", email="ada@example.com")
+        cls.pen = Product.objects.create(name="Pen", price="2.00", stock=3)
+        Product.objects.create(name="Ink", price="7.00", stock=50)
+        Order.objects.create(customer=ada, total_amount="12.25")
+
+    def run_job(self, job):
+        """Run ``job`` with the HTTP transport stubbed out; return the lines it logged."""
+        opened = mock.mock_open()
+        with mock.patch.dict("os.environ", {"CRM_GRAPHQL_EXECUTOR": ""}), \
+                mock.patch("crm.graphql_client.HTTPExecutor.execute") as http, \
+                mock.patch(f"{job.__module__}.open", opened, create=True):
+            job()
+        http.assert_not_called()
+        return "".join(call.args[0] for call in opened().write.call_args_list).splitlines()
+
+    def test_update_low_stock(self):
+        from crm.cron import update_low_stock
+
+        lines = self.run_job(update_low_stock)
+        self.assertTrue(lines[0].endswith(": Updated 1 products with low stock."))
+        self.assertEqual(lines[1:], ["  - Pen: stock now 13"])
+        self.pen.refresh_from_db()
+        self.assertEqual(self.pen.stock, 13)
+
+    def test_heartbeat(self):
+        from crm.cron import log_crm_heartbeat
+
+        [line] = self.run_job(log_crm_heartbeat)
+        self.assertTrue(line.endswith("CRM is alive - GraphQL endpoint responsive"))
+
+    def test_crm_report(self):
+        from crm.tasks import generate_crm_report
+
+        [line] = self.run_job(generate_crm_report)
+        self.assertEqual(line.split(" - ", 1)[1], "Report: 1 customers, 1 orders, 12.25 revenue")
+
+    def test_invalid_documents_raise(self):
+        from crm.graphql_client import GraphQLExecutionError, InProcessExecutor
+
+        with self.assertRaises(GraphQLExecutionError):
+            InProcessExecutor().execute("{ nope }")
+
+    def test_http_only_when_chosen(self):
+        from crm.graphql_client import HTTPExecutor, InProcessExecutor, execute_graphql, get_executor
+
+        with mock.patch.dict("os.environ", {"CRM_GRAPHQL_EXECUTOR": ""}):
+            self.assertIsInstance(get_executor(), InProcessExecutor)
+            with override_settings(CRM_GRAPHQL_EXECUTOR="http"):
+                self.assertIsInstance(get_executor(), HTTPExecutor)
+        with mock.patch.dict("os.environ", {"CRM_GRAPHQL_EXECUTOR": "http"}):
+            self.assertIsInstance(get_executor(), HTTPExecutor)
+            with mock.patch("crm.graphql_client.HTTPExecutor.execute", return_value={"hello": "remote"}) as http, \
+                    mock.patch("crm.graphql_client.InProcessExecutor.execute") as in_process:
+                self.assertEqual(execute_graphql("{ hello }"), {"hello": "remote"})
+            http.assert_called_once_with("{ hello }", variables=None, operation_name=None)
+            in_process.assert_not_called()
+        with self.assertRaises(ValueError):
+            get_executor("grpc")
+
+
+class DatabaseFromEnvTests(SimpleTestCase):
+    def build(self, **environ):
+        return database_from_env(base_dir=Path("/srv/crm"), environ={f"CRM_DB_{key}": value for key, value in environ.items()})
+
+    def test_sqlite_defaults(self):
+        entry = self.build()
+        self.assertEqual(
+            (entry["ENGINE"], entry["NAME"], entry["CONN_MAX_AGE"], entry["CONN_HEALTH_CHECKS"]),
+            ("django.db.backends.sqlite3", "/srv/crm/db.sqlite3", 60, True),
+        )
+        self.assertEqual(entry["OPTIONS"], {
+            "init_command": "PRAGMA busy_timeout = 5000; PRAGMA journal_mode = WAL; PRAGMA synchronous = NORMAL",
+            "transaction_mode": "IMMEDIATE",
+        })
+
+    def test_sqlite_overrides(self):
+        entry = self.build(
+            NAME="/tmp/crm.sqlite3", SQLITE_BUSY_TIMEOUT="250", SQLITE_JOURNAL_MODE="delete", SQLITE_SYNCHRONOUS="full",
+            SQLITE_TRANSACTION_MODE="deferred", CONN_MAX_AGE="0", CONN_HEALTH_CHECKS="off",
+        )
+        self.assertEqual((entry["NAME"], entry["CONN_MAX_AGE"], entry["CONN_HEALTH_CHECKS"]), ("/tmp/crm.sqlite3", 0, False))
+        self.assertEqual(entry["OPTIONS"], {
+            "init_command": "PRAGMA busy_timeout = 250; PRAGMA journal_mode = DELETE; PRAGMA synchronous = FULL",
+            "transaction_mode": "DEFERRED",
+        })
+
+    def test_sqlite_pragmas_reach_the_connection(self):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        entry = self.build(NAME=str(Path(directory.name) / "env.sqlite3"), SQLITE_BUSY_TIMEOUT="1234")
+        wrapper = DatabaseWrapper(connections.configure_settings({DEFAULT_DB_ALIAS: {}, "env": entry})["env"], alias="env")
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            pragmas = {}
+            for pragma in ("journal_mode", "busy_timeout", "synchronous"):
+                cursor.execute(f"PRAGMA {pragma}")
+                pragmas[pragma] = cursor.fetchone()[0]
+        # synchronous = NORMAL reads back as 1.
+        self.assertEqual(pragmas, {"journal_mode": "wal", "busy_timeout": 1234, "synchronous": 1})
+
+    def test_postgresql(self):
+        entry = self.build(ENGINE="postgresql", USER="crm", PASSWORD="secret", HOST="db", PORT="5433")
+        self.assertEqual(
+            {key: entry[key] for key in ("ENGINE", "NAME", "USER", "PASSWORD", "HOST", "PORT", "CONN_MAX_AGE", "OPTIONS")},
+            {
+                "ENGINE": "django.db.backends.postgresql", "NAME": "crm", "USER": "crm", "PASSWORD": "secret",
+                "HOST": "db", "PORT": "5433", "CONN_MAX_AGE": 60, "OPTIONS": {},
+            },
+        )
+        self.assertEqual(self.build(ENGINE="django.db.backends.postgresql", CONN_MAX_AGE="300")["CONN_MAX_AGE"], 300)
+
+    def test_postgresql_pool(self):
+        entry = self.build(ENGINE="postgresql", POOL="1", POOL_MAX_SIZE="20")
+        self.assertEqual(entry["OPTIONS"], {"pool": {"min_size": 2, "max_size": 20, "timeout": 10}})
+        # Pooled connections are returned to the pool, not kept open per thread.
+        self.assertEqual(entry["CONN_MAX_AGE"], 0)
+        self.assertEqual(self.build(ENGINE="postgresql", POOL="1", CONN_MAX_AGE="30")["CONN_MAX_AGE"], 30)
+        self.assertEqual(self.build(ENGINE="postgresql", POOL="no")["OPTIONS"], {})
+
+    def test_invalid_values(self):
+        for environ in (
+            {"ENGINE": "mysql"},
+            {"CONN_MAX_AGE": "forever"},
+            {"CONN_HEALTH_CHECKS": "maybe"},
+            {"SQLITE_JOURNAL_MODE": "fast"},
+            {"SQLITE_TRANSACTION_MODE": "lazy"},
+            {"ENGINE": "postgresql", "POOL": "1", "POOL_MAX_SIZE": "lots"},
+        ):
+            with self.subTest(environ=environ), self.assertRaises(ImproperlyConfigured):
+                self.build(**environ)
+
+
+class DocumentCacheTests(SimpleTestCase):
+    def test_entries_are_per_schema_and_rules(self):
+        from graphql import NoSchemaIntrospectionCustomRule, specified_rules
+
+        from crm.persisted_queries import DocumentCache
+
+        cache = DocumentCache()
+        graphql_schema = schema.graphql_schema
+        introspection = "{ __schema { queryType { name } } }"
+        self.assertEqual(cache.get(graphql_schema, introspection)[1], [])
+        _, errors = cache.get(graphql_schema, introspection, [*specified_rules, NoSchemaIntrospectionCustomRule])
+        self.assertTrue(errors)
+
+        query = "{ allCustomers { totalCount } }"
+        self.assertEqual(cache.get(graphql_schema, query)[1], [])
+        self.assertEqual(cache.get(async_schema.graphql_schema, query)[1], [])
+        self.assertEqual(cache.stats_dict()["size"], 3)
+        self.assertEqual(cache.get(graphql_schema, query)[1], [])
+        self.assertEqual(cache.stats.hits, 1)
+
+
+class PersistedQueryTests(TestCase):
+    """A hash the server has not seen is refused until a retry registers its text."""
+
+    QUERY = '{ allProducts { edges { node { name } } } }'
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.create(name="Pen", price="2.00", stock=5)
+
+    def setUp(self):
+        persisted_queries.cache.clear()
+        self.addCleanup(persisted_queries.cache.clear)
+
+    def post(self, query, sha256_hash, asynchronous):
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}}
+        return post_graphql(query, asynchronous=asynchronous, extensions=extensions)
+
+    def test_register_then_look_up(self):
+        sha256_hash = query_hash(self.QUERY)
+        expected = {"allProducts": {"edges": [{"node": {"name": "Pen"}}]}}
+        for asynchronous in (False, True):
+            with self.subTest(asynchronous=asynchronous):
+                missed = self.post(None, sha256_hash, asynchronous)
+                self.assertEqual([error["message"] for error in missed["errors"]], ["PersistedQueryNotFound"])
+                self.assertEqual(missed["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND")
+                self.assertEqual(self.post(self.QUERY, sha256_hash, asynchronous)["data"], expected)
+                self.assertEqual(self.post(None, sha256_hash, asynchronous)["data"], expected)
+                persisted_queries.cache.clear()
+
+    def test_mismatched_hash_is_not_registered(self):
+        result = self.post(self.QUERY, "0" * 64, asynchronous=False)
+        self.assertEqual([error["message"] for error in result["errors"]], ["provided sha does not match query"])
+        self.assertIn("errors", self.post(None, "0" * 64, asynchronous=False))
+
+
+class UnbatchedCustomerType(DjangoObjectType):
+    """Reads each customer's latest order with its own query: an N+1 on purpose."""
+
+    latest_order_total = graphene.Decimal()
+
+    class Meta:
+        model = Customer
+        fields = ("name",)
+        skip_registry = True
+
+    def resolve_latest_order_total(self, info):
+        return Order.objects.filter(customer_id=self.pk).order_by("-pk").values_list("total_amount", flat=True).first()
+
+
+class UnbatchedQuery(graphene.ObjectType):
+    customers = graphene.List(UnbatchedCustomerType)
+
+    def resolve_customers(self, info):
+        return list(Customer.objects.order_by("pk"))
+
+
+@override_settings(CRM_TRACING_EXTENSIONS=True, CRM_TRACING_N_PLUS_ONE_THRESHOLD=10, CRM_RESPONSE_CACHE_ENABLED=False)
+class TracingTests(TestCase):
+    """Traces charge SQL to the resolver that ran it and flag only the unbatched relation."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(12):
+            customer = Customer.objects.create(name=f"Customer {index:02}", email=f"customer{index}@example.com")
+            Order.objects.create(customer=customer, total_amount=index)
+
+    def trace(self, query, graphql_schema=schema):
+        from crm.views import CRMGraphQLView
+
+        request = RequestFactory().post("/graphql", data=json.dumps({"query": query}), content_type="application/json")
+        with self.assertLogs("crm.tracing", "DEBUG") as logs:
+            response = CRMGraphQLView.as_view(schema=graphql_schema, middleware=[])(request)
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        tracing = result["extensions"]["tracing"]
+        return tracing, {resolver["path"]: resolver for resolver in tracing["resolvers"]}, logs.output
+
+    def test_unbatched_relation_is_flagged(self):
+        tracing, resolvers, logs = self.trace("{ customers { name latestOrderTotal } }", graphene.Schema(query=UnbatchedQuery))
+        self.assertEqual(resolvers["customers"]["sqlCount"], 1)
+        self.assertEqual(
+            (resolvers["customers.latestOrderTotal"]["calls"], resolvers["customers.latestOrderTotal"]["sqlCount"]), (12, 12)
+        )
+        self.assertEqual(resolvers["customers.name"]["sqlCount"], 0)
+        self.assertEqual(tracing["sql"]["count"], 13)
+        [suspect] = tracing["nPlusOne"]
+        self.assertEqual((suspect["count"], suspect["paths"]), (12, ["customers.latestOrderTotal"]))
+        self.assertIn('FROM "crm_order" WHERE', suspect["sql"])
+        warnings = [line for line in logs if line.startswith("WARNING")]
+        self.assertEqual(len(warnings), 1)
+        self.assertIn("Possible N+1 in anonymous operation: 12 x", warnings[0])
+
+    def test_batched_relations_are_not_flagged(self):
+        tracing, resolvers, logs = self.trace(
+            "query Orders { allOrders { edges { node { customer { name orders(first: 2) { edges { node { id } } } } } } } }"
+        )
+        self.assertEqual(tracing["operationName"], "Orders")
+        self.assertEqual(resolvers["allOrders.edges.node.customer"]["calls"], 12)
+        self.assertEqual(resolvers["allOrders.edges.node.customer"]["sqlCount"], 1)
+        self.assertEqual(resolvers["allOrders.edges.node.customer.orders"]["sqlCount"], 1)
+        self.assertEqual(tracing["nPlusOne"], [])
+        self.assertFalse([line for line in logs if line.startswith("WARNING")])
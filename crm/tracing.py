@@ -0,0 +1,203 @@
+"""Per-resolver tracing and SQL accounting for GraphQL requests.
+
+A traced request records, for every resolver path (list indices dropped, so
+``allOrders.edges.node.customer`` aggregates all rows of the page), how often it ran, its wall
+time and the SQL it issued. SQL is captured with ``connection.execute_wrapper`` and charged to
+the resolver running at the time; a loader batch is therefore charged to the first resolver that
+reads it. Statements are also grouped by shape (literals and ``IN`` lists collapsed), and a
+shape that runs more than ``CRM_TRACING_N_PLUS_ONE_THRESHOLD`` times in one request is reported
+as a likely N+1.
+
+Requests are traced when ``CRM_TRACING_EXTENSIONS`` is on (the summary is then returned under
+``extensions.tracing``) or when sampled at ``CRM_TRACING_SAMPLE_RATE``. Every traced request logs
+one JSON line on the ``crm.tracing`` logger: at INFO when sampled, DEBUG otherwise. Resolvers of
+the async endpoint are timed (their times overlap, since they wait concurrently), but their SQL
+runs in Django's sync thread and is not captured.
+"""
+
+import inspect
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+TRACE_ATTRIBUTE = "crm_trace"
+UNATTRIBUTED = "<request>"
+SHAPE_MAX_LENGTH = 300
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:%s|\?)(?:,\s*(?:%s|\?))*\)")
+_REPEATED_LIST = re.compile(r"\(\.\.\.\)(?:,\s*\(\.\.\.\))+")
+_SELECT_LIST = re.compile(r"^SELECT .+? FROM ", re.DOTALL)
+
+
+def sql_shape(sql: str) -> str:
+    """Normalise ``sql`` so statements differing only in parameters compare equal."""
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(...)", shape)
+    return _REPEATED_LIST.sub("(...)", shape)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+@dataclass
+class ResolverStats:
+    calls: int = 0
+    time: float = 0.0
+    sql_count: int = 0
+    sql_time: float = 0.0
+
+
+class RequestTrace:
+    def __init__(self, operation_name: Optional[str] = None, sampled: bool = False):
+        self.operation_name = operation_name
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.resolvers: Dict[str, ResolverStats] = defaultdict(ResolverStats)
+        self.shapes: Dict[str, Counter] = defaultdict(Counter)
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.current_path: Optional[str] = None
+
+    def record_sql(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            path = self.current_path or UNATTRIBUTED
+            stats = self.resolvers[path]
+            stats.sql_count += 1
+            stats.sql_time += elapsed
+            self.sql_count += 1
+            self.sql_time += elapsed
+            self.shapes[sql_shape(sql)][path] += 1
+
+    def record_resolver(self, path: str, elapsed: float) -> None:
+        stats = self.resolvers[path]
+        stats.calls += 1
+        stats.time += elapsed
+
+    def n_plus_one(self) -> List[dict]:
+        threshold = getattr(settings, "CRM_TRACING_N_PLUS_ONE_THRESHOLD", 10)
+        suspects = [
+            {
+                # The column list rarely identifies a statement; keep the FROM/WHERE part readable.
+                "sql": _SELECT_LIST.sub("SELECT ... FROM ", shape, count=1)[:SHAPE_MAX_LENGTH],
+                "count": sum(paths.values()),
+                "paths": [path for path, _ in paths.most_common(3)],
+            }
+            for shape, paths in self.shapes.items()
+            if sum(paths.values()) > threshold
+        ]
+        return sorted(suspects, key=lambda suspect: -suspect["count"])
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.started
+
+    def summary(self) -> dict:
+        duration = self.duration if self.duration is not None else time.perf_counter() - self.started
+        resolvers = sorted(self.resolvers.items(), key=lambda item: -(item[1].time + item[1].sql_time))
+        limit = getattr(settings, "CRM_TRACING_MAX_RESOLVERS", 50)
+        return {
+            "operationName": self.operation_name,
+            "durationMs": _ms(duration),
+            "sql": {"count": self.sql_count, "timeMs": _ms(self.sql_time)},
+            "resolvers": [
+                {
+                    "path": path,
+                    "calls": stats.calls,
+                    "timeMs": _ms(stats.time),
+                    "sqlCount": stats.sql_count,
+                    "sqlTimeMs": _ms(stats.sql_time),
+                }
+                for path, stats in resolvers[:limit]
+            ],
+            "nPlusOne": self.n_plus_one(),
+        }
+
+    def log(self) -> dict:
+        summary = self.summary()
+        for suspect in summary["nPlusOne"]:
+            logger.warning(
+                "Possible N+1 in %s: %d x %s (from %s)",
+                self.operation_name or "anonymous operation",
+                suspect["count"],
+                suspect["sql"],
+                ", ".join(suspect["paths"]),
+            )
+        logger.log(logging.INFO if self.sampled else logging.DEBUG, json.dumps({"graphql_trace": summary}))
+        return summary
+
+
+def get_trace(context) -> Optional[RequestTrace]:
+    return getattr(context, TRACE_ATTRIBUTE, None)
+
+
+def extensions_enabled() -> bool:
+    return getattr(settings, "CRM_TRACING_EXTENSIONS", False)
+
+
+@contextmanager
+def trace_request(request, operation_name: Optional[str] = None):
+    """Trace the GraphQL execution inside the block when enabled or sampled; yields the trace or None."""
+    sample_rate = getattr(settings, "CRM_TRACING_SAMPLE_RATE", 0.0)
+    sampled = sample_rate > 0 and random.random() < sample_rate
+    if not (sampled or extensions_enabled()):
+        yield None
+        return
+    trace = RequestTrace(operation_name, sampled=sampled)
+    setattr(request, TRACE_ATTRIBUTE, trace)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(trace.record_sql))
+        try:
+            yield trace
+        finally:
+            trace.finish()
+            trace.log()
+
+
+class TracingMiddleware:
+    """Graphene middleware timing each resolver of a traced request and attributing its SQL."""
+
+    def resolve(self, next, root, info, **args):
+        trace = get_trace(info.context)
+        if trace is None:
+            return next(root, info, **args)
+        path = ".".join(str(key) for key in info.path.as_list() if not isinstance(key, int))
+        previous, trace.current_path = trace.current_path, path
+        started = time.perf_counter()
+        try:
+            result = next(root, info, **args)
+        except Exception:
+            trace.record_resolver(path, time.perf_counter() - started)
+            raise
+        finally:
+            trace.current_path = previous
+        if inspect.isawaitable(result):
+            return self._await(result, trace, path, started)
+        trace.record_resolver(path, time.perf_counter() - started)
+        return result
+
+    @staticmethod
+    async def _await(result, trace, path, started):
+        try:
+            return await result
+        finally:
+            trace.record_resolver(path, time.perf_counter() - started)
@@ -1,3 +1,452 @@
-from django.shortcuts import render
+import csv
+import inspect
+import json
+import logging
+from dataclasses import dataclass
+from itertools import islice
+from typing import Optional
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    DocumentNode,
+    ExecutionResult,
+    GraphQLError,
+    OperationDefinitionNode,
+    OperationType,
+    execute,
+    get_operation_ast,
+    validate_schema,
+)
+
+from crm import replicas, response_cache, tracing
+from crm.complexity import analyze_query, check_query_cost
+from crm.filters import CustomerFilter, OrderFilter
+from crm.loaders import CONTEXT_ATTRIBUTE, AsyncCRMLoaders, CRMLoaders
+from crm.models import Customer, Order
+from crm.persisted_queries import PERSISTED_QUERY_NOT_FOUND, document_cache, persisted_queries
+from crm.schema import (
+    CUSTOMER_ORDER_FIELDS,
+    ORDER_ORDER_FIELDS,
+    CustomerFilterInput,
+    OrderFilterInput,
+    _apply_filterset,
+    _apply_ordering,
+)
+
+logger = logging.getLogger(__name__)
+
+QUERY_COST_ATTRIBUTE = "crm_query_cost"
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+ORDER_EXPORT_COLUMNS = (
+    "id", "order_date", "total_amount", "customer_id", "customer_name", "customer_email", "product_ids", "product_names",
+)
+CUSTOMER_EXPORT_COLUMNS = ("id", "name", "email", "phone", "created_at")
+# Export query parameters that are not filter fields.
+EXPORT_PARAMETERS = {"filter", "format", "order_by"}
+
+
+@dataclass
+class PreparedExecution:
+    document: DocumentNode
+    operation: Optional[OperationDefinitionNode]
+    cache_key: Optional[str]
+
+
+class CRMGraphQLView(GraphQLView):
+    """GraphQL endpoint that gives each request its own loaders and reports on them."""
+
+    execution_context_class = replicas.ReplicaExecutionContext
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        replicas.set_sticky_cookie(request, response)
+        return response
+
+    def get_context(self, request):
+        setattr(request, CONTEXT_ATTRIBUTE, CRMLoaders())
+        return request
+
+    def get_extensions(self, request):
+        extensions = {}
+        loaders = getattr(request, CONTEXT_ATTRIBUTE, None)
+        if loaders is not None:
+            stats = loaders.stats()
+            logger.debug("GraphQL loader stats: %s", stats)
+            if getattr(settings, "CRM_LOADER_STATS", False):
+                extensions["dataloaders"] = stats
+        if getattr(settings, "CRM_DOCUMENT_CACHE_STATS", False):
+            extensions["documentCache"] = document_cache.stats_dict()
+        query_cost = getattr(request, QUERY_COST_ATTRIBUTE, None)
+        if query_cost is not None:
+            extensions["cost"] = query_cost.as_extension()
+        trace = tracing.get_trace(request)
+        if trace is not None and tracing.extensions_enabled():
+            extensions["tracing"] = trace.summary()
+        return extensions
+
+    def get_middleware(self, request):
+        middleware = list(self.middleware or ())
+        if tracing.get_trace(request) is not None:
+            # Last, so it sits closest to the resolver and times only the resolver itself.
+            middleware.append(tracing.TracingMiddleware())
+        return middleware
+
+    @staticmethod
+    def get_persisted_query(request, data):
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        if not isinstance(extensions, dict):
+            return None
+        persisted = extensions.get("persistedQuery")
+        return persisted if isinstance(persisted, dict) else None
+
+    def resolve_query(self, request, data, query):
+        """Swap a persisted-query hash for its text, registering the text on a retry."""
+        persisted = self.get_persisted_query(request, data)
+        if not persisted or not persisted.get("sha256Hash"):
+            return query
+        sha256_hash = persisted["sha256Hash"]
+        if query:
+            persisted_queries.register(query, sha256_hash)
+            return query
+        stored = persisted_queries.lookup(sha256_hash)
+        if stored is None:
+            raise GraphQLError(PERSISTED_QUERY_NOT_FOUND, extensions={"code": "PERSISTED_QUERY_NOT_FOUND"})
+        return stored
+
+    def prepare_execution(self, request, data, query, variables, operation_name, show_graphiql=False):
+        """Run every step before execution.
+
+        Returns a ``PreparedExecution``, or the result (possibly ``None`` for GraphiQL) that
+        answers the request without executing it: errors, rejected costs and cache hits.
+        """
+        try:
+            query = self.resolve_query(request, data, query)
+        except GraphQLError as e:
+            return ExecutionResult(data=None, errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        document, errors = document_cache.get(
+            schema, query, self.validation_rules, graphene_settings.MAX_VALIDATION_ERRORS
+        )
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        # Reject over-expensive operations before any resolver runs.
+        query_cost = analyze_query(schema, document, operation_name, variables)
+        setattr(request, QUERY_COST_ATTRIBUTE, query_cost)
+        try:
+            check_query_cost(query_cost)
+        except GraphQLError as e:
+            return ExecutionResult(data=None, errors=[e])
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    f"Can only perform a {operation_ast.operation.value} operation from a POST request.",
+                )
+            )
+
+        cache_key = None
+        # A client inside its read-your-writes window must not get a response built from the replica.
+        if not replicas.reads_primary(request):
+            cache_key = response_cache.response_key(
+                schema, document, operation_ast, query, operation_name, variables,
+                replica=replicas.replica_alias() is not None,
+            )
+        if cache_key is not None:
+            cached = response_cache.get_cached_response(cache_key)
+            if cached is not None:
+                return ExecutionResult(data=cached)
+
+        return PreparedExecution(document=document, operation=operation_ast, cache_key=cache_key)
+
+    def get_execute_options(self, request, variables, operation_name):
+        execute_options = {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": variables,
+            "operation_name": operation_name,
+            "middleware": self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            execute_options["execution_context_class"] = self.execution_context_class
+        return execute_options
+
+    @staticmethod
+    def operation_label(prepared, operation_name):
+        operation = prepared.operation
+        if operation is not None and operation.name is not None:
+            return operation.name.value
+        return operation_name
+
+    @staticmethod
+    def store_response(prepared, result):
+        if prepared.cache_key is not None and not result.errors:
+            response_cache.set_cached_response(prepared.cache_key, result.data)
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        prepared = self.prepare_execution(request, data, query, variables, operation_name, show_graphiql)
+        if not isinstance(prepared, PreparedExecution):
+            return prepared
+
+        schema = self.schema.graphql_schema
+        try:
+            with tracing.trace_request(request, self.operation_label(prepared, operation_name)):
+                execute_options = self.get_execute_options(request, variables, operation_name)
+                if (
+                    prepared.operation is not None
+                    and prepared.operation.operation == OperationType.MUTATION
+                    and (
+                        graphene_settings.ATOMIC_MUTATIONS is True
+                        or connections[replicas.primary_alias()].settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                    )
+                ):
+                    with transaction.atomic(using=replicas.primary_alias()):
+                        result = execute(schema, prepared.document, **execute_options)
+                        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                            transaction.set_rollback(True)
+                    return result
+
+                result = execute(schema, prepared.document, **execute_options)
+            self.store_response(prepared, result)
+            return result
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+        if execution_result and execution_result.errors:
+            set_rollback()
+
+        return self.build_response(request, execution_result, id, show_graphiql)
+
+    def build_response(self, request, execution_result, id=None, show_graphiql=False):
+        status_code = 200
+        if not execution_result:
+            return None, status_code
+
+        response = {}
+        if execution_result.errors:
+            response["errors"] = [self.format_error(e) for e in execution_result.errors]
+
+        if execution_result.errors and any(not getattr(e, "path", None) for e in execution_result.errors):
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+
+        extensions = self.get_extensions(request)
+        if extensions:
+            response["extensions"] = extensions
+
+        if self.batch:
+            response["id"] = id
+            response["status"] = status_code
+
+        return self.json_encode(request, response, pretty=show_graphiql), status_code
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """ASGI GraphQL endpoint: resolvers run on the event loop against ``async_schema``.
+
+    Batched requests are not supported and ``ATOMIC_MUTATIONS`` does not apply, since a
+    transaction cannot span awaits; each mutation still runs atomically in Django's sync thread.
+    """
+
+    view_is_async = True
+
+    def get_context(self, request):
+        setattr(request, CONTEXT_ATTRIBUTE, AsyncCRMLoaders())
+        return request
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(["GET", "POST"], "GraphQL only supports GET and POST requests.")
+                )
+            if self.batch:
+                raise HttpError(HttpResponseBadRequest("The async GraphQL endpoint does not support batching."))
+
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            query, variables, operation_name, id = self.get_graphql_params(request, data)
+            execution_result = await self.aexecute_graphql_request(request, data, query, variables, operation_name)
+            result, status_code = self.build_response(request, execution_result, id)
+            response = HttpResponse(status=status_code, content=result, content_type="application/json")
+            replicas.set_sticky_cookie(request, response)
+            return response
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(request, {"errors": [self.format_error(e)]})
+            return response
+
+    async def aexecute_graphql_request(self, request, data, query, variables, operation_name):
+        # Persisted-query and response-cache lookups are blocking cache calls; keep them off the loop.
+        prepared = await sync_to_async(self.prepare_execution)(request, data, query, variables, operation_name)
+        if not isinstance(prepared, PreparedExecution):
+            return prepared
+        try:
+            with tracing.trace_request(request, self.operation_label(prepared, operation_name)):
+                result = execute(
+                    self.schema.graphql_schema,
+                    prepared.document,
+                    **self.get_execute_options(request, variables, operation_name),
+                )
+                if inspect.isawaitable(result):
+                    result = await result
+            await sync_to_async(self.store_response)(prepared, result)
+            return result
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the value back, so csv.writer can feed a stream."""
+
+    def write(self, value):
+        return value
+
+
+def _export_filter(request, input_type) -> dict:
+    """Read filters from ``?filter=<json>`` (GraphQL field names) and/or plain query parameters."""
+    allowed = set(input_type._meta.fields)
+    data = {}
+    raw_filter = request.GET.get("filter")
+    if raw_filter:
+        try:
+            decoded = json.loads(raw_filter)
+        except ValueError as exc:
+            raise GraphQLError("filter must be a JSON object.") from exc
+        if not isinstance(decoded, dict):
+            raise GraphQLError("filter must be a JSON object.")
+        data.update({to_snake_case(key): value for key, value in decoded.items()})
+    for key, value in request.GET.items():
+        if key not in EXPORT_PARAMETERS:
+            data[to_snake_case(key)] = value
+    unknown = set(data) - allowed
+    if unknown:
+        raise GraphQLError(f"Unknown filter field(s): {', '.join(sorted(unknown))}")
+    return data
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _order_rows(queryset, chunk_size):
+    for chunk in _chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        # A fresh loader set per chunk batches the relations without holding earlier chunks.
+        loaders = CRMLoaders()
+        loaders.prime(chunk)
+        for order in chunk:
+            customer = loaders.customers.load(order.customer_id)
+            products = loaders.products_by_order.load(order.pk)
+            yield {
+                "id": order.pk,
+                "order_date": order.order_date,
+                "total_amount": order.total_amount,
+                "customer_id": order.customer_id,
+                "customer_name": customer.name if customer else None,
+                "customer_email": customer.email if customer else None,
+                "product_ids": [product.pk for product in products],
+                "product_names": [product.name for product in products],
+            }
+
+
+def _customer_rows(queryset, chunk_size):
+    for customer in queryset.iterator(chunk_size=chunk_size):
+        yield {column: getattr(customer, "pk" if column == "id" else column) for column in CUSTOMER_EXPORT_COLUMNS}
+
+
+def _ndjson_stream(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def _csv_stream(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(
+            [";".join(str(item) for item in row[column]) if isinstance(row[column], list) else row[column] for column in columns]
+        )
+
+
+def _export_response(request, name, queryset, rows_factory, columns):
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return HttpResponseBadRequest("format must be 'ndjson' or 'csv'.")
+    rows = rows_factory(queryset, EXPORT_CHUNK_SIZE)
+    stream = _csv_stream(rows, columns) if export_format == "csv" else _ndjson_stream(rows)
+    response = StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{name}.{export_format}"'
+    return response
+
+
+@require_GET
+def export_orders(request):
+    try:
+        queryset = _apply_filterset(Order.objects.all(), OrderFilter, _export_filter(request, OrderFilterInput))
+        queryset = _apply_ordering(queryset, request.GET.get("order_by") or "pk", ORDER_ORDER_FIELDS | {"pk"})
+    except GraphQLError as exc:
+        return HttpResponseBadRequest(exc.message)
+    return _export_response(request, "orders", queryset, _order_rows, ORDER_EXPORT_COLUMNS)
+
+
+@require_GET
+def export_customers(request):
+    try:
+        queryset = _apply_filterset(Customer.objects.all(), CustomerFilter, _export_filter(request, CustomerFilterInput))
+        queryset = _apply_ordering(queryset, request.GET.get("order_by") or "pk", CUSTOMER_ORDER_FIELDS | {"pk"})
+    except GraphQLError as exc:
+        return HttpResponseBadRequest(exc.message)
+    return _export_response(request, "customers", queryset, _customer_rows, CUSTOMER_EXPORT_COLUMNS)